@@ -0,0 +1,79 @@
+"""Rows per second of sample_ingest against SampleReader.sample_iter
+
+A synthetic file in the bezdekIris.data format is written to a temporary
+directory, once clean and once with a bad row every 10000 rows, and split
+into one file per process for read_many. SampleReader stops at the first
+bad row, so it only reads the clean file.
+
+python benchmark_ingest.py
+python benchmark_ingest.py --rows 100000 --processes 2
+"""
+
+import argparse
+import tempfile
+from multiprocessing import cpu_count
+from pathlib import Path
+from timeit import default_timer as timer
+
+from benchmark_knn import synthetic
+from model import SampleReader
+from sample_ingest import read_many, read_samples
+
+BAD_EVERY = 10_000
+
+
+def write(path, features, species, bad_every=None):
+    with path.open("w") as data_file:
+        for n, (values, name) in enumerate(zip(features.tolist(),
+                                               species.tolist())):
+            if bad_every and n % bad_every == bad_every - 1:
+                data_file.write(f"{values[0]},,{values[2]},{name}\n")
+            else:
+                data_file.write(",".join(map(str, values)) + f",{name}\n")
+
+
+def measure(name, rows, function, *args):
+    start = timer()
+    result = function(*args)
+    elapsed = timer() - start
+    print(f"{name:<40}{elapsed:>9.3f}s{rows / elapsed:>14,.0f} rows/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--processes", type=int, default=cpu_count())
+    args = parser.parse_args()
+
+    features, species = synthetic(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        clean, bad = directory / "clean.data", directory / "bad.data"
+        write(clean, features, species)
+        write(bad, features, species, BAD_EVERY)
+        step = -(-args.rows // args.processes)
+        parts = []
+        for n, start in enumerate(range(0, args.rows, step)):
+            parts.append(directory / f"part{n}.data")
+            write(parts[-1], features[start:start + step],
+                  species[start:start + step])
+        print(f"{args.rows} rows, {clean.stat().st_size / 2 ** 20:.1f} MiB")
+
+        measure("SampleReader.sample_iter", args.rows,
+                lambda: sum(1 for _ in SampleReader(clean).sample_iter()))
+        store, _ = measure("read_samples", args.rows, read_samples, clean)
+        assert len(store) == args.rows
+        store, bad_rows = measure(
+            f"read_samples, a bad row every {BAD_EVERY}", args.rows,
+            read_samples, bad)
+        assert len(store) + len(bad_rows) == args.rows
+        for processes in sorted({1, args.processes}):
+            store, _ = measure(
+                f"read_many, {len(parts)} files, {processes} process(es)",
+                args.rows, read_many, parts, processes)
+            assert len(store) == args.rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""k-NN engine against the per-pair loop of Hyperparameter.test
+
+The training set is a synthetic iris of a million rows, three normal
+clusters around the species means. The Python loop is measured on a small
+number of testing samples and its time per sample is scaled to the full
+testing set, its classifications are checked against the engine.
+
+python benchmark_knn.py
+python benchmark_knn.py --rows 100000 --testing 500
+"""
+
+import argparse
+from collections import Counter
+from math import hypot
+from timeit import default_timer as timer
+
+import numpy as np
+
+from knn_engine import FEATURES, TREE_P, KNNClassifier
+
+SPECIES = ("Iris-setosa", "Iris-versicolour", "Iris-virginica")
+MEANS = ((5.01, 3.43, 1.46, 0.25), (5.94, 2.77, 4.26, 1.33),
+         (6.59, 2.97, 5.55, 2.03))
+DEVIATIONS = ((0.35, 0.38, 0.17, 0.11), (0.52, 0.31, 0.47, 0.20),
+              (0.64, 0.32, 0.55, 0.27))
+KS = range(1, 16)
+
+
+class Sample:
+    """Only what the Python loop reads"""
+    __slots__ = FEATURES + ("species",)
+
+    def __init__(self, row, species):
+        for name, value in zip(FEATURES, row):
+            setattr(self, name, value)
+        self.species = species
+
+
+def synthetic(rows, seed=0):
+    """(features, species) of rows samples, one decimal like bezdekIris"""
+    generator = np.random.default_rng(seed)
+    codes = generator.integers(len(SPECIES), size=rows)
+    features = generator.normal(np.take(MEANS, codes, axis=0),
+                                np.take(DEVIATIONS, codes, axis=0))
+    features = np.round(np.abs(features), 1) + 0.1
+    return features, np.array(SPECIES)[codes]
+
+
+def python_classify(sample, training, k):
+    """Hyperparameter.test with the ED distance, for one sample"""
+    distances = sorted(
+        (hypot(sample.sepal_length - t.sepal_length,
+               sample.sepal_width - t.sepal_width,
+               sample.petal_length - t.petal_length,
+               sample.petal_width - t.petal_width), n)
+        for n, t in enumerate(training))
+    votes = Counter(training[n].species for _, n in distances[:k])
+    return votes.most_common(1)[0][0]
+
+
+def measure(name, function, *args):
+    start = timer()
+    result = function(*args)
+    elapsed = timer() - start
+    print(f"{name:<44}{elapsed:>10.3f}s")
+    return result, elapsed
+
+
+def python_loop(features, species, queries, query_species, k=5, samples=5):
+    training = [Sample(row.tolist(), s) for row, s in zip(features, species)]
+    testing = [Sample(row.tolist(), s)
+               for row, s in zip(queries[:samples], query_species)]
+    expected, elapsed = measure(
+        f"Python loop, {samples} samples, k={k}",
+        lambda: [python_classify(s, training, k) for s in testing])
+    per_sample = elapsed / samples
+    print(f"{'  scaled to the testing set, one k':<44}"
+          f"{per_sample * len(queries):>10.1f}s")
+    print(f"{f'  scaled to the testing set, {len(KS)} k values':<44}"
+          f"{per_sample * len(queries) * len(KS):>10.1f}s")
+    engine = KNNClassifier(features, "ED", labels=species,
+                           tree_threshold=len(features) + 1)
+    assert list(engine.classify(queries[:samples], k)) == expected
+    return per_sample
+
+
+def engines(features, species, queries, query_species):
+    for distance in ("ED", "MD", "CD", "SD"):
+        brute = KNNClassifier(features, distance, labels=species,
+                              tree_threshold=len(features) + 1)
+        quality, _ = measure(
+            f"{distance} blocks, {len(KS)} k values",
+            brute.quality, queries, KS, query_species)
+        if distance == "ED":
+            measure(f"{distance} blocks, one pass per k", lambda: [
+                brute.quality(queries, [k], query_species) for k in KS])
+        best = max(quality, key=quality.get)
+        print(f"  best k={best}, quality {quality[best]:.3f}")
+        if distance not in TREE_P:
+            continue
+        tree, _ = measure(f"{distance} KD-tree, build", lambda: KNNClassifier(
+            features, distance, labels=species, tree_threshold=0))
+        tree_quality, _ = measure(f"{distance} KD-tree, {len(KS)} k values",
+                                  tree.quality, queries, KS, query_species)
+        # the tree may pick other neighbours among equal distances
+        difference = max(abs(tree_quality[k] - quality[k]) for k in KS)
+        print(f"  quality differs by at most {difference:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--testing", type=int, default=1000)
+    args = parser.parse_args()
+
+    features, species = synthetic(args.rows)
+    queries, query_species = synthetic(args.testing, seed=1)
+    print(f"{args.rows} training rows, {args.testing} testing rows")
+    python_loop(features, species, queries, query_species)
+    engines(features, species, queries, query_species)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""SampleStore against the Sample objects of model.py
+
+The rows are SampleDicts generated on the fly, so only the samples built
+from them are counted. ShufflingSamplePartition.training builds a
+TrainingKnownSample per row on every access, which KnownSample cannot do
+from a SampleDict in model.py (it needs a purpose), so the rebuild is
+measured with Sample, the cheaper of the two.
+
+python benchmark_store.py
+python benchmark_store.py --rows 100000
+"""
+
+import argparse
+import random
+import tracemalloc
+from timeit import default_timer as timer
+
+from benchmark_knn import synthetic
+from knn_engine import FEATURES, KNNClassifier
+from model import Sample
+from sample_store import SampleStore, StorePartition
+
+ACCESSES = 3
+
+
+def rows(features, species):
+    for values, name in zip(features.tolist(), species.tolist()):
+        row = dict(zip(FEATURES, values))
+        row["species"] = name
+        yield row
+
+
+def measure(name, function, *args):
+    start = timer()
+    result = function(*args)
+    print(f"{name:<48}{timer() - start:>10.3f}s")
+    return result
+
+
+def allocated(function, *args):
+    """bytes still allocated by what function returns"""
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def objects_from(features, species):
+    return [Sample(**row) for row in rows(features, species)]
+
+
+def store_from(features, species):
+    return SampleStore.from_dicts(rows(features, species))
+
+
+def memory(features, species):
+    _, object_size = allocated(objects_from, features, species)
+    store, store_size = allocated(store_from, features, species)
+    for name, size in (("Sample objects", object_size),
+                       ("SampleStore", store_size)):
+        print(f"{name:<30}{size / 2 ** 20:>10.1f} MiB"
+              f"{size / len(features):>10.1f} bytes/row")
+    print(f"{'SampleStore.nbytes':<30}{store.nbytes / 2 ** 20:>10.1f} MiB")
+
+
+def speed(features, species):
+    samples = measure("build Sample objects", objects_from, features, species)
+    store = measure("build SampleStore", store_from, features, species)
+
+    dicts = list(rows(features, species))
+    random.shuffle(dicts)
+    split = int(len(dicts) * 0.80)
+    measure(f"rebuilt training partition, {ACCESSES} accesses", lambda: [
+        [Sample(**row) for row in dicts[:split]] for _ in range(ACCESSES)])
+    partition = StorePartition(store, seed=0)
+    measure(f"StorePartition.training, {ACCESSES} accesses", lambda: [
+        partition.training for _ in range(ACCESSES)])
+
+    measure("sum sepal_length, Sample objects",
+            lambda: sum(sample.sepal_length for sample in samples))
+    measure("sum sepal_length, SampleView rows",
+            lambda: sum(sample.sepal_length for sample in store))
+    measure("sum sepal_length, SampleStore.column",
+            lambda: store.column("sepal_length").sum())
+
+    training, testing = samples[:split], samples[split:split + 1000]
+    measure("k-NN quality, Sample objects", lambda: KNNClassifier(
+        training).quality(testing, [5]))
+    measure("k-NN quality, StorePartition", lambda: KNNClassifier(
+        partition.training).quality(partition.testing[:1000], [5]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    features, species = synthetic(args.rows)
+    print(f"{args.rows} rows")
+    memory(features, species)
+    speed(features, species)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Parallel k x distance grid search for the iris k-NN classifier.
+
+TrainingData.test evaluates one Hyperparameter at a time, and handing a
+TrainingData to a process pool pickles every sample for every task. Here
+the training and testing samples are packed into arrays once and copied
+into shared memory, the workers attach to it when they start, so a task is
+only a distance name and a range of testing rows. A task classifies its
+rows for every k of the grid from one neighbour search (see knn_engine),
+and the qualities of a distance are yielded as soon as all its rows are
+done.
+
+python grid_search.py --rows 100000 --testing 2000 --processes 4
+"""
+
+import argparse
+from multiprocessing import Pool, cpu_count, resource_tracker, shared_memory
+from timeit import default_timer as timer
+from typing import Iterable, Iterator, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from knn_engine import (DISTANCES, KNNClassifier, Samples, distance_name,
+                        feature_matrix, with_species)
+
+# tasks per process, more gives better balance and earlier results
+TASKS_PER_PROCESS = 4
+
+
+class Tuning(NamedTuple):
+    k: int
+    distance: str
+    quality: float
+
+
+class SharedArrays:
+    """
+    NumPy arrays copied into shared memory blocks
+
+    with SharedArrays(features=features) as shared:
+        Pool(initializer=attach, initargs=(shared.descriptors,))
+    """
+
+    def __init__(self, **arrays: np.ndarray) -> None:
+        self.blocks: list[shared_memory.SharedMemory] = []
+        self.descriptors: dict[str, tuple[str, tuple, str]] = {}
+        try:
+            for name, array in arrays.items():
+                block = shared_memory.SharedMemory(
+                    create=True, size=max(array.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(array.shape, array.dtype, block.buf)[...] = array
+                self.descriptors[name] = (
+                    block.name, array.shape, array.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+_blocks: list[shared_memory.SharedMemory] = []
+_arrays: dict[str, np.ndarray] = {}
+_engines: dict[str, KNNClassifier] = {}
+
+
+def attach(descriptors: dict[str, tuple[str, tuple, str]]) -> None:
+    """Pool initializer, maps the shared arrays into the worker"""
+    for name, (block_name, shape, dtype) in descriptors.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        # the blocks stay open as long as the worker uses the arrays
+        _blocks.append(block)
+        _arrays[name] = np.ndarray(shape, dtype, block.buf)
+    _engines.clear()
+
+
+def attach_local(arrays: dict[str, np.ndarray]) -> None:
+    """attach for grid searches that run in this process"""
+    _arrays.clear()
+    _arrays.update(arrays)
+    _engines.clear()
+
+
+def _engine(distance: str) -> KNNClassifier:
+    # one engine (and KD-tree) per distance and worker, not per task
+    if distance not in _engines:
+        _engines[distance] = KNNClassifier(
+            _arrays["training"], distance, labels=_arrays["training_codes"])
+    return _engines[distance]
+
+
+def _evaluate(task: tuple[str, int, int, list[int]]):
+    """the number of correctly classified testing rows per k"""
+    distance, start, stop, ks = task
+    predicted = _engine(distance).predict(
+        _arrays["testing"][start:stop], ks)
+    expected = _arrays["testing_codes"][start:stop]
+    return distance, stop - start, {
+        k: int(np.count_nonzero(codes == expected))
+        for k, codes in predicted.items()
+    }
+
+
+def _labels(samples: Samples, labels: Optional[Sequence[str]]):
+    if labels is None:
+        samples, labels = with_species(samples)
+    return feature_matrix(samples), np.asarray(labels)
+
+
+def grid_search(
+    training: Samples,
+    testing: Samples,
+    ks: Iterable[int] = range(1, 41, 2),
+    distances: Iterable = DISTANCES,
+    *,
+    training_labels: Optional[Sequence[str]] = None,
+    testing_labels: Optional[Sequence[str]] = None,
+    processes: Optional[int] = None,
+) -> Iterator[Tuning]:
+    """
+    yields the quality of every (k, distance) combination, the k values of
+    a distance together as soon as that distance is evaluated
+    :param training: samples, or a feature matrix with training_labels
+    :param processes: pool size, None for one per CPU, 1 runs in this
+                      process without shared memory
+    """
+    ks = sorted(set(ks))
+    # in the given order, once each: remaining counts rows per distance
+    distances = list(dict.fromkeys(distance_name(distance)
+                                   for distance in distances))
+    training, training_labels = _labels(training, training_labels)
+    testing, testing_labels = _labels(testing, testing_labels)
+    if not len(testing):
+        raise ValueError("No testing samples")
+    if not distances:
+        raise ValueError("No distances")
+    # the same integer codes for the species of both sets
+    _, codes = np.unique(np.concatenate([training_labels, testing_labels]),
+                         return_inverse=True)
+    arrays = {
+        "training": training,
+        "training_codes": codes[:len(training)],
+        "testing": testing,
+        "testing_codes": codes[len(training):],
+    }
+
+    processes = processes or cpu_count()
+    chunks = max(1, -(-processes * TASKS_PER_PROCESS // len(distances)))
+    step = -(-len(testing) // chunks)
+    tasks = [(distance, start, min(start + step, len(testing)), ks)
+             for distance in distances
+             for start in range(0, len(testing), step)]
+    remaining = {distance: len(testing) for distance in distances}
+    correct = {distance: dict.fromkeys(ks, 0) for distance in distances}
+
+    def collect(results):
+        for distance, rows, counts in results:
+            for k, count in counts.items():
+                correct[distance][k] += count
+            remaining[distance] -= rows
+            if not remaining[distance]:
+                for k in ks:
+                    yield Tuning(k, distance,
+                                 correct[distance][k] / len(testing))
+
+    if processes == 1:
+        attach_local(arrays)
+        try:
+            yield from collect(map(_evaluate, tasks))
+        finally:
+            # the arrays and KD-trees are not kept alive after the search
+            _arrays.clear()
+            _engines.clear()
+        return
+    # workers forked before the tracker runs would start their own
+    # and report every block they attached to as leaked
+    resource_tracker.ensure_running()
+    with SharedArrays(**arrays) as shared, \
+            Pool(processes, attach, (shared.descriptors,)) as pool:
+        yield from collect(pool.imap_unordered(_evaluate, tasks))
+
+
+def best(results: Iterable[Tuning]) -> Tuning:
+    """the highest quality, the smallest k among equal qualities"""
+    return max(results, key=lambda result: (result.quality, -result.k))
+
+
+def main():
+    from benchmark_knn import synthetic
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--testing", type=int, default=2000)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    features, species = synthetic(args.rows)
+    queries, query_species = synthetic(args.testing, seed=1)
+    results = []
+    start = timer()
+    for result in grid_search(features, queries,
+                              training_labels=species,
+                              testing_labels=query_species,
+                              processes=args.processes):
+        results.append(result)
+        print(f"{timer() - start:8.2f}s {result.k:2d} {result.distance:2s}"
+              f" {result.quality:.3f}")
+    result = best(results)
+    print(f"best: k={result.k} {result.distance} quality {result.quality:.3f}"
+          f", {len(results)} combinations in {timer() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
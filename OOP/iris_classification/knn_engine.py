@@ -0,0 +1,278 @@
+"""Vectorized k-NN classification for the iris samples.
+
+Hyperparameter.test computes one distance at a time through attribute
+access, and tuning k repeats that whole loop for every candidate. Here the
+samples are packed into a NumPy feature matrix once, the distances from a
+block of testing rows to every training row are computed with array
+operations, and the nearest max(k) neighbours are sorted once, so all the
+k values are evaluated from the same neighbour lists. Large training sets
+are searched with a KD-tree for the ED, MD and CD distances when scipy is
+installed, SD is not a Minkowski distance and is always computed in blocks.
+
+pip install numpy
+pip install scipy  # optional, for the KD-tree
+
+>>> engine = KNNClassifier(training_data.training, "ED")
+>>> engine.quality(training_data.testing, ks=range(1, 16))
+"""
+
+from itertools import chain
+from operator import attrgetter
+from typing import Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+FEATURES = ("sepal_length", "sepal_width", "petal_length", "petal_width")
+DISTANCES = ("ED", "MD", "CD", "SD")
+# the Minkowski p of the distances a KD-tree can answer
+TREE_P = {"ED": 2, "MD": 1, "CD": np.inf}
+# training rows from which the tree is faster than computing every distance
+TREE_THRESHOLD = 20_000
+# distances kept in memory per block of testing rows, 32 MiB of float64
+BLOCK_ELEMENTS = 1 << 22
+# relative widening of the KD-tree's k-th distance when looking for ties
+TREE_SLACK = 1e-9
+
+Samples = Union[np.ndarray, Iterable]
+
+
+def distance_name(distance) -> str:
+    """"ED", "MD", "CD" or "SD" for a name or a Hyperparameter.Distance"""
+    if isinstance(distance, str):
+        name = distance
+    elif isinstance(distance, type):
+        name = distance.__name__
+    else:
+        name = type(distance).__name__
+    if name not in DISTANCES:
+        raise ValueError(f"Unknown distance {distance!r}")
+    return name
+
+
+def feature_matrix(samples: Samples) -> np.ndarray:
+    """The four measurements of every sample as a (n, 4) float64 array"""
+    # a SampleStore already holds its matrix
+    samples = getattr(samples, "features", samples)
+    if isinstance(samples, np.ndarray):
+        return np.ascontiguousarray(samples, dtype=np.float64).reshape(
+            -1, len(FEATURES))
+    features = attrgetter(*FEATURES)
+    return np.array([features(sample) for sample in samples],
+                    dtype=np.float64).reshape(-1, len(FEATURES))
+
+
+def with_species(samples: Iterable) -> tuple[Samples, Sequence[str]]:
+    """The samples, iterable more than once, and their species"""
+    species = getattr(samples, "species", None)
+    if isinstance(species, np.ndarray):
+        return samples, species
+    samples = list(samples)
+    return samples, [sample.species for sample in samples]
+
+
+def pairwise(queries: np.ndarray, columns: np.ndarray,
+             distance: str = "ED") -> np.ndarray:
+    """
+    distances from every query row to every training row
+    :param columns: the training matrix transposed, one row per feature
+    :return: a (len(queries), columns.shape[1]) array
+    """
+    result = np.zeros((len(queries), columns.shape[1]))
+    difference = np.empty_like(result)
+    total = np.zeros_like(result) if distance == "SD" else None
+    # one feature at a time, so no (queries, rows, features) array is built
+    for query, column in zip(queries.T, columns):
+        np.subtract(query[:, None], column, out=difference)
+        if distance == "ED":
+            np.square(difference, out=difference)
+            result += difference
+            continue
+        np.abs(difference, out=difference)
+        if distance == "CD":
+            np.maximum(result, difference, out=result)
+        else:
+            result += difference
+        if distance == "SD":
+            np.add(query[:, None], column, out=difference)
+            np.abs(difference, out=difference)
+            total += difference
+    if distance == "ED":
+        np.sqrt(result, out=result)
+    elif distance == "SD":
+        np.divide(result, total, out=result)
+    return result
+
+
+def paired(queries: np.ndarray, points: np.ndarray,
+           distance: str = "ED") -> np.ndarray:
+    """
+    distances between matching rows of queries and points, broadcast over
+    the leading axes, computed in the same order as pairwise, so the same
+    pair gets exactly the same distance from both
+    """
+    difference = queries - points
+    result = np.zeros(difference.shape[:-1])
+    total = np.zeros_like(result)
+    for column in range(len(FEATURES)):
+        if distance == "ED":
+            result += np.square(difference[..., column])
+        elif distance == "CD":
+            np.maximum(result, np.abs(difference[..., column]), out=result)
+        else:
+            result += np.abs(difference[..., column])
+        if distance == "SD":
+            total += np.abs(queries[..., column] + points[..., column])
+    if distance == "ED":
+        np.sqrt(result, out=result)
+    elif distance == "SD":
+        np.divide(result, total, out=result)
+    return result
+
+
+def first_k(owners: np.ndarray, indices: np.ndarray, distances: np.ndarray,
+            k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    the k nearest candidates of every query, nearest first, equal distances
+    in training row order like a stable sort
+    :param owners: the query of every candidate, each query has at least k
+    :return: (indices, distances), both (queries, k)
+    """
+    order = np.lexsort((indices, distances, owners))
+    counts = np.bincount(owners)
+    take = order[(np.cumsum(counts) - counts)[:, None] + np.arange(k)]
+    return indices[take], distances[take]
+
+
+def nearest(distances: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """indices and distances of the k smallest values per row, nearest first"""
+    if k < distances.shape[1]:
+        # every row tied with the k-th distance is a candidate, not just
+        # the ones a partition happens to put first
+        kth = np.partition(distances, k - 1, axis=1)[:, k - 1:k]
+        owners, indices = np.nonzero(distances <= kth)
+        return first_k(owners, indices, distances[owners, indices], k)
+    indices = np.argsort(distances, axis=1, kind="stable")
+    return indices, np.take_along_axis(distances, indices, axis=1)
+
+
+def vote(neighbour_codes: np.ndarray, n_classes: int,
+         ks: Iterable[int]) -> dict[int, np.ndarray]:
+    """
+    the majority class among the first k neighbours for every k
+    :param neighbour_codes: (queries, max(ks)) class codes, nearest first
+    """
+    k_max = neighbour_codes.shape[1]
+    one_hot = neighbour_codes[..., None] == np.arange(n_classes)
+    counts = one_hot.cumsum(axis=1, dtype=np.int32)
+    # Counter.most_common keeps the class seen first among equal counts,
+    # which is the class of the nearest of the tied neighbours
+    first = np.where(one_hot.any(axis=1), one_hot.argmax(axis=1), k_max)
+    return {
+        k: (counts[:, k - 1] * (k_max + 1) - first).argmax(axis=1)
+        for k in ks
+    }
+
+
+class KNNClassifier:
+    """
+    The training samples as a feature matrix and class codes
+
+    KNNClassifier(training_data.training, Hyperparameter.MD)
+    KNNClassifier(features, distance="SD", labels=species)
+    """
+
+    def __init__(
+        self,
+        training: Samples,
+        distance="ED",
+        *,
+        labels: Optional[Sequence[str]] = None,
+        tree_threshold: int = TREE_THRESHOLD,
+    ) -> None:
+        if labels is None:
+            training, labels = with_species(training)
+        self.features = feature_matrix(training)
+        if len(self.features) != len(labels):
+            raise ValueError(f"{len(self.features)} samples but "
+                             f"{len(labels)} labels")
+        if not len(self.features):
+            raise ValueError("No training samples")
+        self.classes, self.codes = np.unique(labels, return_inverse=True)
+        self.distance = distance_name(distance)
+        self.columns = np.ascontiguousarray(self.features.T)
+        self.tree = None
+        if (cKDTree is not None and self.distance in TREE_P
+                and len(self.features) >= tree_threshold):
+            self.tree = cKDTree(self.features)
+
+    def neighbours(self, queries: Samples,
+                   k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        the k nearest training rows of every query, nearest first
+        :return: (indices, distances), both (len(queries), k)
+        """
+        queries = feature_matrix(queries)
+        k = min(k, len(self.features))
+        if self.tree is not None:
+            return self._tree_neighbours(queries, k)
+        block = max(1, BLOCK_ELEMENTS // len(self.features))
+        indices = np.empty((len(queries), k), dtype=np.intp)
+        distances = np.empty((len(queries), k))
+        for start in range(0, len(queries), block):
+            rows = slice(start, start + block)
+            indices[rows], distances[rows] = nearest(
+                pairwise(queries[rows], self.columns, self.distance), k)
+        return indices, distances
+
+    def _tree_neighbours(self, queries: np.ndarray,
+                         k: int) -> tuple[np.ndarray, np.ndarray]:
+        """neighbours from the KD-tree, with ties resolved like nearest"""
+        p = TREE_P[self.distance]
+        distances, _ = self.tree.query(queries, k=k, p=p)
+        # every row within the k-th distance is a candidate, the ball is a
+        # little wider as the tree may round differently than paired
+        radii = distances.reshape(len(queries), k)[:, -1] * (1 + TREE_SLACK)
+        balls = self.tree.query_ball_point(queries, radii, p=p)
+        owners = np.repeat(np.arange(len(queries)), [len(ball) for ball in balls])
+        indices = np.fromiter(chain.from_iterable(balls), np.intp,
+                              len(owners))
+        return first_k(owners, indices, paired(
+            queries[owners], self.features[indices], self.distance), k)
+
+    def predict(self, queries: Samples,
+                ks: Iterable[int]) -> dict[int, np.ndarray]:
+        """the species of every query for each k, from one neighbour search"""
+        ks = sorted(set(ks))
+        if not ks or ks[0] < 1:
+            raise ValueError(f"k must be at least 1, not {ks}")
+        indices, _ = self.neighbours(queries, ks[-1])
+        # with fewer training rows than k every row is a neighbour
+        k_max = indices.shape[1]
+        votes = vote(self.codes[indices], len(self.classes),
+                     [min(k, k_max) for k in ks])
+        return {k: self.classes[votes[min(k, k_max)]] for k in ks}
+
+    def classify(self, queries: Samples, k: int) -> np.ndarray:
+        return self.predict(queries, [k])[k]
+
+    def quality(
+        self,
+        testing: Samples,
+        ks: Iterable[int],
+        labels: Optional[Sequence[str]] = None,
+    ) -> dict[int, float]:
+        """the fraction of the testing samples classified correctly per k"""
+        if labels is None:
+            testing, labels = with_species(testing)
+        labels = np.asarray(labels)
+        if not len(labels):
+            raise ValueError("No testing samples")
+        return {
+            k: float(np.mean(predicted == labels))
+            for k, predicted in self.predict(testing, ks).items()
+        }
@@ -1,10 +1,13 @@
+import csv
 from typing import Optional, Iterable, Iterator, TypedDict, overload
 from typing import Set, List, Tuple
 import abc
 from enum import Enum, IntEnum
 from pathlib import Path
 import datetime
+from math import hypot
 import random
+import weakref
 
 class Sample:
 
@@ -0,0 +1,237 @@
+"""Block-wise CSV ingestion of iris samples into a SampleStore.
+
+SampleReader.sample_iter builds a dict per row with csv.DictReader, calls
+float() four times and stops at the first bad row. Here a file is read
+CHUNK_BYTES at a time and every block of whole lines is parsed by
+numpy.loadtxt in C into a float64 matrix and a species column. A block
+that fails to parse, or holds values that are not finite, is split down
+to the few lines around each bad row, which are parsed one at a time, and
+the bad rows are collected with their line numbers instead of aborting.
+Several files are read in a process pool, each worker returns its arrays
+and the species codes are merged.
+
+python sample_ingest.py bezdekIris.data more.data --processes 2
+"""
+
+import argparse
+import io
+from contextlib import nullcontext
+from multiprocessing import Pool
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+
+import numpy as np
+
+from knn_engine import FEATURES
+from model import SampleReader
+from sample_store import NONE, SampleStore
+
+# bytes read and parsed at a time
+CHUNK_BYTES = 1 << 22
+# lines below which a block is parsed one line at a time
+LINE_BY_LINE = 64
+# parts a block that does not parse is split into
+SPLIT = 8
+# characters of a species name the C parser makes room for at first
+SPECIES_WIDTH = 32
+# a row is the features and optionally the class, see SampleReader.header
+FIELDS = (len(FEATURES), len(SampleReader.header))
+
+
+class BadRow(NamedTuple):
+    source: str
+    line: int
+    text: str
+    error: str
+
+
+class Block(NamedTuple):
+    features: np.ndarray
+    species: np.ndarray
+    bad_rows: list[BadRow]
+
+
+def _lines(source: Path, chunk_bytes: int) -> Iterator[tuple[int, str]]:
+    """blocks of whole lines and the line number of their first line"""
+    line = 1
+    rest = b""
+    with source.open("rb") as source_file:
+        while chunk := source_file.read(chunk_bytes):
+            chunk = rest + chunk
+            end = chunk.rfind(b"\n") + 1
+            if not end:
+                rest = chunk
+                continue
+            rest = chunk[end:]
+            yield line, chunk[:end].decode(errors="replace")
+            line += chunk.count(b"\n", 0, end)
+    if rest.strip():
+        yield line, rest.decode(errors="replace")
+
+
+def _row(width: int) -> np.dtype:
+    """a parsed line, with room for a species name of width characters"""
+    return np.dtype([("features", np.float64, (len(FEATURES),)),
+                     ("species", f"U{max(width, 1)}")])
+
+
+def _clean(species: np.ndarray) -> np.ndarray:
+    """species names stripped like _parse_lines strips its fields"""
+    return np.char.strip(np.char.strip(species), '"')
+
+
+def _load(text: str, width: int) -> np.ndarray:
+    """
+    the rows of a block parsed in C, the same way as _parse_lines: "#" is
+    not a comment and quotes are stripped after splitting, by _clean
+    """
+    return np.loadtxt(io.StringIO(text), dtype=_row(width), delimiter=",",
+                      comments=None, ndmin=1)
+
+
+def parse_block(text: str, first_line: int = 1,
+                source: str = "") -> Block:
+    """
+    the samples of a block of lines, and its bad rows
+    A block that does not parse is split into SPLIT parts, recursively,
+    until the parts without bad rows parse in C again, only parts of less
+    than LINE_BY_LINE lines are parsed one line at a time.
+    """
+    if text.count("\n", 0, -1) < LINE_BY_LINE:
+        return _parse_lines(text, first_line, source)
+    try:
+        rows = _load(text, SPECIES_WIDTH)
+        if np.char.str_len(rows["species"]).max() == SPECIES_WIDTH:
+            # a name may have been cut off, no name is longer than a line
+            rows = _load(text, max(map(len, text.splitlines())))
+    except ValueError:
+        pass
+    else:
+        if np.isfinite(rows["features"]).all():
+            return Block(rows["features"], _clean(rows["species"]), [])
+    # split at the first line ends after each eighth of the text
+    ends = sorted({text.find("\n", len(text) * n // SPLIT) + 1
+                   for n in range(1, SPLIT)} - {0, len(text)})
+    if not ends:
+        return _parse_lines(text, first_line, source)
+    parts = []
+    for start, end in zip([0] + ends, ends + [len(text)]):
+        parts.append(parse_block(text[start:end], first_line, source))
+        first_line += text.count("\n", start, end)
+    return Block(np.concatenate([part.features for part in parts]),
+                 np.concatenate([part.species for part in parts]),
+                 [bad_row for part in parts for bad_row in part.bad_rows])
+
+
+def _parse_lines(text: str, first_line: int, source: str) -> Block:
+    """parse_block one line at a time"""
+    features, species, bad_rows = [], [], []
+    for number, line in enumerate(text.splitlines(), first_line):
+        if not line.strip():
+            continue
+        fields = [field.strip().strip('"') for field in line.split(",")]
+        try:
+            if len(fields) not in FIELDS:
+                raise ValueError(f"{len(fields)} fields")
+            values = [float(field) for field in fields[:len(FEATURES)]]
+            if not np.isfinite(values).all():
+                raise ValueError("value is not finite")
+        except ValueError as ex:
+            bad_rows.append(BadRow(source, number, line, str(ex)))
+            continue
+        features.append(values)
+        species.append(fields[len(FEATURES)] if len(fields) > len(FEATURES)
+                       else "")
+    return Block(np.array(features, dtype=np.float64).reshape(
+        -1, len(FEATURES)), np.array(species, dtype=str), bad_rows)
+
+
+def _encode(species: np.ndarray, codes: dict[str, int],
+            classes: list[str]) -> np.ndarray:
+    """species codes, one comparison per distinct name, "" is unknown"""
+    result = np.full(len(species), NONE, dtype=np.int16)
+    unassigned = species != ""
+    while unassigned.any():
+        name = str(species[unassigned.argmax()])
+        if name not in codes:
+            codes[name] = len(classes)
+            classes.append(name)
+        matches = species == name
+        result[matches] = codes[name]
+        unassigned &= ~matches
+    return result
+
+
+def _store(features: list[np.ndarray], species: list[np.ndarray],
+           classes: list[str]) -> SampleStore:
+    if not features:
+        return SampleStore(np.empty((0, len(FEATURES))),
+                           np.empty(0, np.int16), classes)
+    return SampleStore(np.concatenate(features), np.concatenate(species),
+                       classes)
+
+
+def read_samples(
+    source: Union[Path, str], chunk_bytes: int = CHUNK_BYTES
+) -> tuple[SampleStore, list[BadRow]]:
+    """all the good rows of a file and the bad ones"""
+    source = Path(source)
+    classes: list[str] = []
+    codes: dict[str, int] = {}
+    features, species, bad_rows = [], [], []
+    for first_line, text in _lines(source, chunk_bytes):
+        block = parse_block(text, first_line, str(source))
+        features.append(block.features)
+        species.append(_encode(block.species, codes, classes))
+        bad_rows.extend(block.bad_rows)
+    return _store(features, species, classes), bad_rows
+
+
+def _read_file(source: str):
+    store, bad_rows = read_samples(source)
+    return store.features, store.species_codes, store.classes, bad_rows
+
+
+def read_many(
+    sources: Iterable[Union[Path, str]], processes: Optional[int] = None
+) -> tuple[SampleStore, list[BadRow]]:
+    """
+    read_samples for several files, in file order
+    :param processes: pool size, None for one per CPU, 1 reads the files
+                      in this process
+    """
+    sources = [str(source) for source in sources]
+    codes: dict[str, int] = {}
+    features, species, bad_rows = [], [], []
+    with nullcontext() if processes == 1 else Pool(processes) as pool:
+        parts = (map if pool is None else pool.imap)(_read_file, sources)
+        for part_features, part_codes, part_classes, part_bad in parts:
+            # the file's codes as codes of the merged classes, NONE last
+            mapping = np.array(
+                [codes.setdefault(name, len(codes)) for name in part_classes]
+                + [NONE], dtype=np.int16)
+            features.append(part_features)
+            species.append(mapping[part_codes])
+            bad_rows.extend(part_bad)
+    return _store(features, species, list(codes)), bad_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("sources", nargs="+", type=Path)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    start = timer()
+    store, bad_rows = read_many(args.sources, args.processes)
+    elapsed = timer() - start
+    for bad_row in bad_rows:
+        print(f"{bad_row.source}:{bad_row.line}: {bad_row.error}: "
+              f"{bad_row.text!r}")
+    print(f"{len(store)} samples, {len(bad_rows)} bad rows, "
+          f"{len(store) / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
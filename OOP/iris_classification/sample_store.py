@@ -0,0 +1,282 @@
+"""Column-oriented storage for the iris samples.
+
+A Sample is a Python object with a __dict__ and four float objects, a few
+hundred bytes per row, and ShufflingSamplePartition.training builds a new
+TrainingKnownSample from its dict for every row each time it is read.
+A SampleStore keeps the measurements of all the rows in one (n, 4) float64
+array and the species and classifications as int16 codes, 36 bytes per
+row. Indexing it gives a SampleView, a two slot object that reads and
+writes its row of the arrays, and slicing it gives another store sharing
+the same arrays. StorePartition shuffles the store once and caches the
+training and testing slices, so reading them copies nothing.
+
+>>> store = SampleStore.from_dicts(rows)
+>>> partition = StorePartition(store, training_subset=0.80)
+>>> KNNClassifier(partition.training).quality(partition.testing, [5])
+"""
+
+from collections.abc import Sequence
+from functools import cached_property
+from itertools import islice
+from operator import itemgetter
+from typing import Iterable, Optional, Union, overload
+
+import numpy as np
+
+from knn_engine import FEATURES
+from model import Purpose, SampleDict
+
+# rows converted to arrays at a time by from_dicts
+CHUNK_ROWS = 1 << 16
+# code of a missing species or classification
+NONE = -1
+
+
+def _encode(names: list[Optional[str]], codes: dict[Optional[str], int],
+            classes: list[str]) -> np.ndarray:
+    """the codes of names, new names are added to codes and classes"""
+    for name in dict.fromkeys(names):
+        if name not in codes:
+            codes[name] = len(classes)
+            classes.append(name)
+    return np.fromiter(map(codes.__getitem__, names), np.int16, len(names))
+
+
+class _Measurement:
+    """A column of the feature matrix as an attribute of SampleView"""
+
+    def __init__(self, column: int) -> None:
+        self.column = column
+
+    def __get__(self, view: Optional["SampleView"], owner=None):
+        if view is None:
+            return self
+        return float(view.store.features[view.index, self.column])
+
+    def __set__(self, view: "SampleView", value: float) -> None:
+        view.store.features[view.index, self.column] = value
+
+
+class SampleView:
+    """One row of a SampleStore, with the interface of KnownSample"""
+
+    __slots__ = ("store", "index")
+
+    sepal_length = _Measurement(0)
+    sepal_width = _Measurement(1)
+    petal_length = _Measurement(2)
+    petal_width = _Measurement(3)
+
+    def __init__(self, store: "SampleStore", index: int) -> None:
+        self.store = store
+        self.index = index
+
+    @property
+    def species(self) -> Optional[str]:
+        return self.store.name(self.store.species_codes[self.index])
+
+    @property
+    def purpose(self) -> Optional[Purpose]:
+        return self.store.purpose
+
+    @property
+    def classification(self) -> Optional[str]:
+        if self.purpose == Purpose.Training:
+            raise AttributeError("Training samples have no classification")
+        return self.store.name(self.store.classification_codes[self.index])
+
+    @classification.setter
+    def classification(self, value: Optional[str]) -> None:
+        if self.purpose == Purpose.Training:
+            raise AttributeError("Training samples cannot be classified")
+        self.store.classification_codes[self.index] = self.store.code(value)
+
+    def classify(self, classification: str) -> None:
+        self.classification = classification
+
+    def matches(self) -> bool:
+        return self.species == self.classification
+
+    def __repr__(self) -> str:
+        if self.species is None:
+            known_unknown = "UnknownSample"
+        else:
+            known_unknown = "KnownSample"
+        if self.purpose == Purpose.Training or self.classification is None:
+            classification = ""
+        else:
+            classification = f", {self.classification}"
+        return (
+            f"{known_unknown}("
+            f"sepal_length={self.sepal_length}, "
+            f"sepal_width={self.sepal_width}, "
+            f"petal_length={self.petal_length}, "
+            f"petal_width={self.petal_width}, "
+            f"species={self.species!r}"
+            f"{classification}"
+            f")"
+        )
+
+
+class SampleStore(Sequence):
+    """
+    Samples as a feature matrix and species codes
+
+    store[i] is a SampleView of row i, store[a:b] a SampleStore sharing the
+    arrays, the list of species names is shared too.
+    """
+
+    def __init__(
+        self,
+        features: np.ndarray,
+        species_codes: np.ndarray,
+        classes: list[str],
+        classification_codes: Optional[np.ndarray] = None,
+        purpose: Optional[Purpose] = None,
+    ) -> None:
+        if classification_codes is None:
+            classification_codes = np.full(len(features), NONE, np.int16)
+        if not len(features) == len(species_codes) == len(
+                classification_codes):
+            raise ValueError("Columns of different lengths")
+        self.features = features
+        self.species_codes = species_codes
+        self.classification_codes = classification_codes
+        self.classes = classes
+        self.purpose = purpose
+
+    @classmethod
+    def from_arrays(
+        cls,
+        features: np.ndarray,
+        species: Iterable[Optional[str]],
+        purpose: Optional[Purpose] = None,
+    ) -> "SampleStore":
+        features = np.array(features, dtype=np.float64).reshape(
+            -1, len(FEATURES))
+        classes: list[str] = []
+        return cls(features, _encode(list(species), {None: NONE}, classes),
+                   classes, purpose=purpose)
+
+    @classmethod
+    def from_dicts(
+        cls,
+        rows: Iterable[SampleDict],
+        purpose: Optional[Purpose] = None,
+        chunk_rows: int = CHUNK_ROWS,
+    ) -> "SampleStore":
+        """Packs the rows chunk_rows at a time, rows can be a generator"""
+        classes: list[str] = []
+        # species name to code, None included
+        codes: dict[Optional[str], int] = {None: NONE}
+        features, species = [], []
+        rows = iter(rows)
+        while chunk := list(islice(rows, chunk_rows)):
+            block = np.empty((len(chunk), len(FEATURES)))
+            for column, name in enumerate(FEATURES):
+                block[:, column] = np.fromiter(
+                    map(itemgetter(name), chunk), np.float64, len(chunk))
+            features.append(block)
+            species.append(_encode([row.get("species") for row in chunk],
+                                   codes, classes))
+        if not features:
+            return cls(np.empty((0, len(FEATURES))), np.empty(0, np.int16),
+                       classes, purpose=purpose)
+        return cls(np.concatenate(features), np.concatenate(species),
+                   classes, purpose=purpose)
+
+    def code(self, name: Optional[str]) -> int:
+        """The code of a species name, new names are added to classes"""
+        if name is None:
+            return NONE
+        try:
+            return self.classes.index(name)
+        except ValueError:
+            self.classes.append(name)
+            return len(self.classes) - 1
+
+    def name(self, code: int) -> Optional[str]:
+        return None if code == NONE else self.classes[code]
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    @overload
+    def __getitem__(self, index: int) -> SampleView:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "SampleStore":
+        ...
+
+    def __getitem__(
+            self, index: Union[int, slice]) -> Union[SampleView,
+                                                     "SampleStore"]:
+        if isinstance(index, slice):
+            return self.view(index)
+        if not -len(self) <= index < len(self):
+            raise IndexError("SampleStore index out of range")
+        return SampleView(self, index % len(self))
+
+    def view(self, rows: slice,
+             purpose: Optional[Purpose] = None) -> "SampleStore":
+        """The rows as a store sharing this store's arrays"""
+        return SampleStore(
+            self.features[rows], self.species_codes[rows], self.classes,
+            self.classification_codes[rows],
+            self.purpose if purpose is None else purpose)
+
+    def column(self, name: str) -> np.ndarray:
+        """All the values of one measurement, a view of the matrix"""
+        return self.features[:, FEATURES.index(name)]
+
+    @property
+    def species(self) -> np.ndarray:
+        """The species names of all the rows, None where unknown"""
+        return np.array(self.classes + [None], dtype=object)[
+            self.species_codes]
+
+    @property
+    def nbytes(self) -> int:
+        return (self.features.nbytes + self.species_codes.nbytes
+                + self.classification_codes.nbytes)
+
+    def shuffle(self, generator: Optional[np.random.Generator] = None) -> None:
+        """Puts the rows in random order, in place like random.shuffle"""
+        order = (generator or np.random.default_rng()).permutation(len(self))
+        for column in (self.features, self.species_codes,
+                       self.classification_codes):
+            column[...] = column[order]
+
+
+class StorePartition:
+    """
+    ShufflingSamplePartition for a SampleStore
+
+    The store is shuffled on the first access, training and testing are
+    views of it that are built once.
+    """
+
+    def __init__(
+        self,
+        store: SampleStore,
+        *,
+        training_subset: float = 0.80,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.store = store
+        self.training_subset = training_subset
+        self.seed = seed
+
+    @cached_property
+    def split(self) -> int:
+        self.store.shuffle(np.random.default_rng(self.seed))
+        return int(len(self.store) * self.training_subset)
+
+    @cached_property
+    def training(self) -> SampleStore:
+        return self.store.view(slice(None, self.split), Purpose.Training)
+
+    @cached_property
+    def testing(self) -> SampleStore:
+        return self.store.view(slice(self.split, None), Purpose.Testing)
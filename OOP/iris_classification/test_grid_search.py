@@ -0,0 +1,33 @@
+"""grid_search rejects empty grids and cleans up after itself"""
+
+import pytest
+
+import grid_search
+from benchmark_knn import synthetic
+
+
+@pytest.fixture
+def samples():
+    features, species = synthetic(300)
+    queries, query_species = synthetic(40, seed=1)
+    return dict(training=features, testing=queries,
+                training_labels=species, testing_labels=query_species)
+
+
+def test_no_distances(samples):
+    with pytest.raises(ValueError, match="No distances"):
+        list(grid_search.grid_search(**samples, distances=[]))
+
+
+def test_in_process_search_releases_arrays(samples):
+    results = list(grid_search.grid_search(**samples, ks=[1, 3],
+                                           processes=1))
+    assert len(results) == 2 * len(grid_search.DISTANCES)
+    assert all(0 <= result.quality <= 1 for result in results)
+    assert not grid_search._arrays and not grid_search._engines
+
+
+def test_same_results_in_a_pool(samples):
+    local = sorted(grid_search.grid_search(**samples, processes=1))
+    pooled = sorted(grid_search.grid_search(**samples, processes=2))
+    assert local == pooled
@@ -0,0 +1,71 @@
+"""KNNClassifier against the Python loop of TrainingData.test"""
+
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from benchmark_knn import SPECIES
+from knn_engine import (DISTANCES, FEATURES, TREE_P, KNNClassifier, nearest,
+                        pairwise)
+from model import Hyperparameter, Sample, TrainingData
+
+KS = (1, 3, 7, 15)
+
+
+class SortedHyperparameter(Hyperparameter):
+    """Hyperparameter with the k-NN classify of the book, the training
+    samples sorted by distance with sorted(), which is stable"""
+
+    def __init__(self, k, distance, training):
+        super().__init__(k, training)
+        self.algorithm = getattr(Hyperparameter, distance)()
+
+    def classify(self, sample):
+        by_distance = sorted(
+            self.data().training,
+            key=lambda known: self.algorithm.distance(sample, known))
+        votes = Counter(known.species for known in by_distance[:self.k])
+        return votes.most_common(1)[0][0]
+
+
+@pytest.fixture(scope="module")
+def tied():
+    """a coarse grid, so many training rows are equally far, and random
+    species, so which of the tied rows are chosen changes the votes"""
+    generator = np.random.default_rng(0)
+    features = generator.integers(2, 12, (460, len(FEATURES))) * 0.5
+    species = np.array(SPECIES)[generator.integers(len(SPECIES), size=460)]
+    return features[60:], species[60:], features[:60], species[:60]
+
+
+def test_nearest_orders_ties_by_row(tied):
+    training, _, testing, _ = tied
+    distances = pairwise(testing, np.ascontiguousarray(training.T), "CD")
+    expected = np.argsort(distances, axis=1, kind="stable")
+    for k in KS:
+        indices, _ = nearest(distances, k)
+        assert (indices == expected[:, :k]).all()
+
+
+@pytest.mark.parametrize("distance", DISTANCES)
+def test_same_classes_as_training_data_test(tied, distance):
+    training, training_species, testing, testing_species = tied
+    data = TrainingData("tied")
+    data.training = [Sample(*row, species=name) for row, name in
+                     zip(training.tolist(), training_species.tolist())]
+    data.testing = [Sample(*row, species=name) for row, name in
+                    zip(testing.tolist(), testing_species.tolist())]
+    engines = [KNNClassifier(training, distance, labels=training_species)]
+    if distance in TREE_P:
+        engines.append(KNNClassifier(training, distance,
+                                     labels=training_species,
+                                     tree_threshold=0))
+        assert engines[-1].tree is not None
+    predictions = [engine.predict(testing, KS) for engine in engines]
+    for k in KS:
+        parameter = SortedHyperparameter(k, distance, data)
+        data.test(parameter)
+        expected = [sample.classification for sample in data.testing]
+        for predicted in predictions:
+            assert predicted[k].tolist() == expected
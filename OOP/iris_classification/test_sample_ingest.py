@@ -0,0 +1,38 @@
+"""parse_block in C and _parse_lines line by line give the same rows"""
+
+import numpy as np
+import pytest
+
+from sample_ingest import (LINE_BY_LINE, SPECIES_WIDTH, _parse_lines,
+                           parse_block)
+
+LINES = [
+    "5.0,3.1,1.2,0.2,Iris-b",
+    "5.0, 3.1, 1.2, 0.2, Iris-b",
+    '5.0,3.1,1.2,0.2,"Iris-b"',
+    "5.0,3.1,1.2,0.2,Iris-b # note",
+    "# a comment line",
+    "5.0,3.1,1.2,0.2," + "Iris-" * SPECIES_WIDTH,
+    "5.0,3.1,1.2,0.2",
+    "5.0,,1.2,0.2,Iris-b",
+    "5.0,3.1,1.2,nan,Iris-b",
+]
+
+
+@pytest.mark.parametrize("line", LINES)
+def test_both_paths_agree(line):
+    # enough lines for the C path, the odd line in the middle
+    good = ["4.9,3.0,1.4,0.2,Iris-a"] * LINE_BY_LINE
+    text = "\n".join(good + [line] + good) + "\n"
+    fast = parse_block(text, 1, "iris.data")
+    slow = _parse_lines(text, 1, "iris.data")
+    assert np.array_equal(fast.features, slow.features)
+    assert fast.species.tolist() == slow.species.tolist()
+    assert fast.bad_rows == slow.bad_rows
+
+
+def test_long_species_names_are_kept():
+    name = "Iris-" * SPECIES_WIDTH
+    text = f"5.0,3.1,1.2,0.2,{name}\n" * (LINE_BY_LINE + 1)
+    assert set(parse_block(text).species.tolist()) == {name}
+    assert set(_parse_lines(text, 1, "").species.tolist()) == {name}
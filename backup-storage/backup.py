@@ -1,15 +1,28 @@
 """
 Backup PostgreSQL database to Yandex Object Storage, that has S3 compatible
 API.
+
+Run with --stream to pipe the encrypted dump straight into a parallel S3
+multipart upload instead of writing it to /tmp first, or with --chunked to
+upload only changed chunks of the dump (see chunked.py).
 """
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import datetime
 import os
 from pathlib import Path
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable
+
 import pytz
 
 from termcolor import colored
 import boto3
 
+import chunked
+
 
 DB_HOSTNAME = os.getenv("DB_HOSTNAME", "localhost")
 DB_NAME = os.getenv("DB_NAME")
@@ -17,6 +30,15 @@ DB_USER = os.getenv("DB_USER")
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 BACKUP_KEY_PUB_FILE = os.getenv("BACKUP_KEY_PUB_FILE")
 TIME_ZONE = os.getenv("TIME_ZONE", "Europe/Moscow")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "https://storage.yandexcloud.net")
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE_MB", "16")) * 1024 * 1024
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+CHUNK_INDEX_FILE = os.getenv(
+    "CHUNK_INDEX_FILE", os.path.expanduser("~/.backup_chunk_index.sqlite3"))
+
+# S3 multipart upload limits
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_MAX_PARTS = 10000
 
 DB_FILENAME = "/tmp/backup_db.sql.gz.enc"
 
@@ -41,12 +63,26 @@ def check_key_file_exists():
         )
 
 
+def get_plain_dump_command() -> str:
+    return f"pg_dump -h {DB_HOSTNAME} -U {DB_USER} {DB_NAME}"
+
+
+def get_dump_command(out_filename: str = None) -> str:
+    # without -stream openssl keeps the whole encrypted dump in memory and
+    # writes nothing until the dump ended, with it the output is DER with
+    # indefinite lengths, which smime -decrypt reads the same way
+    out_option = f"-out {out_filename}" if out_filename else ""
+    return (
+        f"{get_plain_dump_command()} | gzip -c --best | \
+        openssl smime -encrypt -aes256 -binary -stream -outform DEM \
+        {out_option} {BACKUP_KEY_PUB_FILE}"
+    )
+
+
 def dump_database():
     print("\U0001F4E6 Preparing database backup started")
     dump_db_operation_status = os.WEXITSTATUS(os.system(
-        f"pg_dump -h {DB_HOSTNAME} -U {DB_USER} {DB_NAME} | gzip -c --best | \
-        openssl smime -encrypt -aes256 -binary -outform DEM \
-        -out {DB_FILENAME} {BACKUP_KEY_PUB_FILE}"
+        get_dump_command(DB_FILENAME)
     ))
     if dump_db_operation_status != 0:
         exit(f"\U00002757 Dump database command exits with status "
@@ -58,7 +94,7 @@ def get_s3_instance():
     session = boto3.session.Session()
     return session.client(
         service_name='s3',
-        endpoint_url='https://storage.yandexcloud.net'
+        endpoint_url=S3_ENDPOINT_URL
     )
 
 
@@ -72,6 +108,175 @@ def upload_dump_to_s3():
     print("\U0001f680 Uploaded")
 
 
+def start_dump_stream() -> subprocess.Popen:
+    """Start dump pipeline, encrypted dump is available on its stdout"""
+    print("\U0001F4E6 Streaming database backup started")
+    return subprocess.Popen(
+        ["bash", "-o", "pipefail", "-c", get_dump_command()],
+        stdout=subprocess.PIPE,
+        bufsize=0,
+    )
+
+
+def stream_dump_to_s3(stream, part_size: int = UPLOAD_PART_SIZE,
+                      concurrency: int = UPLOAD_CONCURRENCY,
+                      key: str = None,
+                      check_stream_ok: Callable[[], None] = None) -> int:
+    """Upload binary stream to S3 as multipart upload.
+
+    At most concurrency + 1 parts are kept in memory at once: reading from
+    the stream waits while all upload workers are busy, so the dump
+    pipeline is throttled by the upload speed. check_stream_ok is called
+    after the stream ended and may raise to abort the upload instead of
+    completing it. Returns uploaded bytes count.
+    """
+    if part_size < S3_MIN_PART_SIZE:
+        exit(f"\U00002757 Upload part size must be at least "
+             f"{S3_MIN_PART_SIZE // (1024 * 1024)} MB.")
+    key = key or f'db-{get_now_datetime_str()}.sql.gz.enc'
+    s3 = get_s3_instance()
+    upload_id = s3.create_multipart_upload(
+        Bucket=S3_BUCKET_NAME, Key=key)['UploadId']
+    print(f"\U0001F4C2 Starting multipart upload of {key} to Object Storage "
+          f"({part_size // (1024 * 1024)} MB parts, {concurrency} workers)")
+    progress = _UploadProgress()
+
+    def upload_part(part_number: int, body: bytes) -> dict:
+        response = s3.upload_part(
+            Bucket=S3_BUCKET_NAME, Key=key, UploadId=upload_id,
+            PartNumber=part_number, Body=body)
+        progress.add(len(body))
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    parts = []
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            in_flight = set()
+            part_number = 0
+            while True:
+                body = _read_exactly(stream, part_size)
+                if not body and part_number > 0:
+                    break
+                part_number += 1
+                if part_number > S3_MAX_PARTS:
+                    raise RuntimeError(
+                        f"dump needs more than {S3_MAX_PARTS} parts, "
+                        f"increase UPLOAD_PART_SIZE_MB")
+                if len(in_flight) >= concurrency:
+                    done, in_flight = wait(in_flight,
+                                           return_when=FIRST_COMPLETED)
+                    parts.extend(future.result() for future in done)
+                in_flight.add(executor.submit(upload_part, part_number, body))
+                if len(body) < part_size:
+                    break
+            parts.extend(future.result() for future in in_flight)
+        if check_stream_ok:
+            check_stream_ok()
+        parts.sort(key=lambda part: part["PartNumber"])
+        s3.complete_multipart_upload(
+            Bucket=S3_BUCKET_NAME, Key=key, UploadId=upload_id,
+            MultipartUpload={"Parts": parts})
+    except BaseException:
+        s3.abort_multipart_upload(
+            Bucket=S3_BUCKET_NAME, Key=key, UploadId=upload_id)
+        raise
+    progress.finish()
+    return progress.uploaded
+
+
+def stream_backup():
+    dump_process = start_dump_stream()
+
+    def check_dump_finished():
+        status = dump_process.wait()
+        if status != 0:
+            raise RuntimeError(
+                f"Dump database command exits with status {status}.")
+
+    try:
+        stream_dump_to_s3(dump_process.stdout,
+                          check_stream_ok=check_dump_finished)
+    except RuntimeError as e:
+        exit(f"\U00002757 {e} Upload aborted.")
+    finally:
+        dump_process.stdout.close()
+        if dump_process.poll() is None:
+            dump_process.kill()
+            dump_process.wait()
+    print("\U0001f680 Uploaded")
+    print(colored("\U0001F44D That's all!", "green"))
+
+
+def chunked_backup():
+    print("\U0001F4E6 Chunked database backup started")
+    dump_process = subprocess.Popen(
+        get_plain_dump_command(), shell=True, stdout=subprocess.PIPE)
+
+    def check_dump_finished():
+        status = dump_process.wait()
+        if status != 0:
+            raise RuntimeError(
+                f"Dump database command exits with status {status}.")
+
+    index = chunked.ChunkIndex(CHUNK_INDEX_FILE)
+    started = time.monotonic()
+    try:
+        stats = chunked.chunked_backup(
+            dump_process.stdout, get_s3_instance(), S3_BUCKET_NAME,
+            f'db-{get_now_datetime_str()}{chunked.MANIFEST_SUFFIX}',
+            BACKUP_KEY_PUB_FILE, index, UPLOAD_CONCURRENCY,
+            check_stream_ok=check_dump_finished)
+    except RuntimeError as e:
+        exit(f"\U00002757 {e} Manifest is not uploaded.")
+    finally:
+        index.close()
+        dump_process.stdout.close()
+        if dump_process.poll() is None:
+            dump_process.kill()
+            dump_process.wait()
+    print(f"\U0001f680 Uploaded {stats.new_chunks} of {stats.chunks} chunks, "
+          f"{round(stats.uploaded_bytes / (1024 * 1024))} MB of "
+          f"{round(stats.total_bytes / (1024 * 1024))} MB dump in "
+          f"{time.monotonic() - started:.1f} sec")
+    print(colored("\U0001F44D That's all!", "green"))
+
+
+class _UploadProgress:
+    """Thread safe uploaded bytes counter, that prints throughput"""
+
+    def __init__(self):
+        self.uploaded = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, size: int):
+        with self._lock:
+            self.uploaded += size
+            self._print()
+
+    def finish(self):
+        self._print(end="\n")
+
+    def _print(self, end: str = ""):
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        megabytes = self.uploaded / (1024 * 1024)
+        print(f"\r\U000023F3 {megabytes:.1f} MB uploaded, "
+              f"{megabytes / elapsed:.1f} MB/s", end=end, flush=True)
+
+
+def _read_exactly(stream, size: int) -> bytes:
+    """Read size bytes from stream, less only if stream ended"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
 def remove_temp_files():
     os.remove(DB_FILENAME)
     print(colored("\U0001F44D That's all!", "green"))
@@ -80,6 +285,12 @@ def remove_temp_files():
 if __name__ == "__main__":
     say_hello()
     check_key_file_exists()
+    if "--stream" in sys.argv[1:]:
+        stream_backup()
+        exit()
+    if "--chunked" in sys.argv[1:]:
+        chunked_backup()
+        exit()
     dump_database()
     upload_dump_to_s3()
     remove_temp_files()
@@ -0,0 +1,147 @@
+"""
+Compare bytes uploaded and wall time of the full dump backup path
+(gzip | openssl smime, one object per backup) and chunked incremental
+backups (chunked.py) on two consecutive synthetic dumps, the second one
+with a small share of changed and appended rows. Chunking alone is timed
+too, it has to be faster than the upload it feeds.
+
+S3 is replaced with in-memory stand-in that counts uploaded bytes,
+keys are generated with openssl into a temp dir:
+
+    python3 benchmark_chunked.py --size-mb 64 --changed 0.01
+"""
+import argparse
+import gzip
+import io
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+import chunked
+
+
+class MemoryS3:
+    def __init__(self):
+        self.objects = {}
+        self.uploaded_bytes = 0
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes):
+        self.objects[Key] = Body
+        self.uploaded_bytes += len(Body)
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+
+def generate_dump(rows: list) -> bytes:
+    return ("COPY public.expense (id, amount, created, category) FROM stdin;\n"
+            + "".join(rows) + "\\.\n").encode()
+
+
+def generate_rows(size: int, rng: random.Random) -> list:
+    rows = []
+    total = 0
+    while total < size:
+        row = (f"{len(rows)}\t{rng.randint(1, 10000)}\t"
+               f"2020-{rng.randint(1, 12):02}-{rng.randint(1, 28):02} "
+               f"{rng.randint(0, 23):02}:{rng.randint(0, 59):02}\t"
+               f"{rng.choice(['products', 'coffee', 'taxi', 'cafe'])}\t"
+               f"{rng.getrandbits(64):016x}\n")
+        rows.append(row)
+        total += len(row)
+    return rows
+
+
+def change_rows(rows: list, share: float, rng: random.Random) -> list:
+    """Update a contiguous range of rows, like a day of edits of recent
+    expenses, and append new rows"""
+    rows = list(rows)
+    count = int(len(rows) * share)
+    start = rng.randrange(len(rows) - count)
+    for i in range(start, start + count):
+        rows[i] = rows[i].replace("\t", "\t9", 1)
+    appended = generate_rows(int(sum(map(len, rows)) * share), rng)
+    return rows + appended
+
+
+def generate_keys(directory: str) -> tuple:
+    private_key = os.path.join(directory, "backup_key.pem")
+    public_key = os.path.join(directory, "backup_key.pem.pub")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-nodes", "-days", "1", "-newkey",
+         "rsa:2048", "-keyout", private_key, "-subj", "/CN=benchmark",
+         "-out", public_key],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return public_key, private_key
+
+
+def full_backup(dump: bytes, public_key: str) -> tuple:
+    started = time.perf_counter()
+    encrypted = subprocess.run(
+        ["openssl", "smime", "-encrypt", "-aes256", "-binary", "-outform",
+         "DEM", public_key],
+        input=gzip.compress(dump, compresslevel=9),
+        stdout=subprocess.PIPE, check=True).stdout
+    return len(encrypted), time.perf_counter() - started
+
+
+def incremental_backup(dump: bytes, s3: MemoryS3, manifest_key: str,
+                       public_key: str, index: chunked.ChunkIndex) -> tuple:
+    uploaded_before = s3.uploaded_bytes
+    started = time.perf_counter()
+    stats = chunked.chunked_backup(
+        io.BytesIO(dump), s3, "benchmark", manifest_key, public_key, index)
+    elapsed = time.perf_counter() - started
+    return s3.uploaded_bytes - uploaded_before, elapsed, stats
+
+
+def chunking_speed(dump: bytes) -> float:
+    """MB per second split into chunks, without compression and upload"""
+    started = time.perf_counter()
+    for _ in chunked.iter_chunks(io.BytesIO(dump)):
+        pass
+    return len(dump) / (1024 * 1024) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--changed", type=float, default=0.01,
+                        help="share of updated and of appended rows")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    day_1_rows = generate_rows(args.size_mb * 1024 * 1024, rng)
+    dumps = [generate_dump(day_1_rows),
+             generate_dump(change_rows(day_1_rows, args.changed, rng))]
+
+    print(f"Chunking: {chunking_speed(dumps[0]):.1f} MB/s")
+    with tempfile.TemporaryDirectory() as directory:
+        public_key, private_key = generate_keys(directory)
+        index = chunked.ChunkIndex(os.path.join(directory, "index.sqlite3"))
+        s3 = MemoryS3()
+        print(f"{'backup':<22}{'dump MB':>10}{'uploaded MB':>14}{'sec':>10}")
+        for day, dump in enumerate(dumps, start=1):
+            dump_mb = len(dump) / (1024 * 1024)
+            uploaded, elapsed = full_backup(dump, public_key)
+            print(f"{f'day {day} full':<22}{dump_mb:>10.1f}"
+                  f"{uploaded / (1024 * 1024):>14.2f}{elapsed:>10.2f}")
+            uploaded, elapsed, stats = incremental_backup(
+                dump, s3, f"db-{day}{chunked.MANIFEST_SUFFIX}",
+                public_key, index)
+            print(f"{f'day {day} chunked':<22}{dump_mb:>10.1f}"
+                  f"{uploaded / (1024 * 1024):>14.2f}{elapsed:>10.2f}"
+                  f"   {stats.new_chunks} of {stats.chunks} chunks new")
+        index.close()
+
+        restored = b"".join(chunked.iter_restored_chunks(
+            s3, "benchmark", f"db-{len(dumps)}{chunked.MANIFEST_SUFFIX}",
+            private_key))
+        assert restored == dumps[-1], "restored dump differs from original"
+        print("Restored last chunked backup matches the dump")
+
+
+if __name__ == "__main__":
+    main()
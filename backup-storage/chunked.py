@@ -0,0 +1,233 @@
+"""
+Incremental deduplicated backups with content-defined chunking.
+
+Plain pg_dump output is split into chunks by a gear rolling hash, so rows
+inserted or deleted in the middle of the dump change only the chunks around
+them. Every chunk is compressed, encrypted and stored in S3 once as
+chunks/<sha256>.gz.enc. Backup itself is a manifest with the ordered list of
+chunk hashes, restore.py reassembles the dump from it.
+
+Hashes of already uploaded chunks are kept in the local SQLite chunk index,
+so unchanged chunks are neither encrypted nor uploaded again.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+import gzip
+import hashlib
+import json
+import random
+import sqlite3
+import subprocess
+from typing import BinaryIO, Callable, Iterator, Tuple
+
+import numpy as np
+
+CHUNKS_PREFIX = "chunks/"
+MANIFEST_SUFFIX = ".manifest.json"
+
+CHUNK_MIN_SIZE = 1024 * 1024
+CHUNK_AVG_SIZE = 4 * 1024 * 1024
+CHUNK_MAX_SIZE = 16 * 1024 * 1024
+
+_READ_SIZE = 1024 * 1024
+# Gear table must never change: other values move chunk boundaries and
+# every chunk would be uploaded again
+_GEAR = [random.Random(i).getrandbits(32) for i in range(256)]
+_GEAR_TABLE = np.array(_GEAR, dtype=np.uint32)
+# Bytes hashed at a time when looking for a boundary
+_SCAN_SIZE = 1024 * 1024
+# Gear hash is 32 bits and shifted left once per byte, so it only depends
+# on the last _WINDOW bytes
+_WINDOW = 32
+
+
+@dataclass
+class ChunkedBackupStats:
+    total_bytes: int = 0
+    uploaded_bytes: int = 0
+    chunks: int = 0
+    new_chunks: int = 0
+
+
+class ChunkIndex:
+    """Local index of chunk hashes that are already stored in S3"""
+
+    def __init__(self, filename: str):
+        self._connection = sqlite3.connect(filename)
+        self._connection.execute(
+            "create table if not exists chunk(hash text primary key)")
+
+    def __contains__(self, chunk_hash: str) -> bool:
+        return self._connection.execute(
+            "select 1 from chunk where hash = ?", (chunk_hash,)
+        ).fetchone() is not None
+
+    def add(self, chunk_hash: str):
+        with self._connection:
+            self._connection.execute(
+                "insert or ignore into chunk(hash) values (?)", (chunk_hash,))
+
+    def close(self):
+        self._connection.close()
+
+
+def iter_chunks(stream: BinaryIO,
+                min_size: int = CHUNK_MIN_SIZE,
+                avg_size: int = CHUNK_AVG_SIZE,
+                max_size: int = CHUNK_MAX_SIZE) -> Iterator[bytes]:
+    """Split stream into content-defined chunks.
+
+    Boundary is placed where the top bits of the gear hash are zero, bit
+    count is log2(avg_size - min_size), first min_size bytes of every chunk
+    are not hashed at all.
+    """
+    bits = max((avg_size - min_size).bit_length() - 1, 1)
+    # top bits of the hash are zero exactly when it is below limit
+    limit = 1 << (32 - bits)
+    buffer = bytearray()
+    eof = False
+    while True:
+        while not eof and len(buffer) < max_size:
+            block = stream.read(_READ_SIZE)
+            if not block:
+                eof = True
+            buffer += block
+        if not buffer:
+            return
+        end = min(len(buffer), max_size)
+        boundary = _find_boundary(buffer, min(min_size, end), end, limit)
+        yield bytes(buffer[:boundary])
+        del buffer[:boundary]
+
+
+def _find_boundary(buffer: bytearray, start: int, end: int, limit: int) -> int:
+    """Position after the first byte in buffer[start:end] where the gear hash
+    started at start is below limit, end if there is none.
+
+    Hash of a position is the sum of gear[byte] << distance over the last
+    _WINDOW bytes, it is computed for _SCAN_SIZE bytes at once by doubling
+    the window: hash over 2w bytes = hash over w + (hash w bytes back << w).
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    for scan_start in range(start, end, _SCAN_SIZE):
+        scan_end = min(scan_start + _SCAN_SIZE, end)
+        # preceding bytes still in the window of scan_start, none before start
+        window_start = max(start, scan_start - _WINDOW + 1)
+        hashes = _GEAR_TABLE.take(data[window_start:scan_end])
+        width = 1
+        while width < _WINDOW:
+            hashes[width:] += hashes[:-width] << width
+            width *= 2
+        below = hashes[scan_start - window_start:] < np.uint32(limit)
+        first = int(below.argmax())
+        if below[first]:
+            return scan_start + first + 1
+    return end
+
+
+def chunk_key(chunk_hash: str) -> str:
+    return f"{CHUNKS_PREFIX}{chunk_hash}.gz.enc"
+
+
+def encrypt_chunk(chunk: bytes, public_key_file: str) -> bytes:
+    return _openssl_smime(
+        ["-encrypt", "-aes256", "-binary", "-outform", "DEM",
+         public_key_file],
+        gzip.compress(chunk, compresslevel=9))
+
+
+def decrypt_chunk(data: bytes, private_key_file: str) -> bytes:
+    return gzip.decompress(_openssl_smime(
+        ["-decrypt", "-binary", "-inform", "DEM", "-inkey", private_key_file],
+        data))
+
+
+def chunked_backup(stream: BinaryIO, s3, bucket: str, manifest_key: str,
+                   public_key_file: str, index: ChunkIndex,
+                   concurrency: int = 4,
+                   check_stream_ok: Callable[[], None] = None
+                   ) -> ChunkedBackupStats:
+    """Upload chunks of stream that are not in index yet, then manifest.
+
+    Chunks are compressed, encrypted and uploaded by concurrency threads,
+    no more than concurrency + 1 chunks are kept in memory. check_stream_ok
+    is called after the stream ended and may raise to skip the manifest.
+    """
+    stats = ChunkedBackupStats()
+    chunk_hashes = []
+    pending = set()
+
+    def upload_chunk(chunk_hash: str, chunk: bytes) -> Tuple[str, int]:
+        body = encrypt_chunk(chunk, public_key_file)
+        s3.put_object(Bucket=bucket, Key=chunk_key(chunk_hash), Body=body)
+        return chunk_hash, len(body)
+
+    def collect(futures):
+        for future in futures:
+            chunk_hash, uploaded = future.result()
+            index.add(chunk_hash)
+            stats.uploaded_bytes += uploaded
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = set()
+        for chunk in iter_chunks(stream):
+            chunk_hash = hashlib.sha256(chunk).hexdigest()
+            chunk_hashes.append(chunk_hash)
+            stats.chunks += 1
+            stats.total_bytes += len(chunk)
+            if chunk_hash in pending or chunk_hash in index:
+                continue
+            pending.add(chunk_hash)
+            stats.new_chunks += 1
+            if len(in_flight) >= concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(executor.submit(upload_chunk, chunk_hash, chunk))
+        collect(in_flight)
+    if check_stream_ok:
+        check_stream_ok()
+
+    manifest = json.dumps({
+        "version": 1,
+        "size": stats.total_bytes,
+        "chunks": chunk_hashes,
+    }).encode()
+    s3.put_object(Bucket=bucket, Key=manifest_key, Body=manifest)
+    stats.uploaded_bytes += len(manifest)
+    return stats
+
+
+def iter_restored_chunks(s3, bucket: str, manifest_key: str,
+                         private_key_file: str,
+                         concurrency: int = 4) -> Iterator[bytes]:
+    """Download and decrypt chunks listed in manifest, yield them in order"""
+    manifest = json.loads(
+        s3.get_object(Bucket=bucket, Key=manifest_key)["Body"].read())
+
+    def download_chunk(chunk_hash: str) -> bytes:
+        data = s3.get_object(
+            Bucket=bucket, Key=chunk_key(chunk_hash))["Body"].read()
+        chunk = decrypt_chunk(data, private_key_file)
+        if hashlib.sha256(chunk).hexdigest() != chunk_hash:
+            raise ValueError(f"chunk {chunk_hash} is corrupted")
+        return chunk
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = []
+        for chunk_hash in manifest["chunks"]:
+            futures.append(executor.submit(download_chunk, chunk_hash))
+            if len(futures) >= concurrency:
+                yield futures.pop(0).result()
+        for future in futures:
+            yield future.result()
+
+
+def _openssl_smime(args: list, data: bytes) -> bytes:
+    result = subprocess.run(
+        ["openssl", "smime", *args], input=data,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"openssl smime exits with status {result.returncode}: "
+            f"{result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
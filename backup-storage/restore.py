@@ -3,21 +3,43 @@ Renew database on current server, if hostname startswith loader*
 or ends with .local (can be modified in check_hostname function below).
 Script download last dump from S3 (Yandex Object Storage), decrypt
 and load it after clear current database state.
+
+Run with --stream to download the dump with parallel ranged requests and
+pipe it through decrypt, gunzip and psql (or pg_restore for custom format
+dumps) without temp files. With --chunked the last chunked backup manifest
+is restored (see chunked.py).
 """
+from concurrent.futures import ThreadPoolExecutor
 import os
 from pathlib import Path
+import shutil
 import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 
 import boto3
+from botocore.exceptions import BotoCoreError, ClientError
 import psycopg2
 from termcolor import colored
 
+import chunked
+
 
 DB_HOSTNAME = os.getenv("DB_HOSTNAME", "localhost")
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 BACKUP_KEY_PRIVATE_FILE = os.getenv("BACKUP_KEY_PRIVATE_FILE")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "https://storage.yandexcloud.net")
+DOWNLOAD_PART_SIZE = int(os.getenv("DOWNLOAD_PART_SIZE_MB", "16")) * 1024 * 1024
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "5"))
+RESTORE_JOBS = int(os.getenv("RESTORE_JOBS", "1"))
+
+PG_CUSTOM_FORMAT_MAGIC = b"PGDMP"
 
 DB_FILENAME = '/tmp/backup_db.sql.gz.enc'
 
@@ -55,15 +77,23 @@ def get_s3_instance():
     session = boto3.session.Session()
     return session.client(
         service_name='s3',
-        endpoint_url='https://storage.yandexcloud.net'
+        endpoint_url=S3_ENDPOINT_URL
     )
 
 
-def get_last_backup_filename():
+def get_last_backup_filename(suffix: str = ".sql.gz.enc"):
     s3 = get_s3_instance()
-    dumps = s3.list_objects(Bucket=S3_BUCKET_NAME)['Contents']
-    dumps.sort(key=lambda x: x['LastModified'])
-    last_backup_filename = dumps[-1]
+    last_backup_filename = None
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix='db-'):
+        for dump in page.get('Contents', []):
+            if not dump['Key'].endswith(suffix):
+                continue
+            if (last_backup_filename is None or
+                    dump['LastModified'] > last_backup_filename['LastModified']):
+                last_backup_filename = dump
+    if last_backup_filename is None:
+        exit(f"\U00002757 There are no backups in {S3_BUCKET_NAME} bucket.")
     print(f"\U000023F3 Last backup in S3 is {last_backup_filename['Key']}, "
           f"{round(last_backup_filename['Size'] / (1024*1024))} MB, "
           f"download it")
@@ -121,6 +151,91 @@ def load_database():
     print(f"\U0001F916 Database loaded")
 
 
+def stream_restore_database(filename: str):
+    """Download, decrypt, unzip and load dump without temp files.
+
+    Parallel ranged downloads are written in order into
+    openssl | gzip pipeline, its output goes to psql for plain SQL dumps and
+    to pg_restore for custom format ones. Current database is cleared only
+    when the pipeline starts to emit the dump.
+
+    openssl decrypts S/MIME (and CMS) only after reading the whole input, so
+    it keeps the full encrypted dump in memory: streaming saves disk space
+    and temp files, not memory.
+    """
+    print(f"\U0001F4A4 Streaming database restore started")
+    unpack_process = subprocess.Popen(
+        ["bash", "-o", "pipefail", "-c",
+         f"openssl smime -decrypt -binary -inform DEM "
+         f"-inkey {BACKUP_KEY_PRIVATE_FILE} | gzip -dc"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    download_errors = []
+    downloader = threading.Thread(
+        target=_download_to_pipe,
+        args=(filename, unpack_process.stdin, download_errors),
+        daemon=True)
+    downloader.start()
+
+    # Nothing comes out until the dump is downloaded and decrypted
+    head = unpack_process.stdout.read(len(PG_CUSTOM_FORMAT_MAGIC))
+    load_status = 0
+    if head:
+        clear_database()
+        if head == PG_CUSTOM_FORMAT_MAGIC:
+            load_status = _pg_restore_stream(head, unpack_process.stdout)
+        else:
+            load_status = _psql_stream(head, unpack_process.stdout)
+    # If loader stopped early, this makes the whole pipeline stop too
+    unpack_process.stdout.close()
+    downloader.join()
+    unpack_status = unpack_process.wait()
+
+    if load_status != 0:
+        exit(f"\U00002757 Can not load database, status {load_status}.")
+    if download_errors:
+        exit(f"\U00002757 Can not download {filename}: {download_errors[0]}")
+    if unpack_status != 0:
+        exit(f"\U00002757 Can not unecrypt db file, status {unpack_status}.")
+    if not head:
+        exit(f"\U00002757 Dump {filename} is empty, database is not changed.")
+    print(f"\U0001F916 Database loaded")
+
+
+def chunked_restore_database(manifest_filename: str):
+    print(f"\U0001F4A4 Chunked database restore started")
+    chunks = chunked.iter_restored_chunks(
+        get_s3_instance(), S3_BUCKET_NAME, manifest_filename,
+        BACKUP_KEY_PRIVATE_FILE, DOWNLOAD_CONCURRENCY)
+    try:
+        first_chunk = next(chunks, b"")
+    except (BotoCoreError, ClientError, RuntimeError, ValueError) as e:
+        exit(f"\U00002757 Can not restore {manifest_filename}, database is "
+             f"not changed: {e}")
+    # Current database is kept until the first chunk is decrypted and verified
+    clear_database()
+    load_process = subprocess.Popen(
+        ["psql", "-h", DB_HOSTNAME, "-U", DB_USER, DB_NAME],
+        stdin=subprocess.PIPE)
+    try:
+        load_process.stdin.write(first_chunk)
+        for chunk in chunks:
+            load_process.stdin.write(chunk)
+    except BrokenPipeError:
+        pass
+    except (BotoCoreError, ClientError, RuntimeError, ValueError) as e:
+        load_process.kill()
+        exit(f"\U00002757 Can not restore {manifest_filename}: {e}")
+    finally:
+        try:
+            load_process.stdin.close()
+        except BrokenPipeError:
+            pass
+    operation_status = load_process.wait()
+    if operation_status != 0:
+        exit(f"\U00002757 Can not load database, status {operation_status}.")
+    print(f"\U0001F916 Database loaded")
+
+
 def remove_temp_files():
     _silent_remove_file(DB_FILENAME)
     print(colored("\U0001F44D That's all!", "green"))
@@ -135,6 +250,123 @@ def _get_all_db_tables():
         tables.append(row[0])
     return tables
 
+def _download_to_pipe(filename: str, pipe, errors: list):
+    try:
+        _download_s3_file_parallel(filename, pipe)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            pipe.close()
+        except BrokenPipeError:
+            pass
+
+
+def _download_s3_file_parallel(filename: str, out):
+    """Download S3 object by ranges in parallel and write them to out in
+    order. No more than DOWNLOAD_CONCURRENCY ranges are kept in memory"""
+    s3 = get_s3_instance()
+    head = s3.head_object(Bucket=S3_BUCKET_NAME, Key=filename)
+    size, etag = head['ContentLength'], head['ETag']
+    ranges = [(start, min(start + DOWNLOAD_PART_SIZE, size) - 1)
+              for start in range(0, size, DOWNLOAD_PART_SIZE)]
+    started = time.monotonic()
+    downloaded = 0
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY) as executor:
+        futures = []
+        for start, end in ranges:
+            futures.append(executor.submit(
+                _download_range, s3, filename, etag, start, end))
+            if len(futures) < DOWNLOAD_CONCURRENCY:
+                continue
+            downloaded += _write_part(futures.pop(0), out)
+            _print_progress(downloaded, size, started)
+        for future in futures:
+            downloaded += _write_part(future, out)
+            _print_progress(downloaded, size, started)
+    print()
+
+
+def _write_part(future, out) -> int:
+    part = future.result()
+    out.write(part)
+    return len(part)
+
+
+def _download_range(s3, filename: str, etag: str, start: int, end: int) -> bytes:
+    """Download bytes start..end of the object. After network failure
+    download is resumed from the last received byte"""
+    received = bytearray()
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        try:
+            response = s3.get_object(
+                Bucket=S3_BUCKET_NAME, Key=filename, IfMatch=etag,
+                Range=f"bytes={start + len(received)}-{end}")
+            for chunk in response['Body'].iter_chunks(1024 * 1024):
+                received += chunk
+            if len(received) != end - start + 1:
+                raise IOError(f"range {start}-{end} is incomplete")
+            return bytes(received)
+        except (BotoCoreError, ClientError, IOError) as e:
+            if attempt == DOWNLOAD_RETRIES or _is_precondition_failed(e):
+                raise
+            delay = 2 ** attempt
+            print(f"\n\U00002757 Range {start}-{end} download failed ({e}), "
+                  f"resume in {delay} sec")
+            time.sleep(delay)
+
+
+def _is_precondition_failed(error: Exception) -> bool:
+    """Backup was overwritten while downloading, can not resume it"""
+    return (isinstance(error, ClientError) and
+            error.response['Error']['Code'] in ('PreconditionFailed', '412'))
+
+
+def _print_progress(downloaded: int, size: int, started: float):
+    elapsed = max(time.monotonic() - started, 1e-6)
+    megabytes = downloaded / (1024 * 1024)
+    print(f"\r\U000023F3 {megabytes:.1f} of {round(size / (1024 * 1024))} MB "
+          f"downloaded, {megabytes / elapsed:.1f} MB/s", end="", flush=True)
+
+
+def _psql_stream(head: bytes, dump) -> int:
+    load_process = subprocess.Popen(
+        ["psql", "-h", DB_HOSTNAME, "-U", DB_USER, DB_NAME],
+        stdin=subprocess.PIPE)
+    _copy_stream(head, dump, load_process.stdin)
+    return load_process.wait()
+
+
+def _pg_restore_stream(head: bytes, dump) -> int:
+    """Custom format dump is loaded with pg_restore. Parallel pg_restore
+    needs seekable input, so with RESTORE_JOBS > 1 the dump is spooled to
+    a temp file first"""
+    command = ["pg_restore", "-h", DB_HOSTNAME, "-U", DB_USER, "-d", DB_NAME]
+    if RESTORE_JOBS <= 1:
+        load_process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        _copy_stream(head, dump, load_process.stdin)
+        return load_process.wait()
+    with tempfile.NamedTemporaryFile(suffix=".dump") as dump_file:
+        _copy_stream(head, dump, dump_file)
+        dump_file.flush()
+        return subprocess.call(
+            command + ["-j", str(RESTORE_JOBS), dump_file.name])
+
+
+def _copy_stream(head: bytes, source, destination):
+    try:
+        destination.write(head)
+        shutil.copyfileobj(source, destination, 1024 * 1024)
+    except BrokenPipeError:
+        # Loader failed, its exit status is reported by the caller
+        pass
+    finally:
+        try:
+            destination.close()
+        except BrokenPipeError:
+            pass
+
+
 def _silent_remove_file(filename: str):
     try:
         os.remove(filename)
@@ -146,6 +378,17 @@ if __name__ == "__main__":
     say_hello()
     check_hostname()
     check_key_file_exists()
+    if "--stream" in sys.argv[1:]:
+        last_backup_filename = get_last_backup_filename()
+        stream_restore_database(last_backup_filename)
+        print(colored("\U0001F44D That's all!", "green"))
+        exit()
+    if "--chunked" in sys.argv[1:]:
+        last_manifest_filename = get_last_backup_filename(
+            chunked.MANIFEST_SUFFIX)
+        chunked_restore_database(last_manifest_filename)
+        print(colored("\U0001F44D That's all!", "green"))
+        exit()
     download_s3_file(get_last_backup_filename())
     unencrypt_database()
     unzip_database()
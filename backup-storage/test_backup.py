@@ -0,0 +1,111 @@
+"""
+Streamed backup against moto's in-memory S3, the dump is random bytes
+instead of pg_dump output:
+
+    pip install "moto[s3]" pytest && python3 -m pytest
+"""
+import gzip
+import os
+import subprocess
+import threading
+
+import pytest
+
+import backup
+
+moto = pytest.importorskip("moto")
+
+PART_SIZE = backup.S3_MIN_PART_SIZE
+BUCKET = "backups"
+
+
+@pytest.fixture
+def keys(tmp_path, monkeypatch):
+    private_key = tmp_path / "backup_key.pem"
+    public_key = tmp_path / "backup_key.pem.pub"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-nodes", "-days", "1", "-newkey",
+         "rsa:2048", "-keyout", private_key, "-subj", "/CN=test",
+         "-out", public_key],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    monkeypatch.setattr(backup, "BACKUP_KEY_PUB_FILE", str(public_key))
+    return private_key
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for name, value in (("AWS_ACCESS_KEY_ID", "test"),
+                        ("AWS_SECRET_ACCESS_KEY", "test"),
+                        ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(backup, "S3_ENDPOINT_URL", None)
+    monkeypatch.setattr(backup, "S3_BUCKET_NAME", BUCKET)
+    with moto.mock_aws():
+        client = backup.get_s3_instance()
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def use_dump(monkeypatch, command: str):
+    monkeypatch.setattr(backup, "get_plain_dump_command", lambda: command)
+
+
+def dump_finished(dump_process: subprocess.Popen):
+    def check_dump_finished():
+        if dump_process.wait() != 0:
+            raise RuntimeError("dump failed")
+    return check_dump_finished
+
+
+def decrypt(data: bytes, private_key) -> bytes:
+    return subprocess.run(
+        ["openssl", "smime", "-decrypt", "-binary", "-inform", "DEM",
+         "-inkey", private_key],
+        input=data, stdout=subprocess.PIPE, check=True).stdout
+
+
+def test_dump_is_encrypted_while_it_runs(keys, monkeypatch):
+    # the dump does not end before the test reads from the pipeline
+    use_dump(monkeypatch, "(head -c 4000000 /dev/urandom; sleep 5)")
+    dump_process = backup.start_dump_stream()
+    received = []
+    reader = threading.Thread(
+        target=lambda: received.append(dump_process.stdout.read(65536)))
+    reader.start()
+    reader.join(timeout=4)
+    dump_process.kill()
+    dump_process.wait()
+    dump_process.stdout.close()
+    assert received and received[0]
+
+
+def test_streamed_multipart_upload(keys, s3, tmp_path, monkeypatch):
+    dump = tmp_path / "dump.sql"
+    # random bytes do not compress, so the upload has three parts
+    dump.write_bytes(os.urandom(2 * PART_SIZE + 12345))
+    use_dump(monkeypatch, f"cat {dump}")
+    dump_process = backup.start_dump_stream()
+    try:
+        uploaded = backup.stream_dump_to_s3(
+            dump_process.stdout, part_size=PART_SIZE, concurrency=2,
+            key="db.sql.gz.enc", check_stream_ok=dump_finished(dump_process))
+    finally:
+        dump_process.stdout.close()
+        dump_process.wait()
+    stored = s3.get_object(Bucket=BUCKET, Key="db.sql.gz.enc")
+    assert stored["ContentLength"] == uploaded > 2 * PART_SIZE
+    assert stored["ETag"].endswith('-3"')
+    restored = gzip.decompress(decrypt(stored["Body"].read(), keys))
+    assert restored == dump.read_bytes()
+
+
+def test_failed_dump_aborts_the_upload(keys, s3, monkeypatch):
+    use_dump(monkeypatch, "(head -c 100 /dev/urandom; exit 3)")
+    dump_process = backup.start_dump_stream()
+    with pytest.raises(RuntimeError):
+        backup.stream_dump_to_s3(
+            dump_process.stdout, part_size=PART_SIZE, key="db.sql.gz.enc",
+            check_stream_ok=dump_finished(dump_process))
+    dump_process.stdout.close()
+    assert "Contents" not in s3.list_objects_v2(Bucket=BUCKET)
+    assert not s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads")
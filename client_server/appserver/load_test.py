@@ -0,0 +1,153 @@
+"""Load generator for the chat server.
+
+Opens many concurrent chat connections, lets a few of them talk and
+measures delivered messages per second and delivery latency. Some
+connections can be made slow consumers, which never read, to check that
+the server drops them instead of stalling everyone else.
+
+    python server.py &
+    python load_test.py --clients 5000 --talkers 20 --slow 10
+"""
+import argparse
+import asyncio
+import re
+import resource
+import statistics
+import time
+
+from server import HOST, PORT
+
+MESSAGE = re.compile(rb"t:(\d+\.\d+)\n")
+
+
+class Stats:
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.delivered = 0
+        self.latencies = []
+
+
+async def connect(host, port, nickname, stats):
+    reader, writer = await asyncio.open_connection(host, port)
+    await reader.readexactly(len(b"NICK"))
+    writer.write(nickname.encode('utf-8'))
+    await writer.drain()
+    stats.connected += 1
+    return reader, writer
+
+
+async def listen(reader, stats, stop):
+    buffer = b""
+    while not stop.is_set():
+        data = await reader.read(65536)
+        if not data:
+            return
+        buffer += data
+        now = time.perf_counter()
+        end = 0
+        for match in MESSAGE.finditer(buffer):
+            stats.delivered += 1
+            stats.latencies.append(now - float(match.group(1)))
+            end = match.end()
+        buffer = buffer[end:] if end else buffer[-64:]
+
+
+async def talk(writer, interval, size, stop):
+    padding = "x" * max(size - len("t:0000000.000000\n"), 0)
+    while not stop.is_set():
+        writer.write(
+            f"{padding}t:{time.perf_counter():.6f}\n".encode('utf-8'))
+        await writer.drain()
+        await asyncio.sleep(interval)
+
+
+async def was_dropped(reader):
+    """Reads what a slow client has not read yet, True if the server
+    closed the connection behind it"""
+    try:
+        while await asyncio.wait_for(reader.read(65536), 1):
+            pass
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+async def run(args):
+    stats = Stats()
+    stop = asyncio.Event()
+    connections = []
+    tasks = []
+    for start in range(0, args.clients, 500):
+        results = await asyncio.gather(
+            *(connect(args.host, args.port, f"user{number}", stats)
+              for number in range(start, min(start + 500, args.clients))),
+            return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                stats.failed += 1
+                continue
+            # start reading right away, a client that does not read while
+            # the others join is a slow consumer too
+            if len(connections) >= args.slow:
+                tasks.append(
+                    asyncio.create_task(listen(result[0], stats, stop)))
+            connections.append(result)
+    print(f"{stats.connected} connected, {stats.failed} failed")
+
+    slow = connections[:args.slow]
+    active = connections[args.slow:]
+    tasks += [asyncio.create_task(
+                  talk(writer, args.interval, args.size, stop))
+              for _, writer in active[:args.talkers]]
+
+    stats.latencies.clear()
+    started = time.perf_counter()
+    delivered_before = stats.delivered
+    await asyncio.sleep(args.duration)
+    elapsed = time.perf_counter() - started
+    delivered = stats.delivered - delivered_before
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    dropped = sum(await asyncio.gather(
+        *(was_dropped(reader) for reader, _ in slow)))
+    for _, writer in connections:
+        writer.close()
+
+    print(f"{delivered / elapsed:.0f} messages delivered per second "
+          f"to {len(active)} clients")
+    if stats.latencies:
+        latencies = sorted(stats.latencies)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+              f"p99 {p99 * 1000:.1f} ms")
+    if slow:
+        print(f"{dropped} of {len(slow)} slow clients were disconnected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--talkers", type=int, default=10)
+    parser.add_argument("--slow", type=int, default=0)
+    parser.add_argument("--interval", type=float, default=0.1,
+                        help="seconds between messages of one talker")
+    parser.add_argument("--size", type=int, default=32,
+                        help="bytes per message")
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    # every connection is a file descriptor, on both ends when run locally
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,54 +1,128 @@
+import asyncio
 import socket
-from threading import Thread
+from collections import deque
 
 HOST = socket.gethostbyname(socket.gethostname())
 PORT = 9999
 
-server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server.bind((HOST, PORT))
+# bytes waiting to be sent to one client; a client that falls this far
+# behind is a slow consumer and gets disconnected
+OUTGOING_LIMIT = 256 * 1024
 
-server.listen()
 
-clients = []
-nicknames = []
+class Client:
+    def __init__(self, nickname, writer):
+        self.nickname = nickname
+        self.writer = writer
+        self.outgoing = bytearray()
+        self.ready = asyncio.Event()
+        self.sender = asyncio.create_task(self.send_outgoing())
 
-def broadcast(message):
-    for client in clients:
-        client.send(message)
+    def send(self, message):
+        """Queues the message without waiting, False if the client is too
+        far behind"""
+        if len(self.outgoing) + len(message) > OUTGOING_LIMIT:
+            return False
+        self.outgoing += message
+        self.ready.set()
+        return True
 
-def handle_connection(client):
-    stop = False
-    while not stop:
+    async def send_outgoing(self):
+        # everything queued since the last write goes out in one write
         try:
-            message = client.recv(1024)
-            broadcast(message)
-        except:
-            index = clients.index(client)
-            clients.remove(client)
-            nickname = nickname[index]
-            nicknames.remove(nickname)
-            broadcast(f"{nickname} left the chat!".encode('utf-8'))
-            stop = True
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                data, self.outgoing = self.outgoing, bytearray()
+                self.writer.write(data)
+                await self.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def close(self):
+        self.sender.cancel()
+        self.writer.close()
+
+
+clients = {}
+
+
+def broadcast(message):
+    # clients dropped for being slow are announced after the loop, from
+    # this queue, so dropping never recurses into another broadcast
+    pending = deque([message])
+    while pending:
+        message = pending.popleft()
+        slow = []
+        for client in list(clients.values()):
+            if client.writer not in clients:
+                continue
+            if not client.send(message):
+                slow.append(client)
+        for client in slow:
+            if disconnect(client):
+                print(f"Dropping slow client {client.nickname}")
+                pending.append(left_message(client))
+
+
+def left_message(client):
+    return f"{client.nickname} left the chat!".encode('utf-8')
 
-def main():
-    print("Server is running...")
-    while True:
-        client, addr = server.accept()
-        print(f"Connected to {addr}")
 
-        client.send("NICK".encode('utf-8'))
+def disconnect(client):
+    """Closes the client, False if it was already gone"""
+    if clients.pop(client.writer, None) is None:
+        return False
+    client.close()
+    return True
 
-        nickname = client.recv(1024).decode('utf-8')
-        nicknames.append(nickname)
-        clients.append(client)
-        print(f"Nickname is {nickname}")
 
-        broadcast(f"{nickname} joined the chat!".encode('utf-8'))
+def remove_client(client):
+    if disconnect(client):
+        broadcast(left_message(client))
 
-        client.send("You are now connected!".encode('utf-8'))
 
-        thread = Thread(target=handle_connection, args=(client,))
-        thread.start()
+async def handle_connection(reader, writer):
+    print(f"Connected to {writer.get_extra_info('peername')}")
+    try:
+        writer.write("NICK".encode('utf-8'))
+        await writer.drain()
+        nickname = (await reader.read(1024)).decode('utf-8')
+    except ConnectionError:
+        writer.close()
+        return
+    if not nickname:
+        writer.close()
+        return
+
+    client = Client(nickname, writer)
+    clients[writer] = client
+    print(f"Nickname is {nickname}")
+
+    broadcast(f"{nickname} joined the chat!".encode('utf-8'))
+
+    client.send("You are now connected!".encode('utf-8'))
+
+    try:
+        while message := await reader.read(1024):
+            broadcast(message)
+    except ConnectionError:
+        pass
+    finally:
+        remove_client(client)
+
+
+async def serve(host=HOST, port=PORT):
+    server = await asyncio.start_server(
+        handle_connection, host, port, backlog=4096)
+    print("Server is running...")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    asyncio.run(serve())
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,121 @@
+'''
+Headless players for load testing the game server.
+
+Every bot walks around randomly, sends its position like game.py does and
+pings the server twice a second. For every player count the bots report
+the round trip time and how many bytes per second each player received.
+
+    python server.py &
+    python bot.py --players 2 8 32 128 --duration 10
+'''
+
+import argparse
+import asyncio
+import random
+import resource
+import statistics
+import time
+
+import protocol
+from server import server, port
+
+WIDTH = HEIGHT = 500
+
+
+class Bot:
+
+    def __init__(self):
+        self.received = 0
+        self.frames = protocol.FrameReader()
+        self.round_trips = []
+
+    async def run(self, host, port, move_rate, stop):
+        reader, writer = await asyncio.open_connection(host, port)
+        tasks = [asyncio.create_task(self.walk(writer, move_rate, stop)),
+                 asyncio.create_task(self.ping(writer, stop))]
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                self.received += len(data)
+                for kind, body in self.frames.feed(data):
+                    if kind == protocol.PONG:
+                        self.round_trips.append(time.perf_counter() - body[0])
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    @staticmethod
+    async def walk(writer, move_rate, stop):
+        x, y = random.randrange(WIDTH), random.randrange(HEIGHT)
+        while not stop.is_set():
+            x = min(max(x + random.randint(-2, 2), 0), WIDTH)
+            y = min(max(y + random.randint(-2, 2), 0), HEIGHT)
+            writer.write(protocol.position(x, y))
+            await asyncio.sleep(1 / move_rate)
+
+    @staticmethod
+    async def ping(writer, stop):
+        while not stop.is_set():
+            writer.write(protocol.ping(time.perf_counter()))
+            await asyncio.sleep(0.5)
+
+
+async def measure(host, port, players, duration, move_rate):
+    """
+    :return: (round trips in seconds, bytes per second per player)
+    """
+    stop = asyncio.Event()
+    bots = [Bot() for _ in range(players)]
+    tasks = [asyncio.create_task(bot.run(host, port, move_rate, stop))
+             for bot in bots]
+    # let everybody join before measuring
+    await asyncio.sleep(1)
+    for bot in bots:
+        bot.received = 0
+        bot.round_trips.clear()
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    round_trips = [rtt for bot in bots for rtt in bot.round_trips]
+    return round_trips, [bot.received / elapsed for bot in bots]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default=server)
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--players", type=int, nargs="+", default=[2, 8, 32])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--move-rate", type=float, default=30,
+                        help="position updates per second of every bot")
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    print(f"{'players':>8}{'rtt p50, ms':>13}{'rtt p99, ms':>13}"
+          f"{'KB/s per player':>17}")
+    for players in args.players:
+        round_trips, rates = asyncio.run(measure(
+            args.host, args.port, players, args.duration, args.move_rate))
+        round_trips.sort()
+        if round_trips:
+            p50 = f"{statistics.median(round_trips) * 1000:.2f}"
+            p99 = f"{round_trips[int(len(round_trips) * 0.99) - 1] * 1000:.2f}"
+        else:
+            # no PONG came back while measuring
+            p50 = p99 = "-"
+        print(f"{players:>8}{p50:>13}{p99:>13}"
+              f"{statistics.mean(rates) / 1024:>17.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
 import pygame
+
+import protocol
 from network import Network
 
 
@@ -36,12 +38,13 @@ class Game:
         self.width = w
         self.height = h
         self.player = Player(50, 50)
-        self.player2 = Player(100, 100)
+        self.others = {}
         self.canvas = Canvas(self.width, self.height, "Testing...")
 
     def run(self):
         clock = pygame.time.Clock()
         run = True
+        sent_position = None
         while run:
             clock.tick(60)
 
@@ -67,32 +70,38 @@ class Game:
                     self.player.move(3)
 
             # Send Network Stuff
-            self.player2.x, self.player2.y = self.parse_data(self.send_data())
+            position = (self.player.x, self.player.y)
+            if position != sent_position:
+                self.net.send(*position)
+                sent_position = position
+            self.apply_updates(self.net.receive())
 
             # Update Canvas
             self.canvas.draw_background()
             self.player.draw(self.canvas.get_canvas())
-            self.player2.draw(self.canvas.get_canvas())
+            for other in self.others.values():
+                other.draw(self.canvas.get_canvas())
             self.canvas.update()
 
         pygame.quit()
 
-    def send_data(self):
+    def apply_updates(self, messages):
         """
-        Send position to server
+        Move the other players to the positions the server sent
         :return: None
         """
-        data = str(self.net.id) + ":" + str(self.player.x) + "," + str(self.player.y)
-        reply = self.net.send(data)
-        return reply
-
-    @staticmethod
-    def parse_data(data):
-        try:
-            d = data.split(":")[1].split(",")
-            return int(d[0]), int(d[1])
-        except:
-            return 0,0
+        for kind, body in messages:
+            if kind == protocol.STATE:
+                tick, entities = body
+                for player_id, x, y in entities:
+                    if player_id == self.net.id:
+                        continue
+                    if player_id not in self.others:
+                        self.others[player_id] = Player(x, y, (0, 0, 255))
+                    self.others[player_id].x = x
+                    self.others[player_id].y = y
+            elif kind == protocol.LEAVE:
+                self.others.pop(body[0], None)
 
 
 class Canvas:
@@ -1,26 +1,62 @@
 import socket
 
+import protocol
+
+
 class Network:
 
     def __init__(self):
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.host = "172.105.4.10" # CHANGE for YOU server ipv4
         self.port = 5555
         self.addr = (self.host, self.port)
+        self.frames = protocol.FrameReader()
+        self.pending = []
+        # bytes the non-blocking socket did not take yet, sent first
+        self.unsent = bytearray()
         self.id = self.connect()
 
     def connect(self):
         self.client.connect(self.addr)
-        return self.client.recv(2048).decode()
+        while not self.pending:
+            self.pending = self.frames.feed(self.client.recv(2048))
+        kind, (player_id, tick_rate) = self.pending.pop(0)
+        self.client.setblocking(False)
+        return player_id
+
+    def send(self, x, y):
+        """
+        Send position to server
+        :return: None
+        """
+        self.unsent += protocol.position(x, y)
+        self.flush()
+
+    def flush(self):
+        """
+        Send as much of the unsent bytes as the socket takes, the rest is
+        kept for the next call so a frame is never cut off
+        :return: None
+        """
+        while self.unsent:
+            try:
+                sent = self.client.send(self.unsent)
+            except BlockingIOError:
+                return
+            del self.unsent[:sent]
 
-    def send(self, data):
+    def receive(self):
         """
-        :param data: str
-        :return: str
+        :return: list of (type, payload) received since the last call
         """
-        try:
-            self.client.send(str.encode(data))
-            reply = self.client.recv(2048).decode()
-            return reply
-        except socket.error as e:
-            return str(e)
+        self.flush()
+        messages, self.pending = self.pending, []
+        while True:
+            try:
+                data = self.client.recv(65536)
+            except BlockingIOError:
+                return messages
+            if not data:
+                raise ConnectionError("Server closed the connection")
+            messages += self.frames.feed(data)
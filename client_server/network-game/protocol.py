@@ -0,0 +1,108 @@
+'''
+Binary protocol shared by the server, the game client and the bots.
+
+Every message is a frame: a header with the payload length and the message
+type, followed by the struct-packed payload. All numbers are big-endian.
+The length is 32 bits, a STATE frame of every player does not fit in 16.
+
+    WELCOME  server -> client  player id, tick rate
+    POSITION client -> server  x, y of the sending player
+    STATE    server -> client  tick number and the players that changed
+                               since the previous tick, as (id, x, y)
+    LEAVE    server -> client  id of a player that disconnected
+    PING     client -> server  client timestamp, echoed back as PONG
+    PONG     server -> client
+'''
+
+import struct
+
+HEADER = struct.Struct("!IB")
+
+WELCOME, POSITION, STATE, LEAVE, PING, PONG = range(6)
+
+WELCOME_BODY = struct.Struct("!HH")
+POSITION_BODY = struct.Struct("!hh")
+STATE_BODY = struct.Struct("!IH")
+ENTITY = struct.Struct("!Hhh")
+LEAVE_BODY = struct.Struct("!H")
+PING_BODY = struct.Struct("!d")
+
+
+def frame(kind, payload=b""):
+    return HEADER.pack(len(payload), kind) + payload
+
+
+def welcome(player_id, tick_rate):
+    return frame(WELCOME, WELCOME_BODY.pack(player_id, tick_rate))
+
+
+def position(x, y):
+    return frame(POSITION, POSITION_BODY.pack(x, y))
+
+
+def state(tick, entities):
+    """
+    :param entities: list of (id, x, y)
+    :return: bytes
+    """
+    payload = bytearray(STATE_BODY.pack(tick, len(entities)))
+    for entity in entities:
+        payload += ENTITY.pack(*entity)
+    return frame(STATE, bytes(payload))
+
+
+def leave(player_id):
+    return frame(LEAVE, LEAVE_BODY.pack(player_id))
+
+
+def ping(timestamp, kind=PING):
+    return frame(kind, PING_BODY.pack(timestamp))
+
+
+def decode(kind, payload):
+    """
+    :return: the unpacked payload, for STATE (tick, [(id, x, y), ...])
+    """
+    if kind == STATE:
+        tick, _ = STATE_BODY.unpack_from(payload)
+        return tick, list(ENTITY.iter_unpack(payload[STATE_BODY.size:]))
+    body = {WELCOME: WELCOME_BODY, POSITION: POSITION_BODY,
+            LEAVE: LEAVE_BODY, PING: PING_BODY, PONG: PING_BODY}[kind]
+    return body.unpack(payload)
+
+
+class FrameReader:
+    '''
+    Collects received bytes and splits them into whole frames
+    '''
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """
+        :param data: bytes as received from the socket
+        :return: list of (type, decoded payload) for every complete frame
+        """
+        self.buffer += data
+        messages = []
+        start = 0
+        while len(self.buffer) - start >= HEADER.size:
+            length, kind = HEADER.unpack_from(self.buffer, start)
+            end = start + HEADER.size + length
+            if end > len(self.buffer):
+                break
+            payload = bytes(self.buffer[start + HEADER.size:end])
+            messages.append((kind, decode(kind, payload)))
+            start = end
+        del self.buffer[:start]
+        return messages
+
+
+async def read_frame(reader):
+    """
+    Reads one frame from an asyncio stream
+    :return: (type, decoded payload)
+    """
+    length, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return kind, decode(kind, await reader.readexactly(length))
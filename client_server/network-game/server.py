@@ -10,61 +10,149 @@ winSCP
 EasySSH
 '''
 
-import socket
-from _thread import *
+import asyncio
+from collections import deque
+import itertools
+import struct
 import sys
 
-s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+import protocol
 
 server = 'localhost'
 port = 5555
 
-server_ip = socket.gethostbyname(server)
-
-try:
-    s.bind((server, port))
-
-except socket.error as e:
-    print(str(e))
-
-s.listen(2)
-print("Waiting for a connection")
-
-currentId = "0"
-pos = ["0:50,50", "1:100,100"]
-def threaded_client(conn):
-    global currentId, pos
-    conn.send(str.encode(currentId))
-    currentId = "1"
-    reply = ''
-    while True:
+TICK_RATE = 30
+# bytes a player may have unsent before it is disconnected as too slow
+MAX_PENDING = 256 * 1024
+START_POSITIONS = [(50, 50), (100, 100), (150, 150), (200, 200)]
+
+
+class GameServer:
+    '''
+    Players send their position whenever it changes. Once per tick the
+    server packs the players that moved since the previous tick into one
+    STATE frame and sends the same bytes to everybody.
+    '''
+
+    def __init__(self, tick_rate=TICK_RATE):
+        self.tick_rate = tick_rate
+        self.tick = 0
+        self.ids = itertools.count()
+        self.positions = {}
+        self.writers = {}
+        self.changed = set()
+
+    async def handle_player(self, reader, writer):
+        player_id = self.new_player_id()
+        if player_id is None:
+            print("No free player id for: ", writer.get_extra_info('peername'))
+            writer.close()
+            return
+        print("Connected to: ", writer.get_extra_info('peername'))
+        self.positions[player_id] = START_POSITIONS[
+            player_id % len(START_POSITIONS)]
+        self.changed.add(player_id)
+        # a new player gets everybody once, later only the changes
+        writer.write(protocol.welcome(player_id, self.tick_rate))
+        writer.write(protocol.state(self.tick, [
+            (other_id, x, y) for other_id, (x, y) in self.positions.items()]))
+        self.writers[player_id] = writer
         try:
-            data = conn.recv(2048)
-            reply = data.decode('utf-8')
-            if not data:
-                conn.send(str.encode("Goodbye"))
-                break
-            else:
-                print("Recieved: " + reply)
-                arr = reply.split(":")
-                id = int(arr[0])
-                pos[id] = reply
-
-                if id == 0: nid = 1
-                if id == 1: nid = 0
-
-                reply = pos[nid][:]
-                print("Sending: " + rep;y)
-
-            conn.sendall(str.encode(reply))
-        except:
-            break
-
-    print("Connection Closed")
-    conn.close()
-
-while True:
-    conn, addr = s.accept()
-    print("Connected to: ", addr)
-
-    start_new_thread(threaded_client, (conn,))
+            while True:
+                kind, body = await protocol.read_frame(reader)
+                if kind == protocol.POSITION:
+                    if self.positions[player_id] != body:
+                        self.positions[player_id] = body
+                        self.changed.add(player_id)
+                elif kind == protocol.PING:
+                    writer.write(protocol.ping(body[0], protocol.PONG))
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError,
+                struct.error):
+            # unknown frame type or a payload of the wrong size drops the
+            # player like a closed connection does
+            pass
+        finally:
+            self.remove_player(player_id)
+
+    def new_player_id(self):
+        """
+        Ids are 16 bit and wrap around, skipping the ones still in use
+        :return: None if all of them are in use
+        """
+        for _ in range(65536):
+            player_id = next(self.ids) % 65536
+            if player_id not in self.positions:
+                return player_id
+        return None
+
+    def remove_player(self, player_id):
+        if self.disconnect(player_id):
+            self.send_all(protocol.leave(player_id))
+
+    def disconnect(self, player_id):
+        """
+        Closes the player's connection
+        :return: False if the player was already gone
+        """
+        writer = self.writers.pop(player_id, None)
+        if writer is None:
+            return False
+        del self.positions[player_id]
+        self.changed.discard(player_id)
+        writer.close()
+        print("Connection Closed")
+        return True
+
+    def send_all(self, data):
+        # players dropped for being slow are announced after the loop, with
+        # one LEAVE frame each, so dropping never recurses into send_all
+        pending = deque([data])
+        while pending:
+            data = pending.popleft()
+            slow = []
+            for player_id, writer in list(self.writers.items()):
+                if writer.transport.get_write_buffer_size() > MAX_PENDING:
+                    slow.append(player_id)
+                else:
+                    writer.write(data)
+            leaves = b"".join(protocol.leave(player_id) for player_id in slow
+                              if self.disconnect(player_id))
+            if leaves:
+                pending.append(leaves)
+
+    def broadcast_changes(self):
+        self.tick += 1
+        if not self.changed:
+            return
+        data = protocol.state(self.tick, [
+            (player_id, *self.positions[player_id])
+            for player_id in self.changed])
+        self.changed.clear()
+        self.send_all(data)
+
+    async def run_ticks(self):
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.tick_rate
+        next_tick = loop.time()
+        while True:
+            self.broadcast_changes()
+            # ticks are scheduled from the start time so they do not drift
+            next_tick += interval
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+
+
+async def serve(host=server, port=port, tick_rate=TICK_RATE):
+    game = GameServer(tick_rate)
+    try:
+        s = await asyncio.start_server(game.handle_player, host, port,
+                                       backlog=1024)
+    except OSError as e:
+        print(str(e))
+        sys.exit(1)
+    print("Waiting for a connection")
+    async with s:
+        await asyncio.gather(s.serve_forever(), game.run_ticks())
+
+
+if __name__ == '__main__':
+    asyncio.run(serve())
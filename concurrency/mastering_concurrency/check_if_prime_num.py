@@ -1,8 +1,49 @@
 from timeit import default_timer as timer
-from math import sqrt
+from math import sqrt, isqrt
+from functools import lru_cache
 import multiprocessing
 import concurrent.futures
 
+import numpy as np
+
+# odd primes tried at once against the candidates that are left
+DIVISOR_BLOCK = 4096
+
+
+@lru_cache(maxsize=4)
+def odd_primes_up_to(limit: int) -> np.ndarray:
+    sieve = np.ones((limit + 1) // 2, dtype=bool)  # sieve[i] stands for 2i + 1
+    sieve[:1] = False
+    for i in range(1, (isqrt(limit) - 1) // 2 + 1):
+        if sieve[i]:
+            sieve[2 * i * (i + 1)::2 * i + 1] = False
+    return (2 * np.flatnonzero(sieve) + 1).astype(np.int64)
+
+
+def primes_in_chunk(numbers: np.ndarray) -> np.ndarray:
+    """
+    Vectorized trial division: every block of odd prime divisors is tried
+    against all candidates that are still left at once, so composites
+    drop out after the first blocks and only primes see all divisors.
+    """
+    numbers = np.asarray(numbers, dtype=np.int64)
+    is_prime = (numbers == 2) | ((numbers > 2) & (numbers % 2 == 1))
+    left = np.flatnonzero(is_prime & (numbers > 2))
+    if left.size:
+        largest = int(numbers[left].max())
+        divisors = odd_primes_up_to(isqrt(largest))
+        for start in range(0, divisors.size, DIVISOR_BLOCK):
+            block = divisors[start:start + DIVISOR_BLOCK]
+            candidates = numbers[left, None]
+            divisible = ((candidates % block == 0)
+                         & (block * block <= candidates)).any(axis=1)
+            is_prime[left[divisible]] = False
+            left = left[~divisible]
+            if not left.size:
+                break
+    return numbers[is_prime]
+
+
 class IsPrime:
     def __init__(self, input: list):
         self.input = input
@@ -44,19 +85,52 @@ class IsPrime:
         result = []
 
         with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
-            futures = [executor.submit(self.is_prime, i) for i in self.input]
+            futures = {executor.submit(self.is_prime, i): i for i in self.input}
             completed_futures = concurrent.futures.as_completed(futures)
 
             sub_start = timer()
 
-            for i, future in enumerate(completed_futures):
+            for future in completed_futures:
                 if future.result():
-                    result.append(future.result())
+                    result.append(futures[future])
 
         sub_duration = timer() - sub_start
         print('Sub took: %.4f seconds.' % sub_duration)
-        self.show_result("conc", result, start)
+        self.show_result("conc", sorted(result), start)
 
+    def chunked_execution(self, n_workers: int, chunksize: int) -> list:
+        """ map sends chunksize numbers to a worker in one message """
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
+            flags = executor.map(self.is_prime, self.input, chunksize=chunksize)
+            return [i for i, flag in zip(self.input, flags) if flag]
+
+    def batched_execution(self, n_workers: int, chunksize: int) -> list:
+        """ every worker tests a whole NumPy chunk with primes_in_chunk """
+        numbers = np.asarray(self.input, dtype=np.int64)
+        chunks = [numbers[i:i + chunksize]
+                  for i in range(0, len(numbers), chunksize)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
+            return [int(i) for primes in executor.map(primes_in_chunk, chunks)
+                    for i in primes]
+
+    def sweep(self, chunksizes: list, worker_counts: list) -> None:
+        """ prints the speedup over sequential_execution for every mode """
+        start = timer()
+        expected = [i for i in self.input if self.is_prime(i)]
+        sequential = timer() - start
+        print(f'sequential: {sequential:.3f} seconds, {len(expected)} primes')
+
+        print(f'{"mode":<10}{"workers":>8}{"chunk":>8}{"seconds":>10}{"speedup":>9}')
+        for mode in (self.chunked_execution, self.batched_execution):
+            for n_workers in worker_counts:
+                for chunksize in chunksizes:
+                    start = timer()
+                    result = mode(n_workers, chunksize)
+                    duration = timer() - start
+                    assert result == expected
+                    print(f'{mode.__name__.split("_")[0]:<10}{n_workers:>8}'
+                          f'{chunksize:>8}{duration:>10.3f}'
+                          f'{sequential / duration:>8.1f}x')
 
 
 if __name__ == '__main__':
@@ -67,3 +141,7 @@ if __name__ == '__main__':
     for n_workers in range(1, multiprocessing.cpu_count() + 1):
         prime.concurrent_execution(n_workers)
         print('_' * 20)
+
+    workers = sorted({1, 2, multiprocessing.cpu_count()})
+    IsPrime([i for i in range(10 ** 13, 10 ** 13 + 2000)]).sweep(
+        [1, 10, 100, 1000], workers)
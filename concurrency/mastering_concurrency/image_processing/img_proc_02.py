@@ -13,10 +13,10 @@ INPUT_PATH = 'input/large_input/'
 OUTPUT_PATH = 'output/large_output/'
 
 n = 20
-names = ['ship_%i_%j.jpg' % (i, j) for i in range(n) for j in range(n)]
+names = ['ship_%i_%i.jpg' % (i, j) for i in range(n) for j in range(n)]
 
 # def process_threshold(im, output_name, thresh_method):
-def process_threadhold(name, thresh_method):
+def process_threshold(name, thresh_method):
     im = cv2.imread(INPUT_PATH + name)
     gray_im = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
     thresh_im = cv2.adaptiveThreshold(gray_im, 255, thresh_method,
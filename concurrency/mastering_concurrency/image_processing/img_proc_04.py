@@ -0,0 +1,191 @@
+
+''' pipelined image processing with shared memory '''
+
+# img_proc_02.py lets every worker read, threshold and write its own tile
+# and moves everything through pickled arguments. Here the stages are
+# split: threads decode a chunk of tiles into a shared memory block, a
+# worker process thresholds the block in place and threads encode and
+# write the results, while the next chunks are already being decoded.
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import (get_all_start_methods, get_context,
+                             resource_tracker, shared_memory)
+from timeit import default_timer as timer
+
+import cv2
+import numpy as np
+
+from img_proc_02 import THRESH_METHOD, INPUT_PATH, OUTPUT_PATH, n, names
+
+CHUNK_SIZE = 16
+IO_THREADS = 4
+
+
+def make_tiles(source='richard_stallman.jpeg', tile_size=256):
+    ''' cuts the sample image into the n x n tiles img_proc_02.py expects '''
+    os.makedirs(INPUT_PATH, exist_ok=True)
+    im = cv2.resize(cv2.imread(source), (n * tile_size, n * tile_size))
+    for i in range(n):
+        for j in range(n):
+            tile = im[i * tile_size:(i + 1) * tile_size,
+                      j * tile_size:(j + 1) * tile_size]
+            cv2.imwrite(INPUT_PATH + 'ship_%i_%i.jpg' % (i, j), tile)
+
+
+def layout(shapes):
+    '''
+    places the colour tiles and then their thresholded versions one
+    after another in a single block
+    :return: list of (shape, input offset, output offset), block size
+    '''
+    offsets = []
+    position = 0
+    for shape in shapes:
+        offsets.append([shape, position])
+        position += shape[0] * shape[1] * shape[2]
+    for offset in offsets:
+        offset.append(position)
+        position += offset[0][0] * offset[0][1]
+    return [tuple(offset) for offset in offsets], max(position, 1)
+
+
+def threshold_chunk(block_name, tiles, thresh_method):
+    ''' runs in the worker process, returns the seconds spent '''
+    start = timer()
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        for shape, in_offset, out_offset in tiles:
+            im = np.ndarray(shape, np.uint8, block.buf, in_offset)
+            thresh_im = np.ndarray(shape[:2], np.uint8, block.buf, out_offset)
+            gray_im = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
+            cv2.adaptiveThreshold(gray_im, 255, thresh_method,
+                                  cv2.THRESH_BINARY, 11, 2, dst=thresh_im)
+            del im, thresh_im
+    finally:
+        block.close()
+    return timer() - start
+
+
+class Pipeline:
+    '''
+    read (threads) -> threshold (processes) -> write (threads)
+
+    At most 2 chunks per process are in flight, so memory use does not
+    grow with the number of tiles.
+    '''
+
+    def __init__(self, n_processes, chunk_size=CHUNK_SIZE,
+                 io_threads=IO_THREADS, thresh_method=THRESH_METHOD):
+        self.n_processes = n_processes
+        self.chunk_size = chunk_size
+        self.io_threads = io_threads
+        self.thresh_method = thresh_method
+        self.timings = {'read': 0.0, 'threshold': 0.0, 'write': 0.0}
+        self.lock = threading.Lock()
+        self.in_flight = threading.Semaphore(2 * n_processes)
+        self.errors = []
+
+    def run(self, names):
+        # workers forked before the tracker runs would start their own
+        # and report every block they attached to as leaked
+        resource_tracker.ensure_running()
+        # forking this process while the io threads and OpenCV's own
+        # threads hold locks can leave a worker deadlocked in cv2
+        context = get_context('forkserver' if 'forkserver'
+                              in get_all_start_methods() else 'spawn')
+        with ThreadPoolExecutor(self.io_threads) as io, \
+                context.Pool(self.n_processes) as pool:
+            for start in range(0, len(names), self.chunk_size):
+                self.in_flight.acquire()
+                if self.errors:
+                    self.in_flight.release()
+                    break
+                chunk = names[start:start + self.chunk_size]
+                try:
+                    block, tiles = self.read_chunk(io, chunk)
+                except Exception as e:
+                    self.fail(e)
+                    break
+                pool.apply_async(
+                    threshold_chunk, (block.name, tiles, self.thresh_method),
+                    callback=lambda seconds, block=block, chunk=chunk,
+                    tiles=tiles: self.thresholded(
+                        io, block, chunk, tiles, seconds),
+                    error_callback=lambda e, block=block: self.fail(e, block))
+            # wait for the chunks that are still in flight
+            for _ in range(2 * self.n_processes):
+                self.in_flight.acquire()
+        if self.errors:
+            raise self.errors[0]
+        return self.timings
+
+    def read_chunk(self, io, chunk):
+        start = timer()
+        images = list(io.map(lambda name: cv2.imread(INPUT_PATH + name),
+                             chunk))
+        for name, im in zip(chunk, images):
+            if im is None:
+                raise FileNotFoundError(INPUT_PATH + name)
+        tiles, size = layout([im.shape for im in images])
+        block = shared_memory.SharedMemory(create=True, size=size)
+        for im, (shape, in_offset, _) in zip(images, tiles):
+            np.ndarray(shape, np.uint8, block.buf, in_offset)[:] = im
+        self.add_time('read', timer() - start)
+        return block, tiles
+
+    def thresholded(self, io, block, chunk, tiles, seconds):
+        # called in the pool's result thread, which must not block
+        self.add_time('threshold', seconds)
+        io.submit(self.write_chunk, block, chunk, tiles)
+
+    def write_chunk(self, block, chunk, tiles):
+        start = timer()
+        try:
+            for name, (shape, _, out_offset) in zip(chunk, tiles):
+                thresh_im = np.ndarray(shape[:2], np.uint8, block.buf,
+                                       out_offset)
+                cv2.imwrite(OUTPUT_PATH + name, thresh_im)
+                del thresh_im
+        except Exception as e:
+            self.fail(e, block)
+            return
+        self.release(block)
+        self.add_time('write', timer() - start)
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            self.timings[stage] += seconds
+
+    def fail(self, error, block=None):
+        self.errors.append(error)
+        if block is None:
+            self.in_flight.release()
+        else:
+            self.release(block)
+
+    def release(self, block):
+        block.close()
+        block.unlink()
+        self.in_flight.release()
+
+
+if __name__ == '__main__':
+    if '--make-input' in sys.argv:
+        make_tiles()
+    os.makedirs(OUTPUT_PATH, exist_ok=True)
+
+    print('%-10s%10s%10s%14s%10s%12s' % ('processes', 'total, s', 'read, s',
+                                         'threshold, s', 'write, s',
+                                         'tiles/sec'))
+    for n_processes in range(1, 7):
+        start = timer()
+        timings = Pipeline(n_processes).run(names)
+        total = timer() - start
+        # write is summed over threads and threshold over processes,
+        # so the stages can add up to more than the total
+        print('%-10i%10.3f%10.3f%14.3f%10.3f%12.1f' % (
+            n_processes, total, timings['read'], timings['threshold'],
+            timings['write'], len(names) / total))
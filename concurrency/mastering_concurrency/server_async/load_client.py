@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import collections
+import statistics
+import time
+
+from server import LENGTH, install_event_loop_policy
+
+
+async def run_connection(host, port, depth, payload, stop, latencies):
+    '''
+    Keeps up to depth requests in flight on one connection and records
+    the latency of every response
+    '''
+    reader, writer = await asyncio.open_connection(host, port)
+    frame = LENGTH.pack(len(payload)) + payload
+    in_flight = asyncio.Semaphore(depth)
+    sent = collections.deque()
+
+    async def send_requests():
+        while not stop.is_set():
+            await in_flight.acquire()
+            sent.append(time.perf_counter())
+            writer.write(frame)
+            await writer.drain()
+
+    sender = asyncio.create_task(send_requests())
+    try:
+        while not stop.is_set():
+            length, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - sent.popleft())
+            in_flight.release()
+    finally:
+        sender.cancel()
+        writer.close()
+
+
+async def load(host, port, connections, depth, size, duration):
+    stop = asyncio.Event()
+    latencies = []
+    payload = b'x' * size
+    tasks = [asyncio.create_task(
+                 run_connection(host, port, depth, payload, stop, latencies))
+             for _ in range(connections)]
+    # leave out the connection setup
+    await asyncio.sleep(0.5)
+    latencies.clear()
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - started
+    measured = list(latencies)
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return measured, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Load test for the pipelined echo server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--connections', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=16,
+                        help='requests in flight per connection')
+    parser.add_argument('--size', type=int, default=64,
+                        help='payload bytes per request')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--loop', choices=['asyncio', 'uvloop'],
+                        default='asyncio')
+    args = parser.parse_args()
+
+    install_event_loop_policy(args.loop)
+    latencies, elapsed = asyncio.run(load(
+        args.host, args.port, args.connections, args.depth, args.size,
+        args.duration))
+    if not latencies:
+        raise SystemExit('No responses received')
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print('{:.0f} requests/sec'.format(len(latencies) / elapsed))
+    print('latency p50 {:.2f} ms, p99 {:.2f} ms'.format(
+        statistics.median(latencies) * 1000, p99 * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,103 @@
+import argparse
 import asyncio
+import struct
+
+# every request and response is a 4 byte big-endian length and the payload
+LENGTH = struct.Struct('!I')
+MAX_FRAME_SIZE = 1024 * 1024
+# stop reading requests while this many response bytes are not sent yet
+WRITE_HIGH_WATER = 256 * 1024
+
+
+def echo(payload):
+    return payload
+
 
 class EchoServerClientProtocol(asyncio.Protocol):
+    '''
+    Keeps the connection open and answers every request frame with a
+    response frame, in the order the requests arrived. A client may send
+    many requests without waiting for the responses (pipelining).
+    '''
+
+    def __init__(self, handler=echo):
+        self.handler = handler
+        self.buffer = bytearray()
+
     def connection_made(self, transport):
         peername = transport.get_extra_info('peername')
         print('Connection from {}'.format(peername))
         self.transport = transport
+        # pause_writing() is called above the high water mark and
+        # resume_writing() once the buffer drained below the low one
+        transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
 
     def data_received(self, data):
-        message = data.decode()
-        print('Data received: {!r}'.format(message))
+        self.buffer += data
+        responses = []
+        start = 0
+        while len(self.buffer) - start >= LENGTH.size:
+            length, = LENGTH.unpack_from(self.buffer, start)
+            if length > MAX_FRAME_SIZE:
+                print('Frame of {} bytes is too large, closing'.format(length))
+                self.transport.close()
+                return
+            end = start + LENGTH.size + length
+            if end > len(self.buffer):
+                break
+            request = bytes(self.buffer[start + LENGTH.size:end])
+            response = self.handler(request)
+            responses.append(LENGTH.pack(len(response)))
+            responses.append(response)
+            start = end
+        del self.buffer[:start]
+        # all responses to one read go out in a single write
+        self.transport.writelines(responses)
+
+    def pause_writing(self):
+        # the client does not read its responses fast enough, so stop
+        # reading its requests until it catches up
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+
+def install_event_loop_policy(name):
+    if name == 'uvloop':
+        try:
+            import uvloop
+        except ImportError:
+            raise SystemExit('uvloop is not installed, pip install uvloop')
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 
-        self.transport.write(('Echoed back: {}'.format(message)).encode())
+async def serve(host, port):
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(
+        EchoServerClientProtocol, host, port, backlog=1024)
 
-        print('Close the client socket')
-        self.transport.close()
+    # Server requests until Ctrl+C is pressed
+    print('Serving on {}'.format(server.sockets[0].getsockname()))
+    async with server:
+        await server.serve_forever()
 
 
+def main():
+    parser = argparse.ArgumentParser(
+        description='Length-prefixed pipelined echo server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--loop', choices=['asyncio', 'uvloop'],
+                        default='asyncio')
+    args = parser.parse_args()
 
-loop = asyncio.get_event_loop()
-coro = loop.create_server(EchoServerClientProtocol, '127.0.0.1', 8888)
-server = loop.run_until_complete(coro)
+    install_event_loop_policy(args.loop)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
 
-# Server requests until Ctrl+C is pressed
-print('Serving on {}'.format(server.sockets[0].getsockname()))
-try:
-    loop.run_forever()
-except KeyboardInterrupt:
-    pass
 
-# Close the server
-server.close()
-loop.run_until_complete(server.wait_closed())
-loop.close()
+if __name__ == '__main__':
+    main()
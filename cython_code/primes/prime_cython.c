@@ -1384,7 +1384,7 @@ static PyObject *__pyx_pf_12prime_cython_prime_finder_vanilla(CYTHON_UNUSED PyOb
  *             if number % x == 0:
  *                 break             # <<<<<<<<<<<<<<
  * 
- *             else:
+ *         else:
  */
         goto __pyx_L6_break;
 
@@ -1397,55 +1397,63 @@ static PyObject *__pyx_pf_12prime_cython_prime_finder_vanilla(CYTHON_UNUSED PyOb
  */
       }
 
-      /* "prime_cython.pyx":15
- * 
- *             else:
- *                 primes.append(number)             # <<<<<<<<<<<<<<
- *                 found += 1
- * 
+      /* "prime_cython.pyx":10
+ *     number = 2
+ *     while found < amount:
+ *         for x in primes:             # <<<<<<<<<<<<<<
+ *             if number % x == 0:
+ *                 break
  */
-      /*else*/ {
-        __pyx_t_6 = __Pyx_PyList_Append(__pyx_v_primes, __pyx_v_number); if (unlikely(__pyx_t_6 == ((int)-1))) __PYX_ERR(0, 15, __pyx_L1_error)
+    }
+    /*else*/ {
 
-        /* "prime_cython.pyx":16
- *             else:
- *                 primes.append(number)
- *                 found += 1             # <<<<<<<<<<<<<<
+      /* "prime_cython.pyx":15
+ * 
+ *         else:
+ *             primes.append(number)             # <<<<<<<<<<<<<<
+ *             found += 1
  * 
- *             number += 1
  */
-        __pyx_t_5 = __Pyx_PyInt_AddObjC(__pyx_v_found, __pyx_int_1, 1, 1, 0); if (unlikely(!__pyx_t_5)) __PYX_ERR(0, 16, __pyx_L1_error)
-        __Pyx_GOTREF(__pyx_t_5);
-        __Pyx_DECREF_SET(__pyx_v_found, __pyx_t_5);
-        __pyx_t_5 = 0;
-      }
+      __pyx_t_6 = __Pyx_PyList_Append(__pyx_v_primes, __pyx_v_number); if (unlikely(__pyx_t_6 == ((int)-1))) __PYX_ERR(0, 15, __pyx_L1_error)
 
-      /* "prime_cython.pyx":18
- *                 found += 1
- * 
- *             number += 1             # <<<<<<<<<<<<<<
+      /* "prime_cython.pyx":16
+ *         else:
+ *             primes.append(number)
+ *             found += 1             # <<<<<<<<<<<<<<
  * 
- *     return primes
+ *         number += 1
  */
-      __pyx_t_5 = __Pyx_PyInt_AddObjC(__pyx_v_number, __pyx_int_1, 1, 1, 0); if (unlikely(!__pyx_t_5)) __PYX_ERR(0, 18, __pyx_L1_error)
+      __pyx_t_5 = __Pyx_PyInt_AddObjC(__pyx_v_found, __pyx_int_1, 1, 1, 0); if (unlikely(!__pyx_t_5)) __PYX_ERR(0, 16, __pyx_L1_error)
       __Pyx_GOTREF(__pyx_t_5);
-      __Pyx_DECREF_SET(__pyx_v_number, __pyx_t_5);
+      __Pyx_DECREF_SET(__pyx_v_found, __pyx_t_5);
       __pyx_t_5 = 0;
+    }
 
-      /* "prime_cython.pyx":10
+    /* "prime_cython.pyx":10
  *     number = 2
  *     while found < amount:
  *         for x in primes:             # <<<<<<<<<<<<<<
  *             if number % x == 0:
  *                 break
  */
-    }
     __pyx_L6_break:;
     __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
+
+    /* "prime_cython.pyx":18
+ *             found += 1
+ * 
+ *         number += 1             # <<<<<<<<<<<<<<
+ * 
+ *     return primes
+ */
+    __pyx_t_1 = __Pyx_PyInt_AddObjC(__pyx_v_number, __pyx_int_1, 1, 1, 0); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 18, __pyx_L1_error)
+    __Pyx_GOTREF(__pyx_t_1);
+    __Pyx_DECREF_SET(__pyx_v_number, __pyx_t_1);
+    __pyx_t_1 = 0;
   }
 
   /* "prime_cython.pyx":20
- *             number += 1
+ *         number += 1
  * 
  *     return primes             # <<<<<<<<<<<<<<
  * 
@@ -1615,7 +1623,7 @@ static PyObject *__pyx_pf_12prime_cython_2prime_finder_optimized(CYTHON_UNUSED P
  *             if number % x == 0:
  *                 break             # <<<<<<<<<<<<<<
  * 
- *             else:
+ *         else:
  */
         goto __pyx_L6_break;
 
@@ -1627,41 +1635,41 @@ static PyObject *__pyx_pf_12prime_cython_2prime_finder_optimized(CYTHON_UNUSED P
  * 
  */
       }
+    }
+    /*else*/ {
 
       /* "prime_cython.pyx":38
  * 
- *             else:
- *                 primes[found] = number             # <<<<<<<<<<<<<<
- *                 found += 1
+ *         else:
+ *             primes[found] = number             # <<<<<<<<<<<<<<
+ *             found += 1
  * 
  */
-      /*else*/ {
-        (__pyx_v_primes[__pyx_v_found]) = __pyx_v_number;
+      (__pyx_v_primes[__pyx_v_found]) = __pyx_v_number;
 
-        /* "prime_cython.pyx":39
- *             else:
- *                 primes[found] = number
- *                 found += 1             # <<<<<<<<<<<<<<
+      /* "prime_cython.pyx":39
+ *         else:
+ *             primes[found] = number
+ *             found += 1             # <<<<<<<<<<<<<<
  * 
- *             number += 1
+ *         number += 1
  */
-        __pyx_v_found = (__pyx_v_found + 1);
-      }
+      __pyx_v_found = (__pyx_v_found + 1);
+    }
+    __pyx_L6_break:;
 
-      /* "prime_cython.pyx":41
- *                 found += 1
+    /* "prime_cython.pyx":41
+ *             found += 1
  * 
- *             number += 1             # <<<<<<<<<<<<<<
+ *         number += 1             # <<<<<<<<<<<<<<
  * 
  *     return_list = [p for p in primes[:found]]
  */
-      __pyx_v_number = (__pyx_v_number + 1);
-    }
-    __pyx_L6_break:;
+    __pyx_v_number = (__pyx_v_number + 1);
   }
 
   /* "prime_cython.pyx":43
- *             number += 1
+ *         number += 1
  * 
  *     return_list = [p for p in primes[:found]]             # <<<<<<<<<<<<<<
  *     return return_list
@@ -11,11 +11,11 @@ def prime_finder_vanilla(amount):
             if number % x == 0:
                 break
 
-            else:
-                primes.append(number)
-                found += 1
+        else:
+            primes.append(number)
+            found += 1
 
-            number += 1
+        number += 1
 
     return primes
 
@@ -34,11 +34,11 @@ def prime_finder_optimized(int amount):
             if number % x == 0:
                 break
 
-            else:
-                primes[found] = number
-                found += 1
+        else:
+            primes[found] = number
+            found += 1
 
-            number += 1
+        number += 1
 
     return_list = [p for p in primes[:found]]
     return return_list
@@ -0,0 +1,114 @@
+"""Per epoch throughput of the MNIST data loaders.
+
+Every preprocess mode is timed with each worker count: the time to build
+the loader (which includes normalizing the dataset for "tensor" and
+"memmap") and the time of every epoch. With --train the LinearNet model is
+trained on the batches as well. Without the raw MNIST files, --synthetic
+writes random images in the same format to a temporary directory.
+
+python benchmark_loader.py
+python benchmark_loader.py --synthetic --workers 0 2 --epochs 3 --train
+"""
+
+import argparse
+import gzip
+import struct
+import tempfile
+from pathlib import Path
+from timeit import default_timer as timer
+
+import numpy as np
+import torch
+
+from ds.dataset import PREPROCESS_MODES, create_dataloader
+from ds.models import LinearNet
+
+RAW_DATA = Path(__file__).resolve().parent.parent / "data" / "raw"
+TRAIN_DATA = "train-images-idx3-ubyte.gz"
+TRAIN_LABELS = "train-labels-idx1-ubyte.gz"
+
+
+def write_idx(path: Path, data: np.ndarray) -> None:
+    """Writes unsigned bytes in the MNIST file format, see data/README.md."""
+    with gzip.open(path, "wb", compresslevel=1) as fp:
+        fp.write(struct.pack(">HBB", 0, 0x08, data.ndim))
+        fp.write(struct.pack(f">{data.ndim}I", *data.shape))
+        fp.write(data.astype(np.uint8).tobytes())
+
+
+def write_synthetic(root: Path, count: int = 60000) -> None:
+    generator = np.random.default_rng(0)
+    write_idx(root / TRAIN_DATA, generator.integers(0, 256, (count, 28, 28)))
+    write_idx(root / TRAIN_LABELS, generator.integers(0, 10, count))
+
+
+def run_epoch(loader, model=None, optimizer=None) -> int:
+    images = 0
+    for x, y in loader:
+        images += len(x)
+        if model is not None:
+            loss = torch.nn.functional.cross_entropy(model(x), y)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+    return images
+
+
+def benchmark(root: Path, cache: Path, args) -> None:
+    print(f"{'preprocess':<10}{'workers':>8}{'build':>9}  epochs (s)")
+    for preprocess in args.preprocess:
+        for workers in args.workers:
+            start = timer()
+            loader = create_dataloader(
+                batch_size=args.batch_size,
+                root_path=str(root),
+                data_file=TRAIN_DATA,
+                label_file=TRAIN_LABELS,
+                preprocess=preprocess,
+                cache_path=str(cache),
+                num_workers=workers,
+                prefetch_factor=args.prefetch_factor,
+                persistent_workers=workers > 0,
+                pin_memory=args.pin_memory,
+            )
+            build = timer() - start
+            model = optimizer = None
+            if args.train:
+                model = LinearNet()
+                optimizer = torch.optim.Adam(model.parameters(), lr=5e-5)
+            epochs = []
+            for _ in range(args.epochs):
+                start = timer()
+                images = run_epoch(loader, model, optimizer)
+                epochs.append(timer() - start)
+            print(
+                f"{preprocess:<10}{workers:>8}{build:>8.2f}s  "
+                + " ".join(f"{seconds:6.2f}" for seconds in epochs)
+                + f"  {images / min(epochs):>10,.0f} images/s"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data", type=Path, default=RAW_DATA)
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--preprocess", nargs="+", default=PREPROCESS_MODES)
+    parser.add_argument("--workers", nargs="+", type=int, default=[0, 2])
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--prefetch-factor", type=int, default=2)
+    parser.add_argument("--pin-memory", action="store_true")
+    parser.add_argument("--train", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = args.data
+        if args.synthetic:
+            root = Path(directory)
+            write_synthetic(root)
+        # a fresh cache, so the memmap build time includes writing it
+        benchmark(root, Path(directory) / "cache", args)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from dataclasses import dataclass
 class Paths:
     log: str
     data: str
+    cache: str
 
 
 @dataclass
@@ -20,6 +21,12 @@ class Params:
     epoch_count: int
     lr: float
     batch_size: int
+    # "sample", "tensor" or "memmap", see ds.dataset.create_dataloader
+    preprocess: str = "tensor"
+    num_workers: int = 0
+    prefetch_factor: int = 2
+    persistent_workers: bool = False
+    pin_memory: bool = False
 
 
 @dataclass
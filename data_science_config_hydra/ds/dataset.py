@@ -1,12 +1,23 @@
+import os
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional, Sequence, Union
 
 import numpy as np
 import torch
-from torch.utils.data import DataLoader, Dataset
+from torch.utils.data import (
+    BatchSampler,
+    DataLoader,
+    Dataset,
+    RandomSampler,
+    SequentialSampler,
+)
 
 from ds.load_data import load_image_data, load_label_data
 
+PREPROCESS_MODES = ("sample", "tensor", "memmap")
+# images normalized at a time, bounds the float64 temporary
+NORMALIZE_CHUNK = 4096
+
 
 class MNIST(Dataset[Any]):
     idx: int  # requested data index
@@ -59,20 +70,149 @@ class MNIST(Dataset[Any]):
         self.y = torch.tensor(self.y, dtype=torch.long)
 
 
+def normalize(data: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Normalizes all images like MNIST.preprocess_x into (N, 1, rows, cols)."""
+    if out is None:
+        out = np.empty((len(data), 1, *data.shape[1:]), dtype=np.float32)
+    for start in range(0, len(data), NORMALIZE_CHUNK):
+        chunk = data[start : start + NORMALIZE_CHUNK].astype(np.float64)
+        chunk /= MNIST.TRAIN_MAX
+        chunk -= MNIST.TRAIN_NORMALIZED_MEAN
+        chunk /= MNIST.TRAIN_NORMALIZED_STDEV
+        out[start : start + NORMALIZE_CHUNK, 0] = chunk
+    return out
+
+
+def cached_normalize(
+    data: np.ndarray, cache_path: Path, source_path: Path
+) -> np.ndarray:
+    """normalize() stored in the .npy file cache_path and memory-mapped.
+
+    The cache is rebuilt when the source file is newer than it. The returned
+    array is copy-on-write, so workers share the pages of the file.
+    """
+    shape = (len(data), 1, *data.shape[1:])
+    if (
+        not cache_path.exists()
+        or cache_path.stat().st_mtime < source_path.stat().st_mtime
+    ):
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}")
+        try:
+            out = np.lib.format.open_memmap(
+                partial_path,
+                mode="w+",
+                dtype=np.float32,
+                shape=shape,
+            )
+            normalize(data, out)
+            out.flush()
+            del out
+            os.replace(partial_path, cache_path)
+        except BaseException:
+            # an interrupted build leaves no partial file behind
+            partial_path.unlink(missing_ok=True)
+            raise
+    cached = np.load(cache_path, mmap_mode="c")
+    if cached.shape != shape:
+        raise ValueError(f"{cache_path} does not match {source_path}, delete it")
+    return cached
+
+
+class NormalizedMNIST(Dataset[Any]):
+    """MNIST normalized once, indexed by whole batches.
+
+    __getitem__ takes the list of indices of a batch and returns the batch,
+    a slice of the image tensor when the indices are consecutive.
+    """
+
+    def __init__(self, x: np.ndarray, targets: np.ndarray):
+        if len(x) != len(targets):
+            raise ValueError(
+                "data and targets must be the same length. "
+                f"{len(x)} != {len(targets)}"
+            )
+
+        self.x = torch.from_numpy(x)
+        self.y = torch.from_numpy(targets.astype(np.int64))
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(
+        self, idx: Union[int, np.integer, Sequence[int]]
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        if isinstance(idx, (int, np.integer)):
+            return self.x[idx], self.y[idx]
+        if idx[-1] - idx[0] == len(idx) - 1 and np.all(np.diff(idx) == 1):
+            batch = slice(idx[0], idx[-1] + 1)
+        else:
+            batch = torch.as_tensor(idx)
+        return self.x[batch], self.y[batch]
+
+
 def create_dataloader(
     batch_size: int,
     root_path: str,
     data_file: str,
     label_file: str,
     shuffle: bool = True,
+    preprocess: str = "tensor",
+    cache_path: Optional[str] = None,
+    num_workers: int = 0,
+    prefetch_factor: int = 2,
+    persistent_workers: bool = False,
+    pin_memory: bool = False,
 ) -> DataLoader[Any]:
+    """
+    preprocess is "sample" to normalize every image when it is read, "tensor"
+    to normalize the whole dataset into memory once, or "memmap" to normalize
+    it once into a file in cache_path that later runs map.
+    """
+    if preprocess not in PREPROCESS_MODES:
+        raise ValueError(
+            f"preprocess must be one of {PREPROCESS_MODES}, not {preprocess!r}"
+        )
     data_path = Path(f"{root_path}/{data_file}")
     label_path = Path(f"{root_path}/{label_file}")
     data = load_image_data(data_path)
     label_data = load_label_data(label_path)
+
+    # prefetching and keeping workers alive only apply to worker processes
+    worker_options: dict[str, Any] = {}
+    if num_workers > 0:
+        worker_options = dict(
+            prefetch_factor=prefetch_factor,
+            persistent_workers=persistent_workers,
+        )
+
+    if preprocess == "sample":
+        return DataLoader(
+            dataset=MNIST(data, label_data),
+            batch_size=batch_size,
+            shuffle=shuffle,
+            num_workers=num_workers,
+            pin_memory=pin_memory,
+            **worker_options,
+        )
+
+    if preprocess == "tensor":
+        x = normalize(data)
+    else:
+        if cache_path is None:
+            raise ValueError("preprocess='memmap' needs a cache_path")
+        x = cached_normalize(
+            data, Path(cache_path) / f"{data_file}.float32.npy", data_path
+        )
+    dataset = NormalizedMNIST(x, label_data)
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    # the sampler yields batches of indices and the dataset returns whole
+    # batches, so there is no per sample __getitem__ and no collate
     return DataLoader(
-        dataset=MNIST(data, label_data),
-        batch_size=batch_size,
-        shuffle=shuffle,
-        num_workers=0,
+        dataset=dataset,
+        sampler=BatchSampler(sampler, batch_size, drop_last=False),
+        batch_size=None,
+        num_workers=num_workers,
+        pin_memory=pin_memory,
+        **worker_options,
     )
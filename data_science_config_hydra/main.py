@@ -23,17 +23,25 @@ def main(cfg: MNISTConfig) -> None:
 
     # Create the data loaders
 
-    test_loader = create_dataloader(
+    loader_options = dict(
         batch_size=cfg.params.batch_size,
         root_path=cfg.paths.data,
+        preprocess=cfg.params.preprocess,
+        cache_path=cfg.paths.cache,
+        num_workers=cfg.params.num_workers,
+        prefetch_factor=cfg.params.prefetch_factor,
+        persistent_workers=cfg.params.persistent_workers,
+        pin_memory=cfg.params.pin_memory,
+    )
+    test_loader = create_dataloader(
         data_file=cfg.files.test_data,
         label_file=cfg.files.test_labels,
+        **loader_options,
     )
     train_loader = create_dataloader(
-        batch_size=cfg.params.batch_size,
-        root_path=cfg.paths.data,
         data_file=cfg.files.train_data,
         label_file=cfg.files.train_labels,
+        **loader_options,
     )
 
     # Create the runners
@@ -0,0 +1,81 @@
+"""Throughput of lsb_codec against the per-bit loop LSB.py used before.
+
+    python benchmark_lsb.py --megapixels 16
+"""
+
+import argparse
+import io
+import os
+import tempfile
+from timeit import default_timer as timer
+
+import numpy as np
+import PIL.Image
+
+import lsb_codec
+
+
+def loop_encode(img_arr, byte_msg):
+    """The old LSB.py: one string conversion per payload bit"""
+    index = 0
+    for i in range(len(img_arr)):
+        for j in range(0, 3):
+            if index < len(byte_msg):
+                img_arr[i][j] = int(bin(img_arr[i][j])[2:-1] + byte_msg[index], 2)
+                index += 1
+
+
+def report(name, seconds, size):
+    print(f"{name:<28}{seconds:>9.3f}s{size / seconds / 2 ** 20:>10.3f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--megapixels", type=float, default=16)
+    args = parser.parse_args()
+
+    side = int((args.megapixels * 10 ** 6) ** 0.5)
+    rng = np.random.default_rng(0)
+    image = PIL.Image.fromarray(rng.integers(0, 256, (side, side, 3),
+                                             dtype=np.uint8))
+    payload = rng.bytes(lsb_codec.Carrier(image).capacity())
+    print(f"{side}x{side} RGB image, {len(payload) / 2 ** 20:.1f} MB payload")
+
+    sample = payload[:4096]
+    img_arr = np.array(image).reshape(-1, 3).astype(int)
+    start = timer()
+    loop_encode(img_arr, "".join(f"{byte:08b}" for byte in sample))
+    report("per-bit loop encode", timer() - start, len(sample))
+
+    start = timer()
+    encoded = lsb_codec.encode(image, payload)
+    report("encode", timer() - start, len(payload))
+
+    start = timer()
+    assert lsb_codec.decode(encoded) == payload
+    report("decode", timer() - start, len(payload))
+
+    output = io.BytesIO()
+    start = timer()
+    lsb_codec.decode(encoded, output)
+    report("decode to a stream", timer() - start, len(payload))
+    assert output.getvalue() == payload
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, name)
+                 for name in ("cover.png", "payload", "encoded.png", "out")]
+        image.save(paths[0])
+        with open(paths[1], "wb") as file:
+            file.write(payload)
+        start = timer()
+        lsb_codec.encode_file(paths[0], paths[1], paths[2])
+        report("encode_file with PNG I/O", timer() - start, len(payload))
+        start = timer()
+        lsb_codec.decode_file(paths[2], paths[3])
+        report("decode_file with PNG I/O", timer() - start, len(payload))
+        with open(paths[3], "rb") as file:
+            assert file.read() == payload
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,11 @@
 # with open('photo.jpg', 'ab') as f:
 #     f.write(b"Hello World")
 
-with open('photo.jpg', 'rb') as f:
-    content = f.read()
-    offset = content.index(bytes.fromhex('FFD9'))
+import trailer
 
-    f.seek(offset + 2)
-    print(f.read())
+# the first FFD9 can belong to the EXIF thumbnail, the scanner walks the
+# segments up to the real end of the image
+print(trailer.read_payload('photo.jpg'))
 
 ###
 
@@ -14,7 +13,7 @@ import PIL.Image
 import io
 
 img = PIL.Image.open('heart.png')
-byte_arr = io.ByteIO()
+byte_arr = io.BytesIO()
 img.save(byte_arr, format='PNG')
 
 with open('photo.jpg', 'ab') as f:
@@ -22,14 +21,8 @@ with open('photo.jpg', 'ab') as f:
 
 ###
 
-with open('test.jpg', 'rb') as f:
-    content = f.read()
-    offset = content.index(bytes.fromhex('FFD9'))
-
-    f.seek(offset + 2)
-
-    new_img = PIL.Image.open(io.ByteIO(f.read()))
-    new_img.save("new_image.png")
+new_img = PIL.Image.open(io.BytesIO(trailer.read_payload('test.jpg')))
+new_img.save("new_image.png")
 
 ### executable
 
@@ -38,11 +31,4 @@ with open('photo.jpg', 'ab') as f, open('procexp64.exe', 'rb') as e:
 
 #
 
-with open('photo.jpg', 'rb') as f:
-    content = f.read()
-    oddset = content.index(bytes.fromhex('FFD9'))
-
-    f.seek(offset + 2)
-
-    with open('newfile.exe', 'wb') as e:
-        e.write(f.read())
\ No newline at end of file
+trailer.extract('photo.jpg', 'newfile.exe')
\ No newline at end of file
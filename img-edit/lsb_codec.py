@@ -0,0 +1,117 @@
+"""Hide bytes in the least significant bits of an image.
+
+Every colour channel value carries one payload bit, alpha is left alone.
+The payload is preceded by its length as an 8 byte big-endian number.
+Payloads are embedded and extracted CHUNK_SIZE bytes at a time with NumPy,
+so the only full size array is the image itself, a payload can be
+streamed from and to files larger than memory.
+
+pip install numpy
+pip install pillow
+"""
+
+import io
+import os
+import struct
+
+import numpy as np
+import PIL.Image
+
+HEADER = struct.Struct("!Q")
+# payload bytes embedded per step, 8 channel values each
+CHUNK_SIZE = 1 << 20
+
+
+class Carrier:
+    """The colour channels of an image as one flat uint8 array"""
+
+    def __init__(self, image):
+        if image.mode not in ("L", "LA", "RGB", "RGBA"):
+            raise ValueError(f"Image mode {image.mode} is not supported")
+        self.pixels = np.array(image)
+        self.has_alpha = image.mode in ("LA", "RGBA")
+        if self.has_alpha:
+            # without alpha the channels are not contiguous any more
+            self.values = np.ascontiguousarray(
+                self.pixels[..., :-1]).reshape(-1)
+        else:
+            self.values = self.pixels.reshape(-1)
+
+    def capacity(self):
+        """Payload bytes that fit next to the header"""
+        return max(self.values.size // 8 - HEADER.size, 0)
+
+    def write(self, position, data):
+        """Puts the bits of data into the values starting at byte position"""
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        values = self.values[position * 8:position * 8 + bits.size]
+        np.bitwise_and(values, 0xFE, out=values)
+        np.bitwise_or(values, bits, out=values)
+
+    def read(self, position, length):
+        values = self.values[position * 8:(position + length) * 8]
+        return np.packbits(values & 1).tobytes()
+
+    def to_image(self):
+        if self.has_alpha:
+            self.pixels[..., :-1] = self.values.reshape(
+                self.pixels.shape[:-1] + (-1,))
+        return PIL.Image.fromarray(self.pixels)
+
+
+def _payload_length(payload):
+    position = payload.tell()
+    length = payload.seek(0, os.SEEK_END) - position
+    payload.seek(position)
+    return length
+
+
+def encode(image, payload, chunk_size=CHUNK_SIZE):
+    """
+    :param payload: bytes or a binary file, read chunk_size bytes at a time
+    :return: a new image with the payload hidden in it
+    """
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        payload = io.BytesIO(payload)
+    carrier = Carrier(image)
+    length = _payload_length(payload)
+    if length > carrier.capacity():
+        raise ValueError(f"Payload of {length} bytes does not fit, "
+                         f"the image holds {carrier.capacity()} bytes")
+    carrier.write(0, HEADER.pack(length))
+    position = HEADER.size
+    while chunk := payload.read(chunk_size):
+        carrier.write(position, chunk)
+        position += len(chunk)
+    return carrier.to_image()
+
+
+def decode(image, output=None, chunk_size=CHUNK_SIZE):
+    """
+    :param output: binary file the payload is written to chunk by chunk,
+                   when None the payload is returned as bytes
+    """
+    carrier = Carrier(image)
+    if carrier.values.size < HEADER.size * 8:
+        raise ValueError("Image is too small to contain a payload")
+    length, = HEADER.unpack(carrier.read(0, HEADER.size))
+    if length > carrier.capacity():
+        raise ValueError("Image does not contain a payload")
+    if output is None:
+        return carrier.read(HEADER.size, length)
+    for start in range(0, length, chunk_size):
+        output.write(carrier.read(HEADER.size + start,
+                                  min(chunk_size, length - start)))
+
+
+def encode_file(image_path, payload_path, output_path):
+    with PIL.Image.open(image_path) as image, \
+            open(payload_path, "rb") as payload:
+        # PNG keeps every bit, a lossy format would destroy the payload
+        encode(image, payload).save(output_path, format="PNG")
+
+
+def decode_file(image_path, output_path):
+    with PIL.Image.open(image_path) as image, \
+            open(output_path, "wb") as output:
+        decode(image, output)
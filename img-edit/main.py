@@ -10,18 +10,15 @@ IEND = End of File
 
 # hexdump -C {img_name}
 
-end_hex = b"\x00\x00\x00\x00\x49\x45\x4e\x44\xae\x42\x60\x82"
+import trailer
 
 with open('image.png', 'ab') as f:
     f.write(b"Hello World! This is my secret!")
 
 # NEXT
 
-with open('image.png', 'rb') as f:
-    content = f.read()
-    offset = content.index(end_hex)
-    f.seek(offset + len(end_hex))
-    print(f.read())
+# walks the chunks up to IEND over an mmap instead of reading the file
+print(trailer.read_payload('image.png'))
 
 ###
 
@@ -30,10 +27,4 @@ with open('image.png', 'ab') as f, open('procexp64.exe', 'rb') as e:
 
 ###
 
-with open('image.png', 'rb') as f:
-    content = f.read()
-    offset = content.index(end_hex)
-    f.seek(offset + len(end_hex))
-
-    with open('newexe.exe', 'wb') as e:
-        e.write(f.read())
+trailer.extract('image.png', 'newexe.exe')
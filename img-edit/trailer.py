@@ -0,0 +1,198 @@
+'''Find and extract data appended after the end of a PNG or JPEG file.
+
+The file is memory-mapped and only its structure is read: PNG chunks are
+skipped by their length fields up to IEND, JPEG segments by their length
+fields up to the start of scan, where the entropy-coded data is searched
+for the next marker. The payload is then copied to the output in chunks,
+so neither the image nor the payload has to fit in memory.
+
+python trailer.py photo.jpg payload.bin
+python trailer.py --batch images/ payloads/
+'''
+
+import argparse
+import mmap
+import os
+import struct
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SOI = b"\xff\xd8"
+CHUNK_SIZE = 1 << 20
+
+PNG_CHUNK = struct.Struct(">I4s")
+JPEG_LENGTH = struct.Struct(">H")
+# markers without a length field: TEM, RST0-RST7 and SOI
+JPEG_STANDALONE = {0x01, *range(0xD0, 0xD8), 0xD8}
+JPEG_EOI = 0xD9
+JPEG_SOS = 0xDA
+
+
+def png_end(data):
+    ''' offset just after the IEND chunk '''
+    offset = len(PNG_SIGNATURE)
+    while offset + PNG_CHUNK.size <= len(data):
+        length, kind = PNG_CHUNK.unpack_from(data, offset)
+        # length, type, data and crc
+        offset += PNG_CHUNK.size + length + 4
+        if kind == b"IEND":
+            if offset > len(data):
+                break
+            return offset
+    raise ValueError("PNG ends before its IEND chunk")
+
+
+def jpeg_end(data):
+    ''' offset just after the EOI marker '''
+    offset = len(JPEG_SOI)
+    while offset + 2 <= len(data):
+        if data[offset] != 0xFF:
+            raise ValueError(f"No JPEG marker at offset {offset}")
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # fill byte before a marker
+            offset += 1
+            continue
+        if marker == JPEG_EOI:
+            return offset + 2
+        if marker in JPEG_STANDALONE:
+            offset += 2
+            continue
+        length, = JPEG_LENGTH.unpack_from(data, offset + 2)
+        offset += 2 + length
+        if marker == JPEG_SOS:
+            offset = _skip_scan(data, offset)
+    raise ValueError("JPEG ends before its EOI marker")
+
+
+def _skip_scan(data, offset):
+    ''' offset of the first marker after entropy-coded data '''
+    while True:
+        offset = data.find(b"\xff", offset)
+        if offset == -1 or offset + 1 >= len(data):
+            raise ValueError("JPEG ends inside scan data")
+        following = data[offset + 1]
+        # 0xFF00 is an escaped 0xFF byte, restart markers stay in the scan
+        if following == 0x00 or 0xD0 <= following <= 0xD7:
+            offset += 2
+        elif following == 0xFF:
+            offset += 1
+        else:
+            return offset
+
+
+def image_end(data):
+    ''' offset where the image ends and appended data would start '''
+    if data[:len(PNG_SIGNATURE)] == PNG_SIGNATURE:
+        return png_end(data)
+    if data[:len(JPEG_SOI)] == JPEG_SOI:
+        return jpeg_end(data)
+    raise ValueError("Not a PNG or JPEG file")
+
+
+class Trailer:
+    '''
+    The memory-mapped image file and the offset its payload starts at
+
+    with Trailer('image.png') as trailer:
+        print(trailer.size)
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            if os.fstat(self.file.fileno()).st_size == 0:
+                raise ValueError(f"{path} is empty")
+            self.data = mmap.mmap(self.file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+            self.offset = image_end(self.data)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def size(self):
+        ''' bytes appended after the image '''
+        return len(self.data) - self.offset
+
+    def read(self):
+        return self.data[self.offset:]
+
+    def copy_to(self, output, chunk_size=CHUNK_SIZE):
+        for start in range(self.offset, len(self.data), chunk_size):
+            output.write(self.data[start:start + chunk_size])
+
+    def close(self):
+        if getattr(self, "data", None) is not None:
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_payload(path):
+    with Trailer(path) as trailer:
+        return trailer.read()
+
+
+def extract(path, output_path, chunk_size=CHUNK_SIZE):
+    '''
+    writes the data appended to the image at path to output_path
+    :return: the number of bytes written
+    '''
+    with Trailer(path) as trailer, open(output_path, "wb") as output:
+        trailer.copy_to(output, chunk_size)
+        return trailer.size
+
+
+def scan_directory(directory, output_directory=None):
+    '''
+    yields (path, payload size or the error) for every PNG and JPEG file,
+    payloads are extracted to output_directory when it is given
+    '''
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if not entry.is_file() or not entry.name.lower().endswith(
+                (".png", ".jpg", ".jpeg")):
+            continue
+        try:
+            with Trailer(entry.path) as trailer:
+                if output_directory is not None and trailer.size:
+                    os.makedirs(output_directory, exist_ok=True)
+                    output_path = os.path.join(output_directory,
+                                               entry.name + ".payload")
+                    with open(output_path, "wb") as output:
+                        trailer.copy_to(output)
+                yield entry.path, trailer.size
+        except (ValueError, OSError) as e:
+            yield entry.path, e
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("image", help="image file, or directory with --batch")
+    parser.add_argument("output", nargs="?",
+                        help="file, or directory with --batch, "
+                             "the payload is written to")
+    parser.add_argument("--batch", action="store_true")
+    args = parser.parse_args()
+
+    if args.batch:
+        for path, result in scan_directory(args.image, args.output):
+            if isinstance(result, Exception):
+                print(f"{path}: {result}")
+            elif result:
+                print(f"{path}: {result} bytes appended")
+    elif args.output:
+        print(f"{extract(args.image, args.output)} bytes written "
+              f"to {args.output}")
+    else:
+        with Trailer(args.image) as trailer:
+            print(f"{trailer.size} bytes appended at offset {trailer.offset}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Micro-benchmark of link extraction: UrlParser (HTMLParser) with
+UrlFilterer.filter_url against LinkExtractor, over saved html pages.
+
+python benchmark_links.py saved_pages/   -- every *.html file in the folder,
+                                            named like the url it came from
+python benchmark_links.py                -- generated pages of a fake site
+"""
+from __future__ import annotations
+
+import pathlib
+import random
+import sys
+import time
+import urllib.parse
+
+from web_crawler import LinkExtractor, UrlFilterer, UrlParser
+
+
+def generated_pages(count: int = 200) -> list[tuple[str, str]]:
+    rng = random.Random(0)
+    nav = "".join(f'<li><a href="/section/{i}/">Section {i}</a></li>'
+                  for i in range(50))
+    pages = []
+    for number in range(count):
+        paragraphs = "".join(
+            f'<p class="text">Lorem ipsum <b>dolor</b> sit amet '
+            f'<a href="../post/{rng.randrange(10_000)}.html?ref=a&amp;b=1#c">'
+            f'link</a> and <a href="https://other.example/{i}">out</a>.</p>'
+            for i in range(300)
+        )
+        html = (f"<html><head><title>{number}</title></head><body>"
+                f"<ul>{nav}</ul>{paragraphs}</body></html>")
+        pages.append((f"https://mcoding.io/post/{number}/", html))
+    return pages
+
+
+def saved_pages(folder: str) -> list[tuple[str, str]]:
+    return [
+        (f"https://{urllib.parse.unquote(path.stem)}",
+         path.read_text(encoding="utf-8", errors="replace"))
+        for path in sorted(pathlib.Path(folder).glob("*.html"))
+    ]
+
+
+def with_url_parser(filter_url, base: str, text: str) -> set[str]:
+    parser = UrlParser(base, filter_url)
+    parser.feed(text)
+    return parser.found_links
+
+
+def main():
+    pages = saved_pages(sys.argv[1]) if len(sys.argv) > 1 else generated_pages()
+    megabytes = sum(len(text) for _, text in pages) / 1e6
+    filterer = UrlFilterer(
+        allowed_domains={"mcoding.io"},
+        allowed_schemes={"http", "https"},
+        allowed_filetypes={".html", ".php", ""},
+    )
+    extractor = LinkExtractor(filterer.filter_url)
+
+    results = {}
+    for name, extract in (
+            ("UrlParser", lambda base, text: with_url_parser(
+                filterer.filter_url, base, text)),
+            ("LinkExtractor", extractor),
+    ):
+        start = time.perf_counter()
+        results[name] = [extract(base, text) for base, text in pages]
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14} {len(pages) / elapsed:8.1f} pages/s "
+              f"{megabytes / elapsed:8.2f} MB/s")
+
+    differing = sum(a != b for a, b in zip(*results.values()))
+    print(f"{len(pages)} pages, {megabytes:.1f} MB, "
+          f"{differing} pages with different links")
+
+
+if __name__ == '__main__':
+    main()
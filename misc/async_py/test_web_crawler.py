@@ -0,0 +1,164 @@
+import asyncio
+import collections
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from web_crawler import (
+    Frontier,
+    HostPoliteness,
+    LinkExtractor,
+    PersistentCrawler,
+    UrlFilterer,
+    UrlParser,
+)
+
+PAGES = 60
+
+
+class FixtureSite(BaseHTTPRequestHandler):
+    """/page/n links to /page/2n+1 and /page/2n+2, up to PAGES pages."""
+
+    hits = collections.Counter()
+
+    def do_GET(self):
+        FixtureSite.hits[self.path] += 1
+        number = int(self.path.rsplit("/", 1)[-1])
+        links = "".join(
+            f'<a href="/page/{child}#top">page {child}</a>'
+            for child in (2 * number + 1, 2 * number + 2)
+            if child < PAGES
+        )
+        body = f"<html><body><p>page {number}</p>{links}</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    FixtureSite.hits.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+async def crawl(site: str, frontier: Frontier, limit: int | None = None):
+    filterer = UrlFilterer(allowed_schemes={"http"})
+    async with httpx.AsyncClient() as client:
+        crawler = PersistentCrawler(
+            client=client,
+            urls=[f"{site}/page/0"],
+            filter_url=filterer.filter_url,
+            frontier=frontier,
+            workers=8,
+            limit=limit,
+            politeness=HostPoliteness(max_per_host=4, delay=0),
+        )
+        await crawler.run()
+    return crawler
+
+
+def test_persistent_crawl_visits_every_page_once(site, tmp_path):
+    frontier = Frontier(str(tmp_path / "frontier.sqlite3"))
+    crawler = asyncio.run(crawl(site, frontier))
+    assert frontier.count(Frontier.DONE) == PAGES
+    assert crawler.metrics.pages == PAGES
+    assert crawler.metrics.queue_depth == 0
+    assert crawler.metrics.bytes_fetched > 0
+    assert set(FixtureSite.hits.values()) == {1}
+    frontier.close()
+
+
+def test_persistent_crawl_resumes(site, tmp_path):
+    path = str(tmp_path / "frontier.sqlite3")
+    frontier = Frontier(path)
+    asyncio.run(crawl(site, frontier, limit=10))
+    # a claimed url that was never finished, as if the process died
+    frontier.claim()
+    frontier.close()
+
+    frontier = Frontier(path)
+    assert frontier.count(Frontier.IN_PROGRESS) == 0
+    asyncio.run(crawl(site, frontier))
+    assert frontier.count(Frontier.DONE) == PAGES
+    assert set(FixtureSite.hits.values()) == {1}
+    frontier.close()
+
+
+def test_claim_skips_busy_hosts(tmp_path):
+    frontier = Frontier(str(tmp_path / "frontier.sqlite3"))
+    frontier.add(["http://a.test/1", "http://a.test/2", "http://b.test/1"])
+    assert frontier.claim({"a.test"}) == "http://b.test/1"
+    assert frontier.claim({"a.test"}) is None
+    assert frontier.claim().startswith("http://a.test/")
+    frontier.close()
+
+
+def test_politeness_forgets_hosts_after_their_delay(monkeypatch):
+    now = 0.0
+    monkeypatch.setattr("web_crawler.time.monotonic", lambda: now)
+    politeness = HostPoliteness(max_per_host=1, delay=1)
+    for host in ("a.test", "b.test"):
+        politeness.acquire(host)
+        politeness.release(host)
+    now = 0.5
+    politeness.acquire("a.test")
+    assert politeness.busy_hosts() == {"a.test", "b.test"}
+    now = 1.2
+    assert politeness.busy_hosts() == {"a.test"}
+    politeness.release("a.test")
+    now = 2.0
+    assert politeness.busy_hosts() == set()
+    assert not politeness.next_request
+
+def test_link_extractor_matches_url_parser():
+    filterer = UrlFilterer(
+        allowed_domains={"a.test"},
+        allowed_schemes={"http", "https"},
+        allowed_filetypes={".html", ""},
+    )
+    text = """
+        <A HREF="/about">About</A>
+        <a class='x' href='post/1.html?x=1&amp;y=2#top'>post</a>
+        <a href=//a.test/dir/>dir</a>
+        <a id="no-link">none</a>
+        <a href="https://b.test/">other host</a>
+        <a href="mailto:me@a.test">mail</a>
+        <link href="/style.css">
+    """
+    base = "https://a.test/blog/index.html"
+    parser = UrlParser(base, filterer.filter_url)
+    parser.feed(text)
+    extract_links = LinkExtractor(filterer.filter_url)
+    assert extract_links(base, text) == parser.found_links == {
+        "https://a.test/about",
+        "https://a.test/blog/post/1.html?x=1&y=2",
+        "https://a.test/dir/",
+    }
+    # second page of the same site hits the cache and resolves the same way
+    assert "https://a.test/about" in extract_links("https://a.test/x", text)
+
+
+@pytest.mark.parametrize("text, link", [
+    ('<a data-href="/track" href="/real">x</a>', "https://a.test/real"),
+    ('<a title="a > b" href="/after">x</a>', "https://a.test/after"),
+    ("<a title='a > b'\nhref=/unquoted>x</a>", "https://a.test/unquoted"),
+])
+def test_link_extractor_attributes(text, link):
+    filterer = UrlFilterer(allowed_domains={"a.test"},
+                           allowed_schemes={"https"})
+    base = "https://a.test/"
+    parser = UrlParser(base, filterer.filter_url)
+    parser.feed(text)
+    links = LinkExtractor(filterer.filter_url)(base, text)
+    assert links == parser.found_links == {link}
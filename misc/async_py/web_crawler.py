@@ -1,8 +1,17 @@
 from __future__ import annotations
 
 import asyncio
+import collections
+import concurrent.futures
+import dataclasses
+import functools
+import heapq
+import html
 import html.parser
 import pathlib
+import re
+import sqlite3
+import sys
 import time
 import urllib.parse
 from typing import Callable, Iterable
@@ -62,6 +71,54 @@ class UrlParser(html.parser.HTMLParser):
                 self.found_links.add(url)
 
 
+class LinkExtractor:
+    """Finds <a href="..."> links with a regex scan instead of a full
+    HTMLParser pass, and caches filter_url results.
+
+    Unlike UrlParser it also picks up anchors inside comments and scripts,
+    the url filter drops the ones that are not crawlable anyway.
+    """
+    # quoted attribute values are skipped whole, they may contain ">", and
+    # href has to follow whitespace, so data-href is not taken for it
+    ANCHOR_HREF = re.compile(
+        r"""<a\s(?:[^>"']|"[^"]*"|'[^']*')*?(?<=\s)href\s*=\s*"""
+        r"""(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""",
+        re.IGNORECASE,
+    )
+    SCHEME = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+    def __init__(
+            self,
+            filter_url: Callable[[str, str], str | None],
+            cache_size: int = 100_000,
+    ):
+        self.filter_url = filter_url
+        self._filter_cached = functools.lru_cache(maxsize=cache_size)(
+            filter_url)
+
+    def __call__(self, base: str, text: str) -> set[str]:
+        parsed = urllib.parse.urlsplit(base)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        found_links = set()
+        for match in self.ANCHOR_HREF.finditer(text):
+            url = match.group(1) or match.group(2) or match.group(3) or ""
+            if "&" in url:
+                url = html.unescape(url)
+            # cache by the part of base that the href is resolved against,
+            # so e.g. "/about" on every page of a site is filtered once
+            if self.SCHEME.match(url):
+                context = ""
+            elif url.startswith("//"):
+                context = f"{parsed.scheme}:"
+            elif url.startswith("/"):
+                context = origin
+            else:
+                context = base
+            if (url := self._filter_cached(context, url)) is not None:
+                found_links.add(url)
+        return found_links
+
+
 class Crawler:
     def __init__(
             self,
@@ -70,6 +127,7 @@ class Crawler:
             filter_url: Callable[[str, str], str | None],
             workers: int = 10,
             limit: int = 25,
+            executor: concurrent.futures.Executor | None = None,
     ):
         self.client = client
 
@@ -79,6 +137,9 @@ class Crawler:
         self.done = set()
 
         self.filter_url = filter_url
+        self.extract_links = LinkExtractor(filter_url)
+        # link extraction runs here, off the event loop
+        self.executor = executor
         self.num_workers = workers
         self.limit = limit
         self.total = 0
@@ -128,9 +189,9 @@ class Crawler:
         self.done.add(url)
 
     async def parse_links(self, base: str, text: str) -> set[str]:
-        parser = UrlParser(base, self.filter_url)
-        parser.feed(text)
-        return parser.found_links
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.extract_links, base, text)
 
     async def on_found_links(self, urls: set[str]):
         new = urls - self.seen
@@ -148,6 +209,284 @@ class Crawler:
         await self.todo.put(url)
 
 
+class Frontier:
+    """Disk-backed frontier and seen-set, so a crawl can grow to millions of
+    urls and continue after a crash.
+
+    Every url ever found is a row of an SQLite table, its state says
+    whether it is still to do, being crawled, done or failed.
+    """
+    TODO, IN_PROGRESS, DONE, FAILED = range(4)
+
+    def __init__(self, path: str):
+        # PersistentCrawler calls it from its own single frontier thread
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS url ("
+            "url TEXT PRIMARY KEY, host TEXT NOT NULL, "
+            "state INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS url_state_host ON url (state, host)"
+        )
+        self.last_host = ""
+        # urls that were being crawled when the previous run died
+        with self.db:
+            self.db.execute(
+                "UPDATE url SET state = ? WHERE state = ?",
+                (self.TODO, self.IN_PROGRESS),
+            )
+
+    def add(self, urls: Iterable[str]) -> int:
+        """Adds unseen urls to the frontier, returns how many were new."""
+        with self.db:
+            cursor = self.db.executemany(
+                "INSERT OR IGNORE INTO url (url, host) VALUES (?, ?)",
+                ((url, urllib.parse.urlparse(url).netloc) for url in urls),
+            )
+        return cursor.rowcount
+
+    def claim(self, busy_hosts: set[str] = frozenset()) -> str | None:
+        """Takes a url to crawl, skipping hosts that can't be crawled now.
+
+        Hosts are visited round robin by walking the (state, host) index,
+        so a claim costs a few index lookups however long the frontier is.
+        """
+        host = self._next_host(self.last_host, busy_hosts)
+        if host is None:
+            host = self._next_host("", busy_hosts)
+        if host is None:
+            return None
+        self.last_host = host
+        url = self.db.execute(
+            "SELECT url FROM url WHERE state = ? AND host = ? LIMIT 1",
+            (self.TODO, host),
+        ).fetchone()[0]
+        self.set_state(url, self.IN_PROGRESS)
+        return url
+
+    def _next_host(self, after: str, busy_hosts: set[str]) -> str | None:
+        while True:
+            row = self.db.execute(
+                "SELECT host FROM url WHERE state = ? AND host > ? "
+                "ORDER BY host LIMIT 1",
+                (self.TODO, after),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] not in busy_hosts:
+                return row[0]
+            after = row[0]
+
+    def has_todo(self) -> bool:
+        return self.db.execute(
+            "SELECT 1 FROM url WHERE state = ? LIMIT 1", (self.TODO,)
+        ).fetchone() is not None
+
+    def complete(self, url: str, found_urls: Iterable[str]) -> int:
+        """Marks url done and adds the urls found on it in one transaction,
+        returns how many of them were new."""
+        with self.db:
+            cursor = self.db.executemany(
+                "INSERT OR IGNORE INTO url (url, host) VALUES (?, ?)",
+                ((found, urllib.parse.urlparse(found).netloc)
+                 for found in found_urls),
+            )
+            self.db.execute("UPDATE url SET state = ? WHERE url = ?",
+                            (self.DONE, url))
+        return cursor.rowcount
+
+    def set_state(self, url: str, state: int):
+        with self.db:
+            self.db.execute("UPDATE url SET state = ? WHERE url = ?", (state, url))
+
+    def count(self, state: int) -> int:
+        return self.db.execute(
+            "SELECT count(*) FROM url WHERE state = ?", (state,)
+        ).fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+class HostPoliteness:
+    """Per-host concurrency limit and minimal delay between requests.
+
+    Only hosts with requests in flight or inside their delay are kept,
+    so busy_hosts costs O(busy hosts), not O(hosts ever crawled).
+    """
+
+    def __init__(self, max_per_host: int = 2, delay: float = 0.1):
+        self.max_per_host = max_per_host
+        self.delay = delay
+        self.active: collections.Counter[str] = collections.Counter()
+        self.next_request: dict[str, float] = {}
+        # (time, host) for every delay started, the ones a later acquire
+        # of the same host has overridden are skipped when popped
+        self._delays: list[tuple[float, str]] = []
+
+    def busy_hosts(self) -> set[str]:
+        now = time.monotonic()
+        while self._delays and self._delays[0][0] <= now:
+            at, host = heapq.heappop(self._delays)
+            if self.next_request.get(host) == at:
+                del self.next_request[host]
+        busy = {host for host, n in self.active.items()
+                if n >= self.max_per_host}
+        busy.update(self.next_request)
+        return busy
+
+    def acquire(self, host: str):
+        self.active[host] += 1
+        if self.delay > 0:
+            at = time.monotonic() + self.delay
+            self.next_request[host] = at
+            heapq.heappush(self._delays, (at, host))
+
+    def release(self, host: str):
+        self.active[host] -= 1
+        if not self.active[host]:
+            del self.active[host]
+
+
+@dataclasses.dataclass
+class CrawlMetrics:
+    pages: int = 0
+    failed: int = 0
+    bytes_fetched: int = 0
+    in_flight: int = 0
+    queue_depth: int = 0
+    started: float = dataclasses.field(default_factory=time.perf_counter)
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / max(time.perf_counter() - self.started, 1e-9)
+
+    def __str__(self) -> str:
+        return (f"{self.pages} pages ({self.pages_per_sec:.1f}/s), "
+                f"{self.failed} failed, {self.bytes_fetched / 1e6:.2f} MB, "
+                f"queue depth {self.queue_depth}, in flight {self.in_flight}")
+
+
+class PersistentCrawler(Crawler):
+    """Crawler whose todo and seen sets live in a Frontier on disk.
+
+    Workers take urls from the frontier, skipping hosts that are at their
+    concurrency limit or inside their politeness delay. Killing the
+    process loses at most the pages being crawled at that moment,
+    running again with the same frontier continues the crawl.
+
+    Frontier calls run on one thread of their own, so SQLite I/O does not
+    block the event loop and the calls never overlap.
+    """
+
+    def __init__(
+            self,
+            client: httpx.AsyncClient,
+            urls: Iterable[str],
+            filter_url: Callable[[str, str], str | None],
+            frontier: Frontier,
+            workers: int = 10,
+            limit: int | None = None,
+            politeness: HostPoliteness | None = None,
+            report_every: float | None = None,
+            executor: concurrent.futures.Executor | None = None,
+    ):
+        super().__init__(client, urls, filter_url, workers,
+                         limit if limit is not None else 0, executor)
+        self.limit = limit
+        self.frontier = frontier
+        self.politeness = politeness or HostPoliteness()
+        self.report_every = report_every
+        self.metrics = CrawlMetrics()
+        self.claiming = 0
+        self.frontier_executor: concurrent.futures.Executor | None = None
+
+    async def run(self):
+        self.frontier_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="frontier")
+        reporter = None
+        try:
+            await self.in_frontier(self.frontier.add, self.start_urls)
+            self.metrics.queue_depth = await self.in_frontier(
+                self.frontier.count, Frontier.TODO)
+            if self.report_every:
+                reporter = asyncio.create_task(self.report())
+            await asyncio.gather(
+                *(self.worker() for _ in range(self.num_workers)))
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+            self.frontier_executor.shutdown()
+
+    async def in_frontier(self, function: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.frontier_executor, function, *args)
+
+    async def worker(self):
+        while self.limit is None or self.total < self.limit:
+            # counted before the claim returns, so other workers neither
+            # go over the limit nor stop while this one may get a url
+            self.total += 1
+            self.claiming += 1
+            try:
+                url = await self.in_frontier(
+                    self.frontier.claim, self.politeness.busy_hosts())
+            finally:
+                self.claiming -= 1
+            if url is None:
+                self.total -= 1
+                # nothing can add urls once no page is being crawled or
+                # claimed, and has_todo runs after every claim already sent
+                if (not self.metrics.in_flight and not self.claiming
+                        and not await self.in_frontier(
+                            self.frontier.has_todo)):
+                    return
+                # every host is busy or waiting for its politeness delay
+                await asyncio.sleep(self.politeness.delay / 10 or 0.01)
+                continue
+            self.metrics.queue_depth -= 1
+            await self.crawl(url)
+
+    async def crawl(self, url: str):
+        host = urllib.parse.urlparse(url).netloc
+        self.politeness.acquire(host)
+        # the page stays in flight until the frontier has its links
+        self.metrics.in_flight += 1
+        try:
+            try:
+                response = await self.client.get(url, follow_redirects=True)
+                response.raise_for_status()
+                found_links = await self.parse_links(
+                    base=str(response.url),
+                    text=response.text,
+                )
+            except Exception:
+                # failed urls are kept in the frontier, but not retried
+                await self.in_frontier(
+                    self.frontier.set_state, url, Frontier.FAILED)
+                self.metrics.failed += 1
+                return
+            finally:
+                self.politeness.release(host)
+
+            new = await self.in_frontier(
+                self.frontier.complete, url, found_links)
+            self.metrics.queue_depth += new
+            self.metrics.pages += 1
+            self.metrics.bytes_fetched += len(response.content)
+        finally:
+            self.metrics.in_flight -= 1
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(self.report_every)
+            print(self.metrics)
+
+
 async def main():
     filterer = UrlFilterer(
         allowed_domains={"mcoding.io"},
@@ -176,5 +515,32 @@ async def main():
     print(f"Done in {end - start:.2f}s")
 
 
+async def main_persistent(frontier_path: str):
+    filterer = UrlFilterer(
+        allowed_domains={"mcoding.io"},
+        allowed_schemes={"http", "https"},
+        allowed_filetypes={".html", ".php", ""},
+    )
+
+    frontier = Frontier(frontier_path)
+    async with httpx.AsyncClient() as client:
+        crawler = PersistentCrawler(
+            client=client,
+            urls=["https://mcoding.io/"],
+            filter_url=filterer.filter_url,
+            frontier=frontier,
+            workers=20,
+            politeness=HostPoliteness(max_per_host=4, delay=0.1),
+            report_every=1.0,
+        )
+        await crawler.run()
+    print(f"Done: {crawler.metrics}")
+    frontier.close()
+
+
 if __name__ == '__main__':
-    asyncio.run(main(), debug=True)
+    if len(sys.argv) > 1:
+        # python web_crawler.py crawl.sqlite3 -- resumable crawl
+        asyncio.run(main_persistent(sys.argv[1]))
+    else:
+        asyncio.run(main(), debug=True)
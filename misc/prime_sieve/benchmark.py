@@ -0,0 +1,72 @@
+''' Segmented sieve against the other prime finders in this repository '''
+
+# the Cython module has to be built first:
+# >>> cd cython_code/primes && python setup.py build_ext --inplace
+
+import os
+import sys
+from multiprocessing import cpu_count
+from timeit import default_timer as timer
+
+from segmented_sieve import count_primes, first_primes, iter_primes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path[:0] = [os.path.join(ROOT, 'misc'),
+                os.path.join(ROOT, 'cython_code', 'primes'),
+                os.path.join(ROOT, 'concurrency', 'mastering_concurrency')]
+
+from the_Sieve_of_Eratosthenes import primes_less_then  # noqa: E402
+from check_if_prime_num import IsPrime  # noqa: E402
+
+try:
+    import prime_cython
+except ImportError:
+    prime_cython = None
+
+
+def measure(name, function, *args):
+    start = timer()
+    result = function(*args)
+    print(f'{name:<40}{timer() - start:>10.3f}s')
+    return result
+
+
+def first_amount(amount=4000):
+    print(f'first {amount} primes')
+    expected = measure('segmented sieve', first_primes, amount)
+    if prime_cython is None:
+        print('prime_cython is not built, skipping the Cython finders')
+        return
+    for name in ('prime_finder_vanilla', 'prime_finder_optimized'):
+        result = measure(name, getattr(prime_cython, name), amount)
+        assert result == expected
+
+
+def below(n=10 ** 7):
+    print(f'primes below {n}')
+    expected = measure('primes_less_then', primes_less_then, n)
+    result = measure('iter_primes', lambda: list(iter_primes(0, n)))
+    assert result == expected
+
+
+def window(lo=10 ** 10, width=10 ** 4):
+    print(f'primes in [{lo}, {lo + width})')
+    expected = measure('IsPrime.is_prime', lambda: [
+        i for i in range(lo, lo + width) if IsPrime.is_prime(i)])
+    result = measure('iter_primes', lambda: list(iter_primes(lo, lo + width)))
+    assert result == expected
+
+
+def scaling(n=10 ** 9):
+    print(f'count of primes below {n}')
+    for processes in range(1, cpu_count() + 1):
+        measure(f'count_primes, {processes} process(es)',
+                count_primes, 0, n, processes)
+
+
+if __name__ == '__main__':
+    first_amount()
+    below()
+    window()
+    scaling()
@@ -0,0 +1,140 @@
+''' Segmented Sieve of Eratosthenes '''
+
+# the_Sieve_of_Eratosthenes.py keeps one Python bool per number below n,
+# which does not fit in memory for n = 10 ** 9. Here [lo, hi) is sieved in
+# fixed size segments that only store the odd numbers, one byte each, so
+# the memory use depends on the segment size and not on hi. Crossing off
+# the multiples of a prime is a single slice assignment on a bytearray,
+# which runs in C instead of a Python loop.
+
+from array import array
+from functools import partial
+from itertools import compress, islice
+from math import isqrt, log
+from multiprocessing import Pool
+
+# odd numbers per segment, 1 MiB of flags, about 2 million numbers
+SEGMENT_SIZE = 1 << 20
+
+
+def small_primes(n: int) -> list[int]:
+    ''' odd primes below n, with a plain sieve '''
+    if n <= 3:
+        return []
+    # flags[i] stands for 2 * i + 1
+    flags = bytearray([1]) * (n // 2)
+    flags[0] = 0
+    for i in range(1, (isqrt(n - 1) - 1) // 2 + 1):
+        if flags[i]:
+            p = 2 * i + 1
+            start = p * p // 2
+            flags[start::p] = bytes(len(range(start, len(flags), p)))
+    return list(compress(range(1, n, 2), flags))
+
+
+def sieve_segment(lo: int, hi: int, primes: list[int]) -> bytearray:
+    '''
+    flags for the odd numbers lo, lo + 2, ... below hi
+    :param lo: odd start of the segment
+    :param primes: the odd primes up to isqrt(hi - 1)
+    '''
+    size = (hi - lo + 1) // 2
+    flags = bytearray([1]) * size
+    if lo == 1 and size:
+        flags[0] = 0
+    for p in primes:
+        square = p * p
+        if square >= hi:
+            break
+        if square >= lo:
+            start = square
+        else:
+            # first odd multiple of p at or after lo
+            start = -(-lo // p) * p
+            if start % 2 == 0:
+                start += p
+        # odd multiples are 2p apart, which is p flags apart
+        index = (start - lo) // 2
+        if index < size:
+            flags[index::p] = bytes(len(range(index, size, p)))
+    return flags
+
+
+def _segments(lo: int, hi: int, segment_size: int):
+    lo = max(lo, 3) | 1
+    for start in range(lo, hi, 2 * segment_size):
+        yield start, min(start + 2 * segment_size, hi)
+
+
+# the base primes of a pool worker, only set in the worker processes
+_primes = []
+
+
+def _init_worker(primes: list[int]) -> None:
+    global _primes
+    _primes = primes
+
+
+def _with_worker_primes(function, bounds: tuple[int, int]):
+    return function(bounds, _primes)
+
+
+def _segment_primes(bounds: tuple[int, int], primes: list[int]) -> array:
+    lo, hi = bounds
+    # array pickles as one block of machine integers instead of int objects
+    return array('Q', compress(range(lo, hi, 2),
+                               sieve_segment(lo, hi, primes)))
+
+
+def _segment_count(bounds: tuple[int, int], primes: list[int]) -> int:
+    lo, hi = bounds
+    return sieve_segment(lo, hi, primes).count(1)
+
+
+def _run(function, lo: int, hi: int, processes: int | None,
+         segment_size: int):
+    '''
+    applies function to every segment and the base primes, in order
+    Every call has its own base primes, so generators can be interleaved.
+    '''
+    primes = small_primes(isqrt(max(hi - 1, 0)) + 1)
+    segments = _segments(lo, hi, segment_size)
+    if processes == 1:
+        yield from map(partial(function, primes=primes), segments)
+        return
+    with Pool(processes, _init_worker, (primes,)) as pool:
+        yield from pool.imap(partial(_with_worker_primes, function),
+                             segments)
+
+
+def iter_primes(lo: int, hi: int, processes: int | None = 1,
+                segment_size: int = SEGMENT_SIZE):
+    '''
+    yields the primes p with lo <= p < hi in increasing order, sieving
+    one segment at a time
+    :param processes: sieve the segments in a process pool, None for one
+                      process per CPU
+    '''
+    if lo <= 2 < hi:
+        yield 2
+    for primes in _run(_segment_primes, lo, hi, processes, segment_size):
+        yield from primes
+
+
+def count_primes(lo: int, hi: int, processes: int | None = 1,
+                 segment_size: int = SEGMENT_SIZE) -> int:
+    ''' number of primes p with lo <= p < hi '''
+    return int(lo <= 2 < hi) + sum(
+        _run(_segment_count, lo, hi, processes, segment_size))
+
+
+def first_primes(amount: int, processes: int | None = 1) -> list[int]:
+    ''' the first amount primes, like prime_finder_vanilla in cython_code '''
+    # the n-th prime is below n (ln n + ln ln n) for n >= 6
+    bound = 15 if amount < 6 else int(amount * (log(amount)
+                                                + log(log(amount)))) + 1
+    return list(islice(iter_primes(0, bound, processes), amount))
+
+
+if __name__ == '__main__':
+    print(list(iter_primes(0, 1000)))
@@ -0,0 +1,57 @@
+from itertools import islice
+
+import pytest
+
+from segmented_sieve import count_primes, first_primes, iter_primes
+
+
+def trial_division(lo, hi):
+    return [n for n in range(max(lo, 2), hi)
+            if all(n % d for d in range(2, int(n ** 0.5) + 1))]
+
+
+@pytest.mark.parametrize('lo, hi', [
+    (0, 0), (0, 2), (0, 3), (2, 3), (3, 4), (0, 100), (1, 2), (9, 10),
+    (97, 98), (1000, 2000), (7919, 7920), (10 ** 6, 10 ** 6 + 1000),
+])
+def test_matches_trial_division(lo, hi):
+    assert list(iter_primes(lo, hi)) == trial_division(lo, hi)
+    assert count_primes(lo, hi) == len(trial_division(lo, hi))
+
+
+@pytest.mark.parametrize('segment_size', [1, 2, 3, 7, 64])
+def test_segment_boundaries(segment_size):
+    expected = trial_division(0, 5000)
+    assert list(iter_primes(0, 5000, segment_size=segment_size)) == expected
+    assert list(iter_primes(1001, 4000, segment_size=segment_size)) == [
+        p for p in expected if 1001 <= p < 4000]
+
+
+def test_process_pool():
+    expected = list(iter_primes(0, 200000))
+    assert list(iter_primes(0, 200000, 2, segment_size=1000)) == expected
+    assert count_primes(0, 200000, 2, segment_size=1000) == len(expected)
+
+
+def test_known_counts():
+    assert count_primes(0, 10 ** 6) == 78498
+    assert count_primes(0, 10 ** 7) == 664579
+
+
+def test_first_primes():
+    for amount in range(12):
+        assert first_primes(amount) == trial_division(0, 40)[:amount]
+    assert first_primes(4000)[-1] == 37813
+
+
+def test_interleaved_generators():
+    expected = list(islice(iter_primes(10 ** 12, 10 ** 12 + 10 ** 6), 510))
+    big = iter_primes(10 ** 12, 10 ** 12 + 10 ** 6, segment_size=1000)
+    first = list(islice(big, 10))
+    assert list(iter_primes(0, 100)) == trial_division(0, 100)
+    assert first + list(islice(big, 500)) == expected
+
+
+def test_streams_lazily():
+    primes = iter_primes(10 ** 15, 10 ** 15 + 10 ** 9, segment_size=1000)
+    assert next(primes) == 10 ** 15 + 37
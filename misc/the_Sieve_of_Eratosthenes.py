@@ -36,9 +36,12 @@ def NEW(n: int) -> list[int]:
 
 def test():
     import time
+    # primes_less_then needs a list of 10 ** 9 bools, the segmented sieve
+    # keeps only one segment in memory
+    from prime_sieve.segmented_sieve import count_primes
 
     start = time.perf_counter()
-    print(len(primes_less_then(100 ** 9))) # should be 50,847,537 according to wikipedia
+    print(count_primes(0, 10 ** 9)) # should be 50,847,534 according to wikipedia
     elapsed = time.perf_counter() - start
     print(f'done in {elapsed:.2f}s')
 
@@ -0,0 +1,37 @@
+"""Times fetch_terms_from_pdf_files over the sample paper folder for
+several worker counts.
+
+    python benchmark_fetch.py --workers 1 2 4 --paper-folder ../papers
+"""
+import argparse
+import time
+
+from scrape.config import read_config
+from scrape.fetch import fetch_terms_from_pdf_files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--paper-folder", help="overrides paper_folder of config.json")
+    args = parser.parse_args()
+
+    config = read_config("./config.json")
+    if args.paper_folder:
+        config.paper_folder = args.paper_folder
+
+    timings: dict[int, float] = {}
+    for workers in args.workers:
+        start = time.perf_counter()
+        result = fetch_terms_from_pdf_files(config, workers)
+        timings[workers] = time.perf_counter() - start
+        print(f"\n[sciscraper]: {len(result)} pdf files, {workers} workers: {timings[workers]:.2f} s")
+
+    baseline = timings[args.workers[0]]
+    print(f"\n{'workers':>8}{'seconds':>10}{'speedup':>10}")
+    for workers, elapsed in timings.items():
+        print(f"{workers:>8}{elapsed:>10.2f}{baseline / elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
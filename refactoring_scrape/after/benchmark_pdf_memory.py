@@ -0,0 +1,73 @@
+"""Reports the peak memory (tracemalloc) of scraping each pdf in the paper
+folder the old way, with all pages copied three times and joined, and with
+the page-streaming PDFScraper, optionally stopping after --max-pages.
+
+    python benchmark_pdf_memory.py --paper-folder ../papers --max-pages 3
+"""
+import argparse
+import re
+import time
+import tracemalloc
+from fnmatch import fnmatch
+from os import listdir, path
+from typing import Callable, Optional
+
+import pdfplumber
+
+from scrape.config import read_config
+from scrape.pdf import PDFScraper, compute_filtered_tokens
+
+
+def scrape_words_in_memory(search_text: str) -> set[str]:
+    """The text extraction of PDFScraper.scrape before page streaming."""
+    preprints: list[str] = []
+    with pdfplumber.open(search_text) as study:
+        for page in study.pages:
+            preprints.append(page.extract_text(x_tolerance=3, y_tolerance=3))
+        manuscripts = [str(preprint).strip().lower() for preprint in preprints]
+        postprints = [re.sub(r"\W+", " ", manuscript) for manuscript in manuscripts]
+        return compute_filtered_tokens(["\n".join(postprints)])
+
+
+def measure(function: Callable[[], object]) -> tuple[float, float]:
+    """Returns the peak traced memory in MB and the elapsed seconds."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024), elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--paper-folder", help="overrides paper_folder of config.json")
+    parser.add_argument("--max-pages", type=int)
+    args = parser.parse_args()
+
+    config = read_config("./config.json")
+    folder = args.paper_folder or config.paper_folder
+    word_files = [config.research_words, config.bycatch_words, config.target_words]
+    streaming = PDFScraper(*word_files)
+    limited: Optional[PDFScraper] = None
+    if args.max_pages is not None:
+        limited = PDFScraper(*word_files, max_pages=args.max_pages)
+
+    print(f"{'pdf':<40}{'in memory':>17}{'streaming':>17}{'max pages':>17}")
+    for file in sorted(listdir(folder)):
+        if not fnmatch(file, "*.pdf"):
+            continue
+        file_name = path.join(folder, file)
+        results = [
+            measure(lambda: scrape_words_in_memory(file_name)),
+            measure(lambda: streaming.scrape(file_name)),
+        ]
+        if limited is not None:
+            results.append(measure(lambda: limited.scrape(file_name)))
+        cells = "".join(f"{peak:>8.1f} MB {elapsed:>4.1f}s" for peak, elapsed in results)
+        print(f"{file[:38]:<40}{cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,57 @@
+import argparse
+import os
 import time
 
+from scrape.cache import ResultCache
 from scrape.config import read_config
 from scrape.export import export_data
-from scrape.fetch import fetch_terms_from_pdf_files
+from scrape.fetch import fetch_terms_from_doi, fetch_terms_from_pdf_files
+from scrape.json import JSONScraper
 from scrape.log import log_msg
 
 
 def main() -> None:
 
+    parser = argparse.ArgumentParser(description="Scrape terms from pdf files.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of parallel scraping processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--max-pages",
+        type=int,
+        help="scrape only the first pages of each pdf, e.g. abstract and methods",
+    )
+    parser.add_argument(
+        "--dois",
+        action="store_true",
+        help="look up the DOIs of prime_src on dimensions.ai instead of pdf files",
+    )
+    args = parser.parse_args()
+
     # read the configuration settings from a JSON file
     config = read_config("./config.json")
+    if args.max_pages is not None:
+        config.max_pages = args.max_pages
+
+    # results of unchanged pdf files and already fetched DOIs are served
+    # from the cache
+    cache = ResultCache(config.cache_file, config.cache_size)
 
-    # fetch data from pdf files and export it
+    # fetch data from pdf files or dimensions.ai and export it
     start = time.perf_counter()
-    result = fetch_terms_from_pdf_files(config)
-    export_data(result, config.export_dir)
+    if args.dois:
+        # one search at a time, JSONScraper keeps the search state on itself
+        # and sleeps between requests to stay under the rate limit
+        result = fetch_terms_from_doi(
+            config.prime_src, JSONScraper(config.url_dmnsns), cache=cache
+        )
+    else:
+        result = fetch_terms_from_pdf_files(config, args.workers, cache)
+    export_data(result, config.export_dir, cache)
+    cache.close()
     elapsed = time.perf_counter() - start
     log_msg(f"\n[sciscraper]: Extraction finished in {elapsed} seconds.\n")
 
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import sqlite3
+from dataclasses import asdict, fields, is_dataclass
+from typing import Iterable, Optional, Union
+
+from scrape.scraper import ScrapeResult
+
+# last_used is a use counter rather than a timestamp, so the order is exact
+_NEXT_USE = "(SELECT coalesce(max(last_used), 0) + 1 FROM result)"
+_RESULT_FIELDS = {field.name for field in fields(ScrapeResult)}
+
+# a ScrapeResult, or a page entry such as the dict JSONScraper returns
+CachedResult = Union[ScrapeResult, dict]
+
+
+class ResultCache:
+    """An on-disk cache of scrape results, so unchanged pdf files and already
+    seen DOIs are not scraped or fetched again on the next run.
+    Keeps at most max_entries results, evicting the least recently used ones.
+    """
+
+    def __init__(self, cache_file: str, max_entries: int = 10000) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(cache_file)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS result ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS result_last_used ON result (last_used)"
+        )
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        row = self.connection.execute(
+            "SELECT value FROM result WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.connection:
+            self.connection.execute(
+                f"UPDATE result SET last_used = {_NEXT_USE} WHERE key = ?", (key,)
+            )
+        return _load_result(row[0])
+
+    def put(self, key: str, result: CachedResult) -> None:
+        value = asdict(result) if is_dataclass(result) else result
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO result (key, value, last_used) "
+                f"VALUES (?, ?, {_NEXT_USE})",
+                (key, json.dumps(value)),
+            )
+            self.connection.execute(
+                "DELETE FROM result WHERE key NOT IN "
+                "(SELECT key FROM result ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT count(*) FROM result").fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def file_digest(file_name: str) -> str:
+    """Hashes the file content, so a renamed pdf is still a cache hit
+    and an edited one is not."""
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def words_digest(word_files: Iterable[str]) -> str:
+    """Hashes the word lists a PDFScraper was built with, cached results
+    depend on them."""
+    digest = hashlib.sha256()
+    for word_file in word_files:
+        digest.update(file_digest(word_file).encode())
+    return digest.hexdigest()[:16]
+
+
+def _load_result(value: str) -> CachedResult:
+    data = json.loads(value)
+    if set(data) != _RESULT_FIELDS:
+        return data
+    return ScrapeResult(
+        data["DOI"],
+        data["wordscore"],
+        [tuple(item) for item in data["frequency"]],
+        [tuple(item) for item in data["study_design"]],
+    )
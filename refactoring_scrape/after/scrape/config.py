@@ -1,5 +1,6 @@
 import json
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -13,6 +14,9 @@ class ScrapeConfig:
     research_words: str
     bycatch_words: str
     target_words: str
+    cache_file: str = "sciscraper_cache.sqlite3"
+    cache_size: int = 10000
+    max_pages: Optional[int] = None
 
 
 def read_config(config_file: str) -> ScrapeConfig:
@@ -4,11 +4,16 @@ from typing import Optional
 
 import pandas as pd
 
+from scrape.cache import ResultCache
 from scrape.dir import change_dir
 from scrape.log import log_msg
 
 
-def export_data(dataframe: Optional[pd.DataFrame], export_dir: str):
+def export_data(
+    dataframe: Optional[pd.DataFrame],
+    export_dir: str,
+    cache: Optional[ResultCache] = None,
+):
     now = datetime.now()
     date = now.strftime("%y%m%d")
     with change_dir(export_dir):
@@ -19,3 +24,7 @@ def export_data(dataframe: Optional[pd.DataFrame], export_dir: str):
         log_msg(
             f"\n[sciscraper]: A spreadsheet was exported as {export_name} in {export_dir}.\n"
         )
+    if cache is not None:
+        log_msg(
+            f"[sciscraper]: Result cache: {cache.hits} hits, {cache.misses} misses.\n"
+        )
@@ -1,25 +1,109 @@
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from dataclasses import replace
 from fnmatch import fnmatch
 from os import listdir, path
+from typing import Callable, Optional
 
 import pandas as pd
 from tqdm import tqdm
 
+from scrape.cache import ResultCache, file_digest, words_digest
 from scrape.config import ScrapeConfig
-from scrape.pdf import PDFScraper
-from scrape.scraper import Scraper
+from scrape.pdf import PDFScraper, guess_doi
+from scrape.scraper import Scraper, ScrapeResult
 
 
-def fetch_terms_from_doi(target: str, scraper: Scraper) -> pd.DataFrame:
+def scrape_all(
+    scraper: Scraper,
+    search_terms: list[str],
+    workers: int = 1,
+    executor_factory: Callable[[int], Executor] = ThreadPoolExecutor,
+    cache: Optional[ResultCache] = None,
+    cache_key: Optional[Callable[[str], str]] = None,
+    from_cache: Optional[Callable[[str, ScrapeResult], ScrapeResult]] = None,
+) -> list[Optional[ScrapeResult]]:
+    """Scrapes every search term, in parallel when workers > 1.
+
+    Search terms found in the cache are not scraped again, fresh results are
+    stored in it. Results are collected as they finish, while the tqdm
+    progress bar advances, and are returned in the order of search_terms.
+    cache_key defaults to scraper_key(scraper, "doi"), from_cache can fix up
+    the fields of a cached result that do not depend on its key.
+    """
+    if cache_key is None:
+        cache_key = scraper_key(scraper, "doi")
+    results: list[Optional[ScrapeResult]] = [None] * len(search_terms)
+    keys: dict[int, str] = {}
+    pending: list[int] = []
+    for index, search_text in enumerate(search_terms):
+        if cache is not None:
+            keys[index] = cache_key(search_text)
+            cached = cache.get(keys[index])
+            if cached is not None:
+                results[index] = (
+                    cached if from_cache is None else from_cache(search_text, cached)
+                )
+                continue
+        pending.append(index)
+
+    def store(index: int, result: ScrapeResult) -> None:
+        results[index] = result
+        if cache is not None and result is not None:
+            cache.put(keys[index], result)
+
+    if workers <= 1:
+        for index in tqdm(pending):
+            store(index, scraper.scrape(search_terms[index]))
+        return results
+    with executor_factory(workers) as executor:
+        futures = {
+            executor.submit(scraper.scrape, search_terms[index]): index
+            for index in pending
+        }
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            store(futures[future], future.result())
+    return results
+
+
+def scraper_key(scraper: Scraper, kind: str) -> Callable[[str], str]:
+    """Cache keys prefixed with the scraper class and the kind of search term,
+    so results of different scrapers never overwrite each other."""
+    prefix = f"{type(scraper).__name__}:{kind}"
+    return lambda search_text: f"{prefix}:{search_text.strip().lower()}"
+
+
+def fetch_terms_from_doi(
+    target: str,
+    scraper: Scraper,
+    workers: int = 1,
+    cache: Optional[ResultCache] = None,
+) -> pd.DataFrame:
     print(f"\n[sciscraper]: Getting entries from file: {target}")
     with open(target, newline="") as f:
         df = [doi for doi in pd.read_csv(f, usecols=["DOI"])["DOI"]]
         search_terms = [search_text for search_text in df if search_text is not None]
         return pd.DataFrame(
-            [scraper.scrape(search_text) for search_text in tqdm(search_terms)]
+            scrape_all(
+                scraper,
+                search_terms,
+                workers,
+                cache=cache,
+                cache_key=scraper_key(scraper, "doi"),
+            )
         )
 
 
-def fetch_terms_from_pubid(target: pd.DataFrame, scraper: Scraper) -> pd.DataFrame:
+def fetch_terms_from_pubid(
+    target: pd.DataFrame,
+    scraper: Scraper,
+    workers: int = 1,
+    cache: Optional[ResultCache] = None,
+) -> pd.DataFrame:
     df = target.explode("cited_dimensions_ids", "title")
     search_terms = (
         search_text
@@ -29,18 +113,39 @@ def fetch_terms_from_pubid(target: pd.DataFrame, scraper: Scraper) -> pd.DataFra
     src_title = pd.Series(df["title"])
 
     return pd.DataFrame(
-        [scraper.scrape(search_text) for search_text in tqdm(list(search_terms))]
+        scrape_all(
+            scraper,
+            list(search_terms),
+            workers,
+            cache=cache,
+            cache_key=scraper_key(scraper, "pubid"),
+        )
     ).join(src_title)
 
 
-def fetch_terms_from_pdf_files(config: ScrapeConfig) -> pd.DataFrame:
-
+def fetch_terms_from_pdf_files(
+    config: ScrapeConfig, workers: int = 1, cache: Optional[ResultCache] = None
+) -> pd.DataFrame:
+    """PDF scraping is CPU-bound, so with workers > 1 it runs in a process pool.
+    Cached results are keyed by the pdf content and the scraper settings, the
+    DOI is guessed from the file name, so it is guessed again on a cache hit."""
     search_terms = [
         path.join(config.paper_folder, file)
         for file in listdir(config.paper_folder)
         if fnmatch(path.basename(file), "*.pdf")
     ]
-    scraper = PDFScraper(
-        config.research_words, config.bycatch_words, config.target_words
+    word_files = [config.research_words, config.bycatch_words, config.target_words]
+    scraper = PDFScraper(*word_files, max_pages=config.max_pages)
+    # cached results depend on the word lists and on how many pages are read
+    variant = f"{words_digest(word_files)}:{config.max_pages or 'all'}"
+    return pd.DataFrame(
+        scrape_all(
+            scraper,
+            search_terms,
+            workers,
+            ProcessPoolExecutor,
+            cache,
+            lambda file: f"pdf:{variant}:{file_digest(file)}",
+            lambda file, result: replace(result, DOI=guess_doi(file)),
+        )
     )
-    return pd.DataFrame([scraper.scrape(file) for file in tqdm(search_terms)])
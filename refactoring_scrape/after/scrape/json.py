@@ -80,6 +80,12 @@ class JSONScraper:
             )
         return self.data
 
+    def scrape(self, search_text: str) -> Optional[dict]:
+        """Scraper interface for scrape_all: the entry found for search_text,
+        None when the search fails, so that failures are not cached."""
+        self.docs, self.data = [], None
+        return self.download(search_text)
+
     def specify_search(self, search_text: str) -> str:
         """Determines whether the dimensions.ai query will be for a full_search or just for the doi."""
         if search_text.startswith("pub"):
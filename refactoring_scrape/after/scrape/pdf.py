@@ -1,6 +1,6 @@
 import re
 from os import path
-from typing import Any
+from typing import Any, Iterable, Iterator, Optional
 
 import pdfplumber
 from nltk import FreqDist
@@ -20,13 +20,25 @@ def guess_doi(path_name: str) -> str:
     return f"{doi[:7]}/{doi[7:]}"
 
 
-def compute_filtered_tokens(text: list[str]) -> set[str]:
-    """Takes a lowercase string, now removed of its non-alphanumeric characters.
-    It returns (as a list comprehension) a parsed and tokenized
-    version of the text, with stopwords and names removed.
+def normalize_page(page_text: Optional[str]) -> str:
+    """Lower cases the page text and strips it of extraneous whitespace
+    and non-alphanumeric characters."""
+    return re.sub(r"\W+", " ", str(page_text).strip().lower())
+
+
+def compute_filtered_tokens(text: Iterable[str]) -> set[str]:
+    """Takes lowercase strings, now removed of their non-alphanumeric characters.
+    It returns a set of the tokens of the text, with stopwords and names removed.
+    The strings are tokenized one at a time, so a generator of pages
+    is never held in memory as a whole.
     """
-    word_tokens = word_tokenize("\n".join(text))
-    return set([w for w in word_tokens if not w in STOP_WORDS and NAME_WORDS])
+    filtered_tokens: set[str] = set()
+    for chunk in text:
+        word_tokens = word_tokenize(chunk)
+        filtered_tokens.update(
+            w for w in word_tokens if not w in STOP_WORDS and NAME_WORDS
+        )
+    return filtered_tokens
 
 
 def most_common_words(word_set: set[str], n: int) -> list[tuple[str, int]]:
@@ -34,50 +46,63 @@ def most_common_words(word_set: set[str], n: int) -> list[tuple[str, int]]:
 
 
 class PDFScraper(Scraper):
-    def __init__(self, research_words: str, bycatch_words: str, target_words: str):
+    def __init__(
+        self,
+        research_words: str,
+        bycatch_words: str,
+        target_words: str,
+        max_pages: Optional[int] = None,
+    ):
         with open(research_words, encoding="utf8") as f:
             self.research_words = set(f.readlines())
         with open(bycatch_words, encoding="utf8") as f:
             self.bycatch_words = set(f.readlines())
         with open(target_words, encoding="utf8") as f:
             self.target_words = set(f.readlines())
+        # Only the first max_pages pages are scraped, e.g. when the abstract
+        # and methods are enough
+        self.max_pages = max_pages
 
-    def scrape(self, search_text: str) -> ScrapeResult:
-        preprints: list[str] = []
+    def iter_pages(self, search_text: str) -> Iterator[str]:
+        """Yields the normalized text of each page, extracting the next page
+        only when the previous one has been processed."""
         with pdfplumber.open(search_text) as study:
             pages: list[Any] = study.pages
             n = len(pages)
-            pages_to_check: list[Any] = [page for page in pages][:n]
-            for page_number, page in enumerate(pages_to_check):
-                page: str = pages[page_number].extract_text(
-                    x_tolerance=3, y_tolerance=3
-                )
+            if self.max_pages is not None:
+                n = min(n, self.max_pages)
+            for page_number in range(n):
+                page = pages[page_number]
                 print(
                     f"[sciscraper]: Processing Page {page_number} of {n-1} | {search_text}...",
                     end="\r",
                 )
-                preprints.append(
-                    page
-                )  # Each page's string gets appended to preprint []
-
-            manuscripts = [str(preprint).strip().lower() for preprint in preprints]
-            # The preprints are stripped of extraneous characters and all made lower case.
-            postprints = [re.sub(r"\W+", " ", manuscript) for manuscript in manuscripts]
-            # The ensuing manuscripts are stripped of lingering whitespace and non-alphanumeric characters.
-            all_words = compute_filtered_tokens(postprints)
-            research_word_overlap = self.research_words.intersection(all_words)
-
-            doi = guess_doi(search_text)
-
-            target_intersection = self.target_words.intersection(all_words)
-            bycatch_intersection = self.bycatch_words.intersection(all_words)
-            wordscore = len(target_intersection) - len(bycatch_intersection)
-            frequency = most_common_words(all_words, 5)
-            study_design = most_common_words(research_word_overlap, 3)
-
-            return ScrapeResult(
-                doi,
-                wordscore,
-                frequency,
-                study_design,
-            )
+                yield normalize_page(page.extract_text(x_tolerance=3, y_tolerance=3))
+                release_page(page)
+
+    def scrape(self, search_text: str) -> ScrapeResult:
+        all_words = compute_filtered_tokens(self.iter_pages(search_text))
+        research_word_overlap = self.research_words.intersection(all_words)
+
+        doi = guess_doi(search_text)
+
+        target_intersection = self.target_words.intersection(all_words)
+        bycatch_intersection = self.bycatch_words.intersection(all_words)
+        wordscore = len(target_intersection) - len(bycatch_intersection)
+        frequency = most_common_words(all_words, 5)
+        study_design = most_common_words(research_word_overlap, 3)
+
+        return ScrapeResult(
+            doi,
+            wordscore,
+            frequency,
+            study_design,
+        )
+
+
+def release_page(page: Any) -> None:
+    """Drops the layout objects pdfplumber caches on an extracted page."""
+    if hasattr(page, "close"):
+        page.close()
+    elif hasattr(page, "flush_cache"):
+        page.flush_cache()
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import time
 from contextlib import suppress
@@ -8,6 +9,7 @@ from bs4 import BeautifulSoup
 
 from scrape.dir import change_dir
 from scrape.log import log_msg
+from scrape.scihub_async import download_dois
 
 
 class SciHubScraper:
@@ -71,3 +73,15 @@ class SciHubScraper:
                 for line in open("temp_file.txt", "rb").readlines():
                     file.write(line)
             os.remove("temp_file.txt")
+
+    def download_all(
+        self, dois: list[str], per_host_concurrency: int = 4, rate: float = 1.0
+    ) -> dict:
+        """Downloads the papers of many DOIs concurrently over one pooled client,
+        with per-host concurrency and rate limits, see scrape.scihub_async.
+        """
+        return asyncio.run(
+            download_dois(
+                self.scihub_url, self.research_dir, dois, per_host_concurrency, rate
+            )
+        )
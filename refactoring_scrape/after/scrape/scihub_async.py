@@ -0,0 +1,180 @@
+import asyncio
+import os
+import random
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Optional, TypeVar, Union
+from urllib.parse import urljoin, urlparse
+
+import httpx
+from bs4 import BeautifulSoup
+
+from scrape.log import log_msg
+
+T = TypeVar("T")
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to
+    `capacity` requests."""
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostLimiter:
+    """Limits concurrent requests and request rate separately for every host."""
+
+    def __init__(self, concurrency: int, rate: float, burst: float = 1.0) -> None:
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.semaphores: dict[str, asyncio.Semaphore] = {}
+        self.buckets: dict[str, TokenBucket] = {}
+
+    async def run(self, url: str, request: Callable[[], Awaitable[T]]) -> T:
+        host = urlparse(url).netloc
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.concurrency)
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        async with self.semaphores[host]:
+            await self.buckets[host].acquire()
+            return await request()
+
+
+class AsyncSciHubDownloader:
+    """Resolves many DOIs concurrently with one pooled httpx client.
+    Every DOI is posted as a search query, the download links on the result
+    page are followed and the pdf files are streamed to research_dir in chunks.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        scihub_url: str,
+        research_dir: str,
+        limiter: Optional[HostLimiter] = None,
+        retries: int = 3,
+        backoff: float = 1.0,
+        chunk_size: int = 64 * 1024,
+    ) -> None:
+        self.client = client
+        self.scihub_url = scihub_url
+        self.research_dir = research_dir
+        self.limiter = limiter or HostLimiter(concurrency=4, rate=1.0)
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+
+    async def download_all(
+        self, dois: list[str]
+    ) -> dict[str, Union[list[str], Exception]]:
+        """Downloads the papers of all DOIs, returns the saved file names,
+        or the error that stopped the download, for each DOI."""
+        os.makedirs(self.research_dir, exist_ok=True)
+        results = await asyncio.gather(
+            *(self.download(doi) for doi in dois), return_exceptions=True
+        )
+        return dict(zip(dois, results))
+
+    async def download(self, doi: str) -> list[str]:
+        response = await self.request(
+            self.scihub_url,
+            lambda: self.client.post(self.scihub_url, data={"request": doi}),
+        )
+        log_msg(f"[sciscraper]: {response.status_code} for {doi}")
+        date = datetime.now().strftime("%y%m%d")
+        file_names = []
+        for number, link in enumerate(self.find_links(response.text)):
+            suffix = f"_{number}" if number else ""
+            file_name = os.path.join(
+                self.research_dir, f'{date}_{doi.replace("/", "")}{suffix}.pdf'
+            )
+            paper_url = urljoin(self.scihub_url, f"{link}=true")
+            await self.request(paper_url, lambda: self.save(paper_url, file_name))
+            file_names.append(file_name)
+        return file_names
+
+    @staticmethod
+    def find_links(page: str) -> list[str]:
+        soup = BeautifulSoup(page, "html.parser")
+        return [
+            ((item["onclick"]).split("=")[1]).strip("'")
+            for item in soup.select("button[onclick^='location.href=']")
+        ]
+
+    async def save(self, url: str, file_name: str) -> None:
+        """Streams the response body to a partial file, which replaces
+        file_name only after the whole body has been received."""
+        partial_name = f"{file_name}.part"
+        async with self.client.stream("GET", url, follow_redirects=True) as response:
+            response.raise_for_status()
+            with open(partial_name, "wb") as file:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    file.write(chunk)
+        os.replace(partial_name, file_name)
+
+    async def request(self, url: str, send: Callable[[], Awaitable[T]]) -> T:
+        """Sends a request through the host limiter, retrying transport errors
+        and retryable status codes with exponential backoff and jitter."""
+        attempt = 0
+        while True:
+            try:
+                result = await self.limiter.run(url, send)
+                if isinstance(result, httpx.Response):
+                    result.raise_for_status()
+                return result
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or (
+                    e.response.status_code in RETRY_STATUS_CODES
+                )
+                if not retryable or attempt == self.retries:
+                    raise
+                delay = self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+                log_msg(
+                    f"[sciscraper]: {e!r} for {url}, retrying in {delay:.1f} seconds."
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+async def download_dois(
+    scihub_url: str,
+    research_dir: str,
+    dois: list[str],
+    per_host_concurrency: int = 4,
+    rate: float = 1.0,
+    retries: int = 3,
+) -> dict[str, Union[list[str], Exception]]:
+    limits = httpx.Limits(
+        max_connections=per_host_concurrency * 2,
+        max_keepalive_connections=per_host_concurrency * 2,
+    )
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        downloader = AsyncSciHubDownloader(
+            client,
+            scihub_url,
+            research_dir,
+            HostLimiter(per_host_concurrency, rate),
+            retries,
+        )
+        return await downloader.download_all(dois)
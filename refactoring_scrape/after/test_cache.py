@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from scrape.cache import ResultCache, file_digest
+from scrape.scraper import ScrapeResult
+
+
+def make_result(doi: str) -> ScrapeResult:
+    return ScrapeResult(doi, 3, [("moral", 5), ("viral", 2)], [("survey", 1)])
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.directory.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip_persists_between_runs(self):
+        cache = ResultCache(self.cache_file)
+        cache.put("doi:10.1000/abc", make_result("10.1000/abc"))
+        cache.close()
+        cache = ResultCache(self.cache_file)
+        self.assertEqual(cache.get("doi:10.1000/abc"), make_result("10.1000/abc"))
+        cache.close()
+
+    def test_page_entries_stay_dicts(self):
+        cache = ResultCache(self.cache_file)
+        entry = {"title": "Moral contagion", "doi": "10.1000/abc", "times_cited": 3}
+        cache.put("JSONScraper:doi:10.1000/abc", entry)
+        self.assertEqual(cache.get("JSONScraper:doi:10.1000/abc"), entry)
+        cache.close()
+
+    def test_hits_and_misses(self):
+        cache = ResultCache(self.cache_file)
+        cache.put("doi:a", make_result("a"))
+        cache.get("doi:a")
+        cache.get("doi:b")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+    def test_evicts_least_recently_used(self):
+        cache = ResultCache(self.cache_file, max_entries=2)
+        cache.put("doi:a", make_result("a"))
+        cache.put("doi:b", make_result("b"))
+        cache.get("doi:a")
+        cache.put("doi:c", make_result("c"))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("doi:b"))
+        self.assertIsNotNone(cache.get("doi:a"))
+        cache.close()
+
+    def test_file_digest_depends_on_content_only(self):
+        first = os.path.join(self.directory.name, "first.pdf")
+        second = os.path.join(self.directory.name, "second.pdf")
+        for file_name in (first, second):
+            with open(file_name, "wb") as file:
+                file.write(b"%PDF-1.4 same content")
+        self.assertEqual(file_digest(first), file_digest(second))
+
+
+if __name__ == "__main__":
+    unittest.main()
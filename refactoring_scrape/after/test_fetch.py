@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+
+from scrape.cache import ResultCache
+from scrape.fetch import scrape_all, scraper_key
+from scrape.scraper import ScrapeResult
+
+
+def make_result(doi: str) -> ScrapeResult:
+    return ScrapeResult(doi, 3, [("moral", 5), ("viral", 2)], [("survey", 1)])
+
+
+class DoiScraper:
+    def scrape(self, search_text: str) -> ScrapeResult:
+        return make_result(search_text)
+
+
+class PubidScraper(DoiScraper):
+    pass
+
+
+class TestScrapeAllCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.directory.name, "cache.sqlite3"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_scrapers_do_not_share_keys(self):
+        doi, pubid = DoiScraper(), PubidScraper()
+        scrape_all(doi, ["a"], cache=self.cache, cache_key=scraper_key(doi, "doi"))
+        scrape_all(
+            pubid, ["a"], cache=self.cache, cache_key=scraper_key(pubid, "pubid")
+        )
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_from_cache_updates_hits(self):
+        scraper = DoiScraper()
+        scrape_all(scraper, ["first.pdf"], cache=self.cache, cache_key=lambda _: "k")
+        results = scrape_all(
+            scraper,
+            ["renamed.pdf"],
+            cache=self.cache,
+            cache_key=lambda _: "k",
+            from_cache=lambda name, result: replace(result, DOI=name),
+        )
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(results[0].DOI, "renamed.pdf")
+
+
+if __name__ == "__main__":
+    unittest.main()
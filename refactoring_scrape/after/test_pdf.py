@@ -1,6 +1,6 @@
 import unittest
 
-from scrape.pdf import compute_filtered_tokens
+from scrape.pdf import compute_filtered_tokens, normalize_page
 
 
 class TestPdfScraper(unittest.TestCase):
@@ -14,6 +14,14 @@ class TestPdfScraper(unittest.TestCase):
         print(filtered_tokens)
         self.assertEqual(filtered_tokens, {"please", "like", "subscribe"})
 
+    def test_filtered_tokens_pages(self):
+        pages = (page for page in ["please like", "and subscribe"])
+        filtered_tokens = compute_filtered_tokens(pages)
+        self.assertEqual(filtered_tokens, {"please", "like", "subscribe"})
+
+    def test_normalize_page(self):
+        self.assertEqual(normalize_page("  Moral, Emotional!\n"), "moral emotional ")
+
 
 if __name__ == "__main__":
     unittest.main()
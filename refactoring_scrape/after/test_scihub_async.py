@@ -0,0 +1,73 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scrape.scihub_async import download_dois
+
+PDF_CONTENT = b"%PDF-1.4 " + b"0" * 200_000
+
+
+class StubSciHub(BaseHTTPRequestHandler):
+    """Answers the first search with 503, then a page with a download button."""
+
+    searches = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        StubSciHub.searches += 1
+        if StubSciHub.searches == 1:
+            self.send_response(503)
+            self.end_headers()
+            return
+        page = b"<button onclick=\"location.href='/paper.pdf?download'\">save</button>"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def do_GET(self):
+        if self.path != "/paper.pdf?download=true":
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(PDF_CONTENT)))
+        self.end_headers()
+        self.wfile.write(PDF_CONTENT)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAsyncSciHubDownloader(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        StubSciHub.searches = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubSciHub)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    async def test_downloads_with_retry(self):
+        results = await download_dois(
+            self.url, self.directory.name, ["10.1000/abc"], rate=100
+        )
+        file_names = results["10.1000/abc"]
+        self.assertEqual(len(file_names), 1)
+        with open(file_names[0], "rb") as file:
+            self.assertEqual(file.read(), PDF_CONTENT)
+        self.assertEqual(StubSciHub.searches, 2)
+        self.assertFalse(
+            [name for name in os.listdir(self.directory.name) if name.endswith(".part")]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Сравнение времени /today и /month: полные sum(amount) по таблице
+expense (как было раньше) и чтение сумм из expense_day_total /
+expense_month_total, которые поддерживаются триггерами.
+
+    python benchmark_statistics.py --rows 1000000
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CATEGORIES = ("products", "coffee", "dinner", "cafe", "transport", "taxi",
+              "phone", "books", "internet", "subscriptions", "other")
+
+
+def fill_expenses(cursor, rows: int):
+    """Расходы равномерно за последние три года, последний — сегодня"""
+    rng = random.Random(42)
+    now = datetime.datetime.now()
+    seconds = 3 * 365 * 24 * 60 * 60
+    cursor.executemany(
+        "insert into expense (amount, created, category_codename, raw_text) "
+        "values (?, ?, ?, ?)",
+        ((rng.randint(1, 5000),
+          (now - datetime.timedelta(
+              seconds=seconds * (rows - 1 - number) // rows)
+           ).strftime("%Y-%m-%d %H:%M:%S"),
+          rng.choice(CATEGORIES),
+          "")
+         for number in range(rows)))
+
+
+def old_today_statistics(cursor):
+    cursor.execute("select sum(amount)"
+                   "from expense where date(created)=date('now', 'localtime')")
+    cursor.fetchone()
+    cursor.execute("select sum(amount) "
+                   "from expense where date(created)=date('now', 'localtime') "
+                   "and category_codename in (select codename "
+                   "from category where is_base_expense=true)")
+    cursor.fetchone()
+
+
+def old_month_statistics(cursor):
+    now = datetime.datetime.now()
+    first_day_of_month = f'{now.year:04d}-{now.month:02d}-01'
+    cursor.execute(f"select sum(amount) "
+                   f"from expense where date(created) >= '{first_day_of_month}'")
+    cursor.fetchone()
+    cursor.execute(f"select sum(amount) "
+                   f"from expense where date(created) >= '{first_day_of_month}' "
+                   f"and category_codename in (select codename "
+                   f"from category where is_base_expense=true)")
+    cursor.fetchone()
+
+
+def measure(function, repeat: int) -> float:
+    """Среднее время вызова в миллисекундах"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["FINANCE_DB_PATH"] = os.path.join(directory, "finance.db")
+        os.chdir(BASE_DIR)
+        import db
+        import expenses
+
+        cursor = db.conn.cursor()
+        started = time.perf_counter()
+        fill_expenses(cursor, args.rows)
+        db.conn.commit()
+        print(f"{args.rows} expenses inserted in "
+              f"{time.perf_counter() - started:.1f} sec")
+
+        print(f"{'':<10}{'full scan, ms':>16}{'totals, ms':>14}")
+        for name, old, new in (
+                ("/today", lambda: old_today_statistics(cursor),
+                 expenses.get_today_statistics),
+                ("/month", lambda: old_month_statistics(cursor),
+                 expenses.get_month_statistics)):
+            print(f"{name:<10}{measure(old, args.repeat):>16.2f}"
+                  f"{measure(new, args.repeat):>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
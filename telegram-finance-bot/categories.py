@@ -1,5 +1,6 @@
 """Работа с категориями расходов"""
-from typing import Dict, List, NamedTuple
+import threading
+from typing import Dict, List, NamedTuple, Optional
 
 import db
 
@@ -14,7 +15,53 @@ class Category(NamedTuple):
 
 class Categories:
     def __init__(self):
-        self._categories = self._load_categories()
+        self._index = _get_index()
+        self._categories = self._index.categories
+
+    def get_all_categories(self) -> List[Dict]:
+        """Возвращает справочник категорий."""
+        return self._categories
+
+    def get_category(self, category_name: str) -> Category:
+        """Возвращает категорию по одному из её алиасов."""
+        return self._index.get_category(category_name)
+
+
+def invalidate_categories() -> None:
+    """Сбрасывает индекс категорий, он перечитается из БД при следующем
+    обращении. Вызывается автоматически при записи в таблицу category
+    через db, после ручного изменения таблицы нужно вызвать явно."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+class _CategoryIndex:
+    """Загруженный один раз справочник категорий и словарь
+    алиас -> категория"""
+
+    def __init__(self):
+        self.categories = self._load_categories()
+        self._other_category = next(
+            (c for c in self.categories if c.codename == "other"), None)
+        self._by_alias = self._index_aliases(self.categories)
+
+    def get_category(self, category_name: str) -> Optional[Category]:
+        """Возвращает категорию, в алиасе которой есть category_name,
+        иначе категорию «прочее»"""
+        category = self._by_alias.get(category_name)
+        if category is None:
+            # текст сообщения может быть частью алиаса, «каф» — это кафе
+            category = self._find_category(category_name)
+        return category
+
+    def _find_category(self, category_name: str) -> Optional[Category]:
+        """Перебор алиасов: при совпадении в нескольких категориях
+        побеждает последняя"""
+        for category in reversed(self.categories):
+            if any(category_name in alias for alias in category.aliases):
+                return category
+        return self._other_category
 
     def _load_categories(self) -> List[Category]:
         """Возвращает справочник категорий расходов из БД"""
@@ -43,20 +90,28 @@ class Categories:
             ))
         return categories_result
 
-    def get_all_categories(self) -> List[Dict]:
-        """Возвращает справочник категорий."""
-        return self._categories
+    def _index_aliases(
+            self, categories: List[Category]) -> Dict[str, Category]:
+        """Словарь из каждого алиаса в категорию, которую для него нашёл
+        бы перебор: алиас может быть и частью алиаса другой категории"""
+        return {alias: self._find_category(alias)
+                for category in categories
+                for alias in category.aliases}
 
-    def get_category(self, category_name: str) -> Category:
-        """Возвращает категорию по одному из её алиасов."""
-        finded = None
-        other_category = None
-        for category in self._categories:
-            if category.codename == "other":
-                other_category = category
-            for alias in category.aliases:
-                if category_name in alias:
-                    finded = category
-        if not finded:
-            finded = other_category
-        return finded
+
+_index: Optional[_CategoryIndex] = None
+_index_lock = threading.Lock()
+
+
+def _get_index() -> _CategoryIndex:
+    global _index
+    index = _index
+    if index is not None:
+        return index
+    with _index_lock:
+        if _index is None:
+            _index = _CategoryIndex()
+        return _index
+
+
+db.on_table_change("category", invalidate_categories)
@@ -0,0 +1,51 @@
+create table if not exists expense_day_total(
+    day date primary key,
+    amount integer not null default 0,
+    base_amount integer not null default 0
+);
+
+create table if not exists expense_month_total(
+    month varchar(7) primary key,
+    amount integer not null default 0,
+    base_amount integer not null default 0
+);
+
+create trigger if not exists expense_totals_insert after insert on expense
+begin
+    insert into expense_day_total (day, amount, base_amount)
+    values (
+        date(new.created),
+        new.amount,
+        case when new.category_codename in (select codename
+            from category where is_base_expense=true)
+        then new.amount else 0 end)
+    on conflict(day) do update set
+        amount = amount + excluded.amount,
+        base_amount = base_amount + excluded.base_amount;
+    insert into expense_month_total (month, amount, base_amount)
+    values (
+        strftime('%Y-%m', new.created),
+        new.amount,
+        case when new.category_codename in (select codename
+            from category where is_base_expense=true)
+        then new.amount else 0 end)
+    on conflict(month) do update set
+        amount = amount + excluded.amount,
+        base_amount = base_amount + excluded.base_amount;
+end;
+
+create trigger if not exists expense_totals_delete after delete on expense
+begin
+    update expense_day_total set
+        amount = amount - old.amount,
+        base_amount = base_amount - case when old.category_codename in (
+            select codename from category where is_base_expense=true)
+            then old.amount else 0 end
+    where day = date(old.created);
+    update expense_month_total set
+        amount = amount - old.amount,
+        base_amount = base_amount - case when old.category_codename in (
+            select codename from category where is_base_expense=true)
+            then old.amount else 0 end
+    where month = strftime('%Y-%m', old.created);
+end;
@@ -1,29 +1,149 @@
+import asyncio
+import atexit
+from concurrent.futures import Future
+from contextlib import contextmanager
 import os
-from typing import Dict, List, Tuple
+import queue
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import sqlite3
 
 
-conn = sqlite3.connect(os.path.join("db", "finance.db"))
+DB_PATH = os.getenv("FINANCE_DB_PATH", os.path.join("db", "finance.db"))
+POOL_SIZE = int(os.getenv("FINANCE_DB_POOL_SIZE", "4"))
+# Записи, накопившиеся за время прошлого коммита (не больше BATCH_MAX_SIZE),
+# коммитятся одной транзакцией
+BATCH_MAX_SIZE = int(os.getenv("FINANCE_DB_BATCH_MAX_SIZE", "500"))
+# Версия таблиц сумм расходов (createtotals.sql), хранится в PRAGMA user_version
+TOTALS_VERSION = 1
+
+
+def _connect() -> sqlite3.Connection:
+    """Открывает соединение с БД в WAL режиме: читатели не блокируют
+    писателя, а fsync делается на checkpoint, а не на каждый коммит"""
+    connection = sqlite3.connect(DB_PATH, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений с БД, общий для всех хендлеров"""
+
+    def __init__(self, size: int):
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(_connect())
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connections.get()
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+
+
+class WriteBatcher:
+    """Группирует записи в БД: фоновый поток выполняет все накопившиеся
+    запросы одной транзакцией с одним коммитом. Новых запросов он не ждёт:
+    пока идёт коммит, очередь наполняется сама.
+
+    Future из submit завершается после коммита, так что дождавшийся его
+    хендлер сразу видит свои данные при чтении."""
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._queue = queue.Queue()
+        self._connection = _connect()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, params: Tuple = ()) -> Future:
+        future = Future()
+        self._queue.put((sql, params, future))
+        return future
+
+    def execute(self, sql: str, params: Tuple = ()) -> Optional[int]:
+        """Выполняет запрос в ближайшей транзакции, возвращает lastrowid"""
+        return self.submit(sql, params).result()
+
+    def close(self):
+        """Коммитит уже поставленные в очередь запросы и останавливает поток"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while batch[-1] is not None and len(batch) < self._max_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: List):
+        # Отменённые хендлером запросы не выполняем, а остальные Future
+        # после этого уже нельзя отменить
+        batch = [item for item in batch
+                 if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            with self._connection:
+                results = [self._connection.execute(sql, params).lastrowid
+                           for sql, params, _ in batch]
+        except Exception:
+            # Транзакция откатилась целиком, повторяем запросы по одному,
+            # чтобы ошибку получил только автор неудачного запроса
+            for sql, params, future in batch:
+                try:
+                    with self._connection:
+                        result = self._connection.execute(sql, params).lastrowid
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            return
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+conn = _connect()
 cursor = conn.cursor()
+_table_change_callbacks: Dict[str, List[Callable[[], None]]] = {}
 
 
-def insert(table: str, column_values: Dict):
-    columns = ', '.join( column_values.keys() )
-    values = [tuple(column_values.values())]
-    placeholders = ", ".join( "?" * len(column_values.keys()) )
-    cursor.executemany(
-        f"INSERT INTO {table} "
-        f"({columns}) "
-        f"VALUES ({placeholders})",
-        values)
-    conn.commit()
+def on_table_change(table: str, callback: Callable[[], None]) -> None:
+    """Регистрирует callback, вызываемый после записи в таблицу через
+    insert или delete — для сброса кешей, построенных по этой таблице"""
+    _table_change_callbacks.setdefault(table, []).append(callback)
+
+
+def insert(table: str, column_values: Dict) -> int:
+    row_id = _writer.execute(*_insert_query(table, column_values))
+    _notify_table_change(table)
+    return row_id
+
+
+async def insert_async(table: str, column_values: Dict) -> int:
+    """Как insert, но не блокирует event loop на время ожидания коммита"""
+    row_id = await asyncio.wrap_future(
+        _writer.submit(*_insert_query(table, column_values)))
+    _notify_table_change(table)
+    return row_id
 
 
 def fetchall(table: str, columns: List[str]) -> List[Tuple]:
     columns_joined = ", ".join(columns)
-    cursor.execute(f"SELECT {columns_joined} FROM {table}")
-    rows = cursor.fetchall()
+    rows = select(f"SELECT {columns_joined} FROM {table}")
     result = []
     for row in rows:
         dict_row = {}
@@ -33,14 +153,38 @@ def fetchall(table: str, columns: List[str]) -> List[Tuple]:
     return result
 
 
+def select(sql: str, params: Tuple = ()) -> List[Tuple]:
+    """Выполняет читающий запрос на соединении из пула"""
+    with pool.connection() as connection:
+        return connection.execute(sql, params).fetchall()
+
+
 def delete(table: str, row_id: int) -> None:
-    row_id = int(row_id)
-    cursor.execute(f"delete from {table} where id={row_id}")
-    conn.commit()
+    _writer.execute(*_delete_query(table, row_id))
+    _notify_table_change(table)
+
+
+async def delete_async(table: str, row_id: int) -> None:
+    await asyncio.wrap_future(_writer.submit(*_delete_query(table, row_id)))
+    _notify_table_change(table)
 
 
-def get_cursor():
-    return cursor
+def _notify_table_change(table: str) -> None:
+    for callback in _table_change_callbacks.get(table, []):
+        callback()
+
+
+def _insert_query(table: str, column_values: Dict) -> Tuple[str, Tuple]:
+    columns = ', '.join( column_values.keys() )
+    placeholders = ", ".join( "?" * len(column_values.keys()) )
+    return (f"INSERT INTO {table} "
+            f"({columns}) "
+            f"VALUES ({placeholders})",
+            tuple(column_values.values()))
+
+
+def _delete_query(table: str, row_id: int) -> Tuple[str, Tuple]:
+    return f"delete from {table} where id=?", (int(row_id),)
 
 
 def _init_db():
@@ -51,13 +195,49 @@ def _init_db():
     conn.commit()
 
 
+def _init_totals():
+    """Создаёт таблицы сумм расходов по дням и месяцам, которые
+    поддерживаются триггерами на expense, и заполняет их для уже
+    существующих расходов.
+
+    Всё это делается одной транзакцией вместе с записью TOTALS_VERSION
+    в PRAGMA user_version, так что упавший посередине запуск ничего не
+    оставляет, и следующий запуск заполняет суммы заново"""
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] >= TOTALS_VERSION:
+        return
+    with open("createtotals.sql", "r") as f:
+        sql = f.read()
+    backfill = "".join(
+        f"delete from {table};\n"
+        f"insert into {table} ({column}, amount, base_amount) "
+        f"select {period}, sum(amount), "
+        f"sum(case when category_codename in (select codename "
+        f"from category where is_base_expense=true) "
+        f"then amount else 0 end) "
+        f"from expense group by {period};\n"
+        for table, column, period in (
+            ("expense_day_total", "day", "date(created)"),
+            ("expense_month_total", "month", "strftime('%Y-%m', created)")))
+    try:
+        cursor.executescript(
+            f"begin;\n{sql}\n{backfill}"
+            f"pragma user_version = {TOTALS_VERSION};\ncommit;")
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
 def check_db_exists():
     """Проверяет, инициализирована ли БД, если нет — инициализирует"""
     cursor.execute("SELECT name FROM sqlite_master "
                    "WHERE type='table' AND name='expense'")
     table_exists = cursor.fetchall()
-    if table_exists:
-        return
-    _init_db()
+    if not table_exists:
+        _init_db()
+    _init_totals()
 
 check_db_exists()
+pool = ConnectionPool(POOL_SIZE)
+_writer = WriteBatcher(BATCH_MAX_SIZE)
+atexit.register(_writer.close)
@@ -1,13 +1,13 @@
 """ Работа с расходами — их добавление, удаление, статистики"""
 import datetime
 import re
-from typing import List, NamedTuple, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 import pytz
 
 import db
 import exceptions
-from categories import Categories
+from categories import Categories, Category
 
 
 class Message(NamedTuple):
@@ -26,35 +26,32 @@ class Expense(NamedTuple):
 def add_expense(raw_message: str) -> Expense:
     """Добавляет новое сообщение.
     Принимает на вход текст сообщения, пришедшего в бот."""
-    parsed_message = _parse_message(raw_message)
-    category = Categories().get_category(
-        parsed_message.category_text)
-    inserted_row_id = db.insert("expense", {
-        "amount": parsed_message.amount,
-        "created": _get_now_formatted(),
-        "category_codename": category.codename,
-        "raw_text": raw_message
-    })
-    return Expense(id=None,
-                   amount=parsed_message.amount,
+    row, category = _prepare_expense_row(raw_message)
+    inserted_row_id = db.insert("expense", row)
+    return Expense(id=inserted_row_id,
+                   amount=row["amount"],
+                   category_name=category.name)
+
+
+async def add_expense_async(raw_message: str) -> Expense:
+    """Добавляет новое сообщение, ожидая записи в БД без блокировки
+    event loop, так что записи из разных хендлеров коммитятся вместе."""
+    row, category = _prepare_expense_row(raw_message)
+    inserted_row_id = await db.insert_async("expense", row)
+    return Expense(id=inserted_row_id,
+                   amount=row["amount"],
                    category_name=category.name)
 
 
 def get_today_statistics() -> str:
     """Возвращает строкой статистику расходов за сегодня"""
-    cursor = db.get_cursor()
-    cursor.execute("select sum(amount)"
-                   "from expense where date(created)=date('now', 'localtime')")
-    result = cursor.fetchone()
-    if not result[0]:
+    rows = db.select("select amount, base_amount "
+                     "from expense_day_total where day=date('now', 'localtime')")
+    result = rows[0] if rows else None
+    if not result or not result[0]:
         return "Сегодня ещё нет расходов"
     all_today_expenses = result[0]
-    cursor.execute("select sum(amount) "
-                   "from expense where date(created)=date('now', 'localtime') "
-                   "and category_codename in (select codename "
-                   "from category where is_base_expense=true)")
-    result = cursor.fetchone()
-    base_today_expenses = result[0] if result[0] else 0
+    base_today_expenses = result[1] if result[1] else 0
     return (f"Расходы сегодня:\n"
             f"всего — {all_today_expenses} руб.\n"
             f"базовые — {base_today_expenses} руб. из {_get_budget_limit()} руб.\n\n"
@@ -64,20 +61,14 @@ def get_today_statistics() -> str:
 def get_month_statistics() -> str:
     """Возвращает строкой статистику расходов за текущий месяц"""
     now = _get_now_datetime()
-    first_day_of_month = f'{now.year:04d}-{now.month:02d}-01'
-    cursor = db.get_cursor()
-    cursor.execute(f"select sum(amount) "
-                   f"from expense where date(created) >= '{first_day_of_month}'")
-    result = cursor.fetchone()
-    if not result[0]:
+    month = f'{now.year:04d}-{now.month:02d}'
+    rows = db.select("select amount, base_amount "
+                     "from expense_month_total where month=?", (month,))
+    result = rows[0] if rows else None
+    if not result or not result[0]:
         return "В этом месяце ещё нет расходов"
     all_today_expenses = result[0]
-    cursor.execute(f"select sum(amount) "
-                   f"from expense where date(created) >= '{first_day_of_month}' "
-                   f"and category_codename in (select codename "
-                   f"from category where is_base_expense=true)")
-    result = cursor.fetchone()
-    base_today_expenses = result[0] if result[0] else 0
+    base_today_expenses = result[1] if result[1] else 0
     return (f"Расходы в текущем месяце:\n"
             f"всего — {all_today_expenses} руб.\n"
             f"базовые — {base_today_expenses} руб. из "
@@ -86,13 +77,11 @@ def get_month_statistics() -> str:
 
 def last() -> List[Expense]:
     """Возвращает последние несколько расходов"""
-    cursor = db.get_cursor()
-    cursor.execute(
+    rows = db.select(
         "select e.id, e.amount, c.name "
         "from expense e left join category c "
         "on c.codename=e.category_codename "
         "order by created desc limit 10")
-    rows = cursor.fetchall()
     last_expenses = [Expense(id=row[0], amount=row[1], category_name=row[2]) for row in rows]
     return last_expenses
 
@@ -102,6 +91,24 @@ def delete_expense(row_id: int) -> None:
     db.delete("expense", row_id)
 
 
+async def delete_expense_async(row_id: int) -> None:
+    """Удаляет сообщение по его идентификатору без блокировки event loop"""
+    await db.delete_async("expense", row_id)
+
+
+def _prepare_expense_row(raw_message: str) -> Tuple[Dict, Category]:
+    """Парсит сообщение и возвращает строку таблицы expense и категорию"""
+    parsed_message = _parse_message(raw_message)
+    category = Categories().get_category(
+        parsed_message.category_text)
+    return {
+        "amount": parsed_message.amount,
+        "created": _get_now_formatted(),
+        "category_codename": category.codename,
+        "raw_text": raw_message
+    }, category
+
+
 def _parse_message(raw_message: str) -> Message:
     """Парсит текст пришедшего сообщения о новом расходе."""
     regexp_result = re.match(r"([\d ]+) (.*)", raw_message)
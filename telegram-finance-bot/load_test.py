@@ -0,0 +1,82 @@
+"""Нагрузочный тест записи расходов: сколько сообщений в секунду
+выдерживает старая схема (коммит на каждую вставку) и пакетная запись
+через db.WriteBatcher в WAL режиме, при одновременных хендлерах.
+
+    python load_test.py --messages 5000 --concurrency 100
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _expense_row(number: int) -> dict:
+    return {
+        "amount": number % 1000 + 1,
+        "created": "2020-01-01 12:00:00",
+        "category_codename": "coffee",
+        "raw_text": f"{number % 1000 + 1} кофе",
+    }
+
+
+def run_commit_per_insert(db_path: str, messages: int) -> float:
+    """Старая схема db.py: общее соединение, executemany и commit на
+    каждое сообщение"""
+    conn = sqlite3.connect(db_path)
+    with open(os.path.join(BASE_DIR, "createdb.sql"), "r") as f:
+        conn.executescript(f.read())
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    for number in range(messages):
+        column_values = _expense_row(number)
+        columns = ', '.join(column_values.keys())
+        placeholders = ", ".join("?" * len(column_values.keys()))
+        cursor.executemany(
+            f"INSERT INTO expense ({columns}) VALUES ({placeholders})",
+            [tuple(column_values.values())])
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return messages / elapsed
+
+
+async def run_batched(messages: int, concurrency: int) -> float:
+    """Новая схема: concurrency хендлеров одновременно ждут insert_async"""
+    import db
+
+    async def handler(numbers: range):
+        for number in numbers:
+            await db.insert_async("expense", _expense_row(number))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        handler(range(worker, messages, concurrency))
+        for worker in range(concurrency)))
+    return messages / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        before = run_commit_per_insert(
+            os.path.join(directory, "before.db"), args.messages)
+        print(f"commit per insert:  {before:10.0f} messages/sec")
+
+        os.environ["FINANCE_DB_PATH"] = os.path.join(directory, "after.db")
+        os.chdir(BASE_DIR)
+        after = asyncio.run(run_batched(args.messages, args.concurrency))
+        print(f"batched, WAL:       {after:10.0f} messages/sec "
+              f"({args.concurrency} concurrent handlers, "
+              f"x{after / before:.1f})")
+
+
+if __name__ == "__main__":
+    main()
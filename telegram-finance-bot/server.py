@@ -42,7 +42,7 @@ async def send_welcome(message: types.Message):
 async def del_expense(message: types.Message):
     """Удаляет одну запись о расходе по её идентификатору"""
     row_id = int(message.text[4:])
-    expenses.delete_expense(row_id)
+    await expenses.delete_expense_async(row_id)
     answer_message = "Удалил"
     await message.answer(answer_message)
 
@@ -91,7 +91,7 @@ async def list_expenses(message: types.Message):
 async def add_expense(message: types.Message):
     """Добавляет новый расход"""
     try:
-        expense = expenses.add_expense(message.text)
+        expense = await expenses.add_expense_async(message.text)
     except exceptions.NotCorrectMessage as e:
         await message.answer(str(e))
         return